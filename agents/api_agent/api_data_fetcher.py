@@ -8,21 +8,67 @@ DMP-Agent API數據獲取器 - 增強版本
 import sys
 import os
 import asyncio
-import json
+import functools
 import time
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 import logging
 
+import pandas as pd
+
 # 添加父目錄到Python路徑
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
 
 from agents.api_agent.involve_asia_client import InvolveAsiaAPI
 from agents.data_dmp_agent.api_config_manager import APIConfigManager
+from modules.fetch_scheduler import FetchOutcome, FetchScheduler, FetchTask
 import config
 
 logger = logging.getLogger(__name__)
 
+# API 返回的標準時間格式（無時區信息，按UTC解釋）
+API_DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# 金額/比率字段：轉換為 float，缺失或無效時為空
+CONVERSION_FLOAT_FIELDS = (
+    'sale_amount_local', 'myr_sale_amount', 'usd_sale_amount',
+    'payout_local', 'myr_payout', 'usd_payout',
+    'sale_amount', 'payout', 'base_payout', 'bonus_payout',
+    'commission_rate', 'avg_commission_rate',
+)
+
+# 時間字段：解析為UTC時區的 datetime
+CONVERSION_DATETIME_FIELDS = ('datetime_conversion', 'datetime_conversion_updated', 'click_time')
+
+# 原樣保留的字段及缺失時的默認值
+CONVERSION_PASSTHROUGH_FIELDS = {
+    'offer_id': '', 'offer_name': '', 'order_id': '',
+    'conversion_currency': '', 'currency': 'USD',
+    'adv_sub': '', 'adv_sub1': '', 'adv_sub2': '', 'adv_sub3': '', 'adv_sub4': '', 'adv_sub5': '',
+    'aff_sub1': '', 'aff_sub2': '', 'aff_sub3': '', 'aff_sub4': '', 'aff_sub5': '',
+    'conversion_status': 'approved', 'offer_status': '',
+    'merchant_id': '', 'affiliate_remarks': '', 'click_id': '',
+    'tenant_id': 1,
+}
+
+# 處理後記錄的字段順序
+CONVERSION_OUTPUT_COLUMNS = (
+    'platform', 'partner', 'source',
+    'conversion_id', 'offer_id', 'offer_name', 'order_id',
+    'datetime_conversion', 'datetime_conversion_updated', 'click_time',
+    'sale_amount_local', 'myr_sale_amount', 'usd_sale_amount',
+    'payout_local', 'myr_payout', 'usd_payout',
+    'sale_amount', 'payout', 'base_payout', 'bonus_payout',
+    'conversion_currency', 'currency',
+    'adv_sub', 'adv_sub1', 'adv_sub2', 'adv_sub3', 'adv_sub4', 'adv_sub5',
+    'aff_sub', 'aff_sub1', 'aff_sub2', 'aff_sub3', 'aff_sub4', 'aff_sub5',
+    'status', 'conversion_status', 'offer_status',
+    'merchant_id', 'affiliate_remarks', 'click_id',
+    'commission_rate', 'avg_commission_rate',
+    'tenant_id', 'is_processed', 'is_duplicate',
+    'raw_data', 'processed_at', 'api_platform',
+)
+
 class EnhancedAPIDataFetcher:
     """
     增強版API數據獲取器
@@ -36,12 +82,21 @@ class EnhancedAPIDataFetcher:
     def __init__(self):
         self.config_manager = APIConfigManager()
         self.api_clients = {}
+        self.fetch_scheduler = FetchScheduler()
+        self.last_batch_outcomes: List[FetchOutcome] = []
     
     def get_api_client(self, platform: str) -> Optional[InvolveAsiaAPI]:
         """獲取API客戶端"""
         if platform in self.api_clients:
             return self.api_clients[platform]
         
+        api_client = self._create_api_client(platform)
+        if api_client:
+            self.api_clients[platform] = api_client
+        return api_client
+    
+    def _create_api_client(self, platform: str) -> Optional[InvolveAsiaAPI]:
+        """創建並認證新的API客戶端（不緩存）"""
         config_data = self.config_manager.get_config(platform)
         if not config_data:
             logger.error(f"❌ 未找到平台配置: {platform}")
@@ -63,17 +118,113 @@ class EnhancedAPIDataFetcher:
                 logger.error(f"❌ API認證失敗: {platform}")
                 return None
             
-            self.api_clients[platform] = api_client
             logger.info(f"✅ 創建API客戶端並認證成功: {platform}")
             return api_client
         except Exception as e:
             logger.error(f"❌ 創建API客戶端失敗: {platform} - {e}")
             return None
     
+    def transform_conversion_batch(self, raw_conversions: List[Dict], platform: str) -> pd.DataFrame:
+        """
+        列式批量轉換原始轉化數據
+
+        一頁（或整次拉取）的原始記錄先按字段抽取為列，再逐列完成字段映射、類型轉換
+        和 partner 歸屬（每個不同的 source 只匹配一次），得到帶類型的批次：
+        金額列為 float64（缺失/無效為 NaN），時間列為 UTC 時區的 datetime64，
+        其餘字段原樣保留為 object 列
+
+        Args:
+            raw_conversions: API返回的原始轉化數據
+            platform: 平台名稱 (如: IAByteC)
+
+        Returns:
+            按 CONVERSION_OUTPUT_COLUMNS 排列的 DataFrame
+        """
+        if not raw_conversions:
+            return pd.DataFrame(columns=list(CONVERSION_OUTPUT_COLUMNS))
+
+        def column(key: str, default: Any = None) -> List[Any]:
+            return [conversion.get(key, default) for conversion in raw_conversions]
+
+        # Source: aff_sub1 優先，否則使用 aff_sub；Partner 按照 config.py 映射表對應
+        source = [aff_sub1 or aff_sub for aff_sub1, aff_sub in zip(column('aff_sub1'), column('aff_sub', ''))]
+        partner_by_source = {value: config.match_source_to_partner(value) if value else 'Unknown'
+                             for value in set(source)}
+
+        row_count = len(raw_conversions)
+        columns = {
+            'platform': [platform] * row_count,
+            'partner': [partner_by_source[value] for value in source],
+            'source': source,
+            'conversion_id': [str(value) for value in column('conversion_id', '')],
+            'aff_sub': source,
+            'status': [conversion.get('status', conversion.get('conversion_status', 'approved'))
+                       for conversion in raw_conversions],
+            'is_processed': [False] * row_count,
+            'is_duplicate': [False] * row_count,
+            'raw_data': raw_conversions,
+            'processed_at': [datetime.now().isoformat()] * row_count,
+            'api_platform': [platform] * row_count,
+        }
+        for field, default in CONVERSION_PASSTHROUGH_FIELDS.items():
+            columns[field] = column(field, default)
+
+        batch = pd.DataFrame({name: pd.Series(columns[name], dtype=object)
+                              for name in CONVERSION_OUTPUT_COLUMNS if name in columns})
+        for field in CONVERSION_FLOAT_FIELDS:
+            batch[field] = pd.to_numeric(pd.Series(column(field), dtype=object), errors='coerce').astype('float64')
+        for field in CONVERSION_DATETIME_FIELDS:
+            batch[field] = self._parse_datetime_column(column(field))
+
+        return batch[list(CONVERSION_OUTPUT_COLUMNS)]
+
+    def _transform_conversions_one_by_one(self, raw_conversions: List[Dict], platform: str) -> pd.DataFrame:
+        """批量轉換失敗時逐條轉換，只跳過出錯的記錄"""
+        batches = []
+        for idx, conversion in enumerate(raw_conversions, 1):
+            try:
+                batches.append(self.transform_conversion_batch([conversion], platform))
+            except Exception as e:
+                logger.error(f"❌ 處理第 {idx} 條轉化數據失敗: {str(e)}")
+        if not batches:
+            return self.transform_conversion_batch([], platform)
+        return pd.concat(batches, ignore_index=True)
+
+    def _parse_datetime_column(self, values: List[Any]) -> pd.Series:
+        """
+        批量解析時間列：API 標準格式整列向量化解析（按UTC解釋），
+        不符合標準格式的少數值再逐個交給 _parse_datetime
+        """
+        raw = pd.Series(values, dtype=object)
+        parsed = pd.to_datetime(raw, format=API_DATETIME_FORMAT, errors='coerce', utc=True)
+        fallback = parsed.isna() & raw.map(bool)
+        if fallback.any():
+            parsed = parsed.astype(object)
+            parsed[fallback] = [self._parse_datetime(value) for value in raw[fallback]]
+            parsed = pd.to_datetime(parsed, utc=True)
+        return parsed
+
+    @staticmethod
+    def batch_to_records(batch: pd.DataFrame) -> List[Dict[str, Any]]:
+        """將列式批次轉換為入庫用的記錄列表（NaN/NaT 轉為 None，時間轉為 datetime 對象）"""
+        if batch.empty:
+            return []
+        values = []
+        for name in batch.columns:
+            series = batch[name]
+            if name in CONVERSION_DATETIME_FIELDS:
+                values.append([None if value is pd.NaT else value for value in series.dt.to_pydatetime()])
+            elif name in CONVERSION_FLOAT_FIELDS:
+                values.append(series.astype(object).where(series.notna(), None).tolist())
+            else:
+                values.append(series.tolist())
+        names = list(batch.columns)
+        return [dict(zip(names, row)) for row in zip(*values)]
+
     def process_raw_conversions(self, raw_conversions: List[Dict], platform: str) -> List[Dict[str, Any]]:
         """
         處理原始轉化數據 - 增強版本
-        完整處理所有API參數，按照config.py進行映射
+        完整處理所有API參數，按照config.py進行映射（列式批量轉換，見 transform_conversion_batch）
         
         Args:
             raw_conversions: API返回的原始轉化數據
@@ -82,130 +233,34 @@ class EnhancedAPIDataFetcher:
         Returns:
             處理後的轉化數據列表，包含完整的字段映射
         """
-        processed_conversions = []
-        
         logger.info(f"🔄 開始處理 {len(raw_conversions)} 條原始轉化數據...")
         
-        for idx, conversion in enumerate(raw_conversions, 1):
-            try:
-                # ===== 核心分類字段處理 =====
-                # 1. Platform: 直接使用傳入的平台名稱
-                platform_name = platform
-                
-                # 2. Source: 從aff_sub1或aff_sub直接獲取
-                source = conversion.get('aff_sub1') or conversion.get('aff_sub', '')
-                
-                # 3. Partner: 按照config.py映射表對應
-                partner = config.match_source_to_partner(source) if source else 'Unknown'
-                
-                # ===== 完整的字段映射 =====
-                processed_conversion = {
-                    # ===== 核心分類字段 =====
-                    'platform': platform_name,
-                    'partner': partner,
-                    'source': source,
-                    
-                    # ===== 核心轉化字段 =====
-                    'conversion_id': str(conversion.get('conversion_id', '')),
-                    'offer_id': conversion.get('offer_id', ''),
-                    'offer_name': conversion.get('offer_name', ''),
-                    'order_id': conversion.get('order_id', ''),
-                    
-                    # ===== 時間字段 =====
-                    'datetime_conversion': self._parse_datetime(conversion.get('datetime_conversion')),
-                    'datetime_conversion_updated': self._parse_datetime(conversion.get('datetime_conversion_updated')),
-                    'click_time': self._parse_datetime(conversion.get('click_time')),
-                    
-                    # ===== 完整的金額字段 =====
-                    # 本地貨幣金額
-                    'sale_amount_local': self._safe_float(conversion.get('sale_amount_local')),
-                    'myr_sale_amount': self._safe_float(conversion.get('myr_sale_amount')),
-                    'usd_sale_amount': self._safe_float(conversion.get('usd_sale_amount')),
-                    
-                    # 佣金字段
-                    'payout_local': self._safe_float(conversion.get('payout_local')),
-                    'myr_payout': self._safe_float(conversion.get('myr_payout')),
-                    'usd_payout': self._safe_float(conversion.get('usd_payout')),
-                    
-                    # API原始金額字段
-                    'sale_amount': self._safe_float(conversion.get('sale_amount')),
-                    'payout': self._safe_float(conversion.get('payout')),
-                    'base_payout': self._safe_float(conversion.get('base_payout')),
-                    'bonus_payout': self._safe_float(conversion.get('bonus_payout')),
-                    
-                    # ===== 貨幣字段 =====
-                    'conversion_currency': conversion.get('conversion_currency', ''),
-                    'currency': conversion.get('currency', 'USD'),
-                    
-                    # ===== 完整的廣告主自定義參數 =====
-                    'adv_sub': conversion.get('adv_sub', ''),
-                    'adv_sub1': conversion.get('adv_sub1', ''),
-                    'adv_sub2': conversion.get('adv_sub2', ''),
-                    'adv_sub3': conversion.get('adv_sub3', ''),
-                    'adv_sub4': conversion.get('adv_sub4', ''),
-                    'adv_sub5': conversion.get('adv_sub5', ''),
-                    
-                    # ===== 完整的發布商自定義參數 =====
-                    'aff_sub': source,  # 主要的aff_sub字段
-                    'aff_sub1': conversion.get('aff_sub1', ''),
-                    'aff_sub2': conversion.get('aff_sub2', ''),
-                    'aff_sub3': conversion.get('aff_sub3', ''),
-                    'aff_sub4': conversion.get('aff_sub4', ''),
-                    'aff_sub5': conversion.get('aff_sub5', ''),
-                    
-                    # ===== 狀態字段 =====
-                    'status': conversion.get('status', conversion.get('conversion_status', 'approved')),
-                    'conversion_status': conversion.get('conversion_status', 'approved'),
-                    'offer_status': conversion.get('offer_status', ''),
-                    
-                    # ===== 業務字段 =====
-                    'merchant_id': conversion.get('merchant_id', ''),
-                    'affiliate_remarks': conversion.get('affiliate_remarks', ''),
-                    'click_id': conversion.get('click_id', ''),
-                    
-                    # ===== 佣金計算相關字段 =====
-                    'commission_rate': self._safe_float(conversion.get('commission_rate')),
-                    'avg_commission_rate': self._safe_float(conversion.get('avg_commission_rate')),
-                    
-                    # ===== 系統字段 =====
-                    'tenant_id': conversion.get('tenant_id', 1),
-                    'is_processed': False,
-                    'is_duplicate': False,
-                    
-                    # ===== 原始數據保存 =====
-                    'raw_data': conversion,  # 完整的原始API響應
-                    'processed_at': datetime.now().isoformat(),
-                    'api_platform': platform_name,  # 標記數據來源API
-                }
-                
-                # 記錄映射結果
-                if idx <= 5:  # 只記錄前5條的詳細映射信息
-                    logger.info(f"   轉化 {idx}: source='{source}' -> partner='{partner}', conversion_id='{processed_conversion['conversion_id']}'")
-                
-                processed_conversions.append(processed_conversion)
-                
-            except Exception as e:
-                logger.error(f"❌ 處理轉化數據失敗 (第{idx}條): {str(e)}")
-                logger.error(f"   原始數據: {json.dumps(conversion, indent=2, ensure_ascii=False)}")
-                continue
-        
-        # 統計映射結果
-        partner_stats = {}
-        for conv in processed_conversions:
-            partner = conv['partner']
-            if partner not in partner_stats:
-                partner_stats[partner] = {'count': 0, 'sources': set()}
-            partner_stats[partner]['count'] += 1
-            partner_stats[partner]['sources'].add(conv['source'])
+        # 非字典的記錄無法處理，先行剔除，避免單條壞數據導致整頁丟失
+        valid_conversions = [conversion for conversion in raw_conversions if isinstance(conversion, dict)]
+        if len(valid_conversions) != len(raw_conversions):
+            logger.warning(f"⚠️ 跳過 {len(raw_conversions) - len(valid_conversions)} 條格式無效的轉化數據")
+        
+        try:
+            batch = self.transform_conversion_batch(valid_conversions, platform)
+        except Exception as e:
+            logger.error(f"❌ 批量處理轉化數據失敗，改為逐條處理: {str(e)}")
+            batch = self._transform_conversions_one_by_one(valid_conversions, platform)
+        
+        # 記錄映射結果（只記錄前5條的詳細映射信息）
+        for idx, (source, partner, conversion_id) in enumerate(
+                batch[['source', 'partner', 'conversion_id']].head(5).itertuples(index=False), 1):
+            logger.info(f"   轉化 {idx}: source='{source}' -> partner='{partner}', conversion_id='{conversion_id}'")
+        
+        processed_conversions = self.batch_to_records(batch)
         
         logger.info(f"✅ 處理完成: {len(processed_conversions)}/{len(raw_conversions)} 條記錄")
         logger.info(f"📊 Partner映射統計:")
-        for partner, stats in partner_stats.items():
-            sources_list = list(stats['sources'])[:3]  # 只顯示前3個source
-            sources_display = ', '.join(sources_list)
-            if len(stats['sources']) > 3:
-                sources_display += f"... (+{len(stats['sources'])-3} more)"
-            logger.info(f"   - {partner}: {stats['count']} 條轉化, sources: {sources_display}")
+        for partner, sources in batch.groupby('partner', sort=False)['source']:
+            unique_sources = list(dict.fromkeys(sources))
+            sources_display = ', '.join(str(source) for source in unique_sources[:3])  # 只顯示前3個source
+            if len(unique_sources) > 3:
+                sources_display += f"... (+{len(unique_sources)-3} more)"
+            logger.info(f"   - {partner}: {len(sources)} 條轉化, sources: {sources_display}")
         
         return processed_conversions
     
@@ -275,6 +330,45 @@ class EnhancedAPIDataFetcher:
         except (ValueError, TypeError):
             return None
     
+    def _fetch_range(self, api_client: InvolveAsiaAPI, platform: str, start_date: str, end_date: str,
+                     limit: int = None) -> List[Dict[str, Any]]:
+        """
+        獲取並處理一個日期範圍的轉化數據（同步，API響應無效時拋出異常）
+        
+        Returns:
+            完整處理後的轉化數據列表
+        """
+        # 獲取原始轉化數據
+        api_response = api_client.get_conversions(
+            start_date=start_date,
+            end_date=end_date,
+            currency='USD',
+            api_name=platform,
+            limit=limit
+        )
+        
+        if not api_response or api_response.get("status") != "success":
+            raise RuntimeError(f"API響應無效: {platform} (響應狀態: {api_response.get('status') if api_response else 'None'})")
+        
+        # 提取實際的轉化數據
+        raw_conversions = api_response.get("data", {}).get("data", [])
+        
+        if not raw_conversions:
+            logger.warning(f"⚠️ 沒有獲取到轉化數據: {platform} {start_date} 至 {end_date}")
+            return []
+        
+        logger.info(f"✅ 獲取原始轉化數據: {len(raw_conversions)} 條記錄")
+        
+        # 處理數據 - 完整的字段映射和partner映射
+        processed_conversions = self.process_raw_conversions(raw_conversions, platform)
+        
+        # 應用限制
+        if limit and len(processed_conversions) > limit:
+            processed_conversions = processed_conversions[:limit]
+            logger.info(f"🔢 應用數據限制: {len(processed_conversions)} 條記錄 (限制: {limit})")
+        
+        return processed_conversions
+    
     async def fetch_conversions(self, platform: str, days_ago: int = 1, limit: int = None) -> List[Dict[str, Any]]:
         """
         獲取轉化數據 - 增強版本
@@ -300,37 +394,7 @@ class EnhancedAPIDataFetcher:
         logger.info(f"📅 查詢日期範圍: {start_date} 至 {end_date}")
         
         try:
-            # 獲取原始轉化數據
-            api_response = api_client.get_conversions(
-                start_date=start_date,
-                end_date=end_date,
-                currency='USD',
-                api_name=platform,
-                limit=limit
-            )
-            
-            if not api_response or api_response.get("status") != "success":
-                logger.warning(f"⚠️ API響應無效: {platform}")
-                logger.warning(f"   響應狀態: {api_response.get('status') if api_response else 'None'}")
-                return []
-            
-            # 提取實際的轉化數據
-            raw_conversions = api_response.get("data", {}).get("data", [])
-            
-            if not raw_conversions:
-                logger.warning(f"⚠️ 沒有獲取到轉化數據: {platform}")
-                return []
-            
-            logger.info(f"✅ 獲取原始轉化數據: {len(raw_conversions)} 條記錄")
-            
-            # 處理數據 - 完整的字段映射和partner映射
-            processed_conversions = self.process_raw_conversions(raw_conversions, platform)
-            
-            # 應用限制
-            if limit and len(processed_conversions) > limit:
-                processed_conversions = processed_conversions[:limit]
-                logger.info(f"🔢 應用數據限制: {len(processed_conversions)} 條記錄 (限制: {limit})")
-            
+            processed_conversions = self._fetch_range(api_client, platform, start_date, end_date, limit)
             logger.info(f"🎯 完成轉化數據獲取: {len(processed_conversions)} 條記錄已完整處理")
             return processed_conversions
             
@@ -340,30 +404,86 @@ class EnhancedAPIDataFetcher:
             logger.error(f"   錯誤詳情: {traceback.format_exc()}")
             return []
     
-    async def fetch_conversions_batch(self, platforms: List[str], days_ago: int = 1) -> Dict[str, List[Dict[str, Any]]]:
+    def _fetch_range_with_own_client(self, platform: str, start_date: str, end_date: str,
+                                     limit: int = None) -> List[Dict[str, Any]]:
+        """
+        使用獨立的API客戶端獲取一個日期範圍（在工作線程中執行）
+        客戶端保存每次獲取的跳過頁面等狀態，並發的任務不能共用；
+        token緩存、限流器和熔斷器在客戶端之間共享
         """
-        批量獲取多個平台的轉化數據
+        api_client = self._create_api_client(platform)
+        if not api_client:
+            raise RuntimeError(f"無法獲取API客戶端: {platform}")
+        try:
+            return self._fetch_range(api_client, platform, start_date, end_date, limit)
+        finally:
+            api_client.close()
+    
+    async def iter_conversions_batch(self, platforms: List[str], days_ago: int = 1,
+                                     date_ranges: Optional[List[Tuple[str, str]]] = None,
+                                     limit: int = None) -> AsyncIterator[FetchOutcome]:
+        """
+        有界並發地獲取多個平台 × 多個日期範圍的轉化數據，每個任務完成即產出結果
+        
+        任務按日期範圍天數從大到小調度，同時進行的任務數不超過 FETCH_BATCH_MAX_IN_FLIGHT；
+        單個任務失敗只體現在該任務的 FetchOutcome 中（success=False, error=...）
+        
+        Args:
+            platforms: 平台名稱列表
+            days_ago: 未指定 date_ranges 時查詢的天數前
+            date_ranges: (start_date, end_date) 列表，日期格式 YYYY-MM-DD
+            limit: 每個任務的限制條數
+        """
+        ranges = date_ranges or [self.config_manager.get_date_range(days_ago)]
+        tasks = []
+        for platform in platforms:
+            for start_date, end_date in ranges:
+                days = (datetime.strptime(end_date, '%Y-%m-%d') - datetime.strptime(start_date, '%Y-%m-%d')).days + 1
+                tasks.append(FetchTask(
+                    key=f"{platform} {start_date}~{end_date}",
+                    func=functools.partial(asyncio.to_thread, self._fetch_range_with_own_client,
+                                           platform, start_date, end_date, limit),
+                    weight=days,
+                    metadata={'platform': platform, 'start_date': start_date, 'end_date': end_date},
+                ))
+        
+        async for outcome in self.fetch_scheduler.run(tasks):
+            yield outcome
+    
+    async def fetch_conversions_batch(self, platforms: List[str], days_ago: int = 1,
+                                      date_ranges: Optional[List[Tuple[str, str]]] = None,
+                                      limit: int = None) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        批量獲取多個平台（及多個日期範圍）的轉化數據
         
         Args:
             platforms: 平台名稱列表
             days_ago: 天數前
+            date_ranges: (start_date, end_date) 列表，為空時只查詢 days_ago 對應的日期
+            limit: 每個任務的限制條數
             
         Returns:
-            按平台分組的轉化數據字典
+            按平台分組的轉化數據字典；失敗的任務不影響其他任務，詳情見 self.last_batch_outcomes
         """
-        logger.info(f"🚀 開始批量獲取多平台數據: {platforms}")
+        logger.info(f"🚀 開始批量獲取多平台數據: {platforms} (並發上限 {self.fetch_scheduler.max_in_flight})")
         
-        results = {}
+        results = {platform: [] for platform in platforms}
+        outcomes = []
         total_conversions = 0
         
-        for platform in platforms:
-            logger.info(f"📡 處理平台: {platform}")
-            conversions = await self.fetch_conversions(platform, days_ago)
-            results[platform] = conversions
-            total_conversions += len(conversions)
-            logger.info(f"   ✅ {platform}: {len(conversions)} 條轉化")
+        async for outcome in self.iter_conversions_batch(platforms, days_ago, date_ranges, limit):
+            outcomes.append(outcome)
+            if outcome.success:
+                results[outcome.metadata['platform']].extend(outcome.result)
+                total_conversions += len(outcome.result)
+                logger.info(f"   ✅ {outcome.key}: {len(outcome.result)} 條轉化 ({outcome.duration:.1f}s)")
+            else:
+                logger.error(f"   ❌ {outcome.key}: {outcome.error} ({outcome.duration:.1f}s)")
         
-        logger.info(f"🎉 批量獲取完成: {len(platforms)} 個平台, 總計 {total_conversions} 條轉化")
+        self.last_batch_outcomes = outcomes
+        failed = sum(1 for outcome in outcomes if not outcome.success)
+        logger.info(f"🎉 批量獲取完成: {len(platforms)} 個平台, {len(outcomes) - failed}/{len(outcomes)} 個任務成功, "
+                    f"總計 {total_conversions} 條轉化")
         return results
     
     def get_available_platforms(self) -> List[str]:
@@ -430,6 +430,7 @@ class AsyncInvolveAsiaAPI:
         
         # 最终资源状态
         self.resource_monitor.print_resource_status("最终状态", show_details=True)
+        self.resource_monitor.print_resource_timeline("API数据获取")
         
         print(f"{'='*60}\n")
 
@@ -14,6 +14,7 @@ from email.mime.base import MIMEBase
 from email import encoders
 from datetime import datetime
 from utils.logger import print_step
+from modules.resilience import ResilienceError, get_destination
 import config
 import pandas as pd
 
@@ -45,6 +46,8 @@ class EmailSender:
         self.max_retries = getattr(config, 'EMAIL_MAX_RETRIES', 3)
         self.retry_delay = getattr(config, 'EMAIL_RETRY_DELAY', 5)
         self.retry_backoff = getattr(config, 'EMAIL_RETRY_BACKOFF', 2)
+        # SMTP服务器的熔断器与重试预算（与其他出站调用共用同一套策略）
+        self.resilience = get_destination(f"smtp:{self.smtp_server}")
     
     def send_partner_reports(self, partner_summary, feishu_upload_result=None, report_date=None, start_date=None, self_email=False):
         """
@@ -1398,7 +1401,6 @@ class EmailSender:
             dict: 发送结果
         """
         last_error = None
-        delay = self.retry_delay
         
         # 检测邮件大小并动态调整超时
         msg_size = len(msg.as_string())
@@ -1413,6 +1415,17 @@ class EmailSender:
             print_step(f"{operation_name}中等文件", f"📎 检测到中等附件 ({msg_size/1024/1024:.1f}MB)，超时调整为 {dynamic_timeout}秒")
         
         for attempt in range(self.max_retries + 1):  # +1 因为第一次不算重试
+            try:
+                self.resilience.begin(attempt)
+            except ResilienceError as e:
+                # SMTP服务器持续失败时快速放弃，不再等待剩余的重试
+                print_step(f"{operation_name}失败", f"❌ {str(e)}")
+                return {
+                    'success': False,
+                    'error': f"邮件发送失败 (尝试 {attempt} 次): {str(e)}",
+                    'attempts': attempt
+                }
+            
             try:
                 print_step(f"{operation_name}尝试", f"第 {attempt + 1} 次尝试 (超时设置: {dynamic_timeout}秒)")
                 
@@ -1433,11 +1446,13 @@ class EmailSender:
                     server.sendmail(self.sender, recipients, text)
                 
                 # 发送成功
+                self.resilience.record_success()
                 print_step(f"{operation_name}成功", f"✅ 邮件发送成功 (第 {attempt + 1} 次尝试)")
                 return {'success': True, 'attempts': attempt + 1}
                 
             except (smtplib.SMTPException, socket.timeout, socket.error, ConnectionError, OSError) as e:
                 last_error = e
+                self.resilience.record_failure()
                 error_type = type(e).__name__
                 error_msg = str(e)
                 
@@ -1445,9 +1460,9 @@ class EmailSender:
                 
                 # 如果不是最后一次尝试，则等待后重试
                 if attempt < self.max_retries:
-                    print_step(f"{operation_name}重试", f"⏳ 等待 {delay} 秒后重试...")
+                    delay = self.resilience.backoff(attempt + 1, self.retry_delay, self.retry_backoff)  # 指数退避 + 抖动
+                    print_step(f"{operation_name}重试", f"⏳ 等待 {delay:.1f} 秒后重试...")
                     time.sleep(delay)
-                    delay *= self.retry_backoff  # 指数退避
                 else:
                     print_step(f"{operation_name}失败", f"❌ 所有重试均失败，放弃发送")
             
@@ -10,6 +10,13 @@ TIKTOK_AUTH_URL = "https://auth.tiktok-shops.com/api/v2/token/get"
 TIKTOK_TRACKING_LINK_URL = "https://open-api.tiktokglobalshop.com/affiliate_creator/202407/affiliate_sharing_links/generate"
 TIKTOK_ORDERS_SEARCH_URL = "https://open-api.tiktokglobalshop.com/affiliate_creator/202410/affiliate_orders/search"
 
+# Request Settings (retries share the project-wide circuit breaker / retry budget per host)
+REQUEST_TIMEOUT = 30  # seconds
+MAX_RETRIES = 3  # retries on network errors, 429 and 5xx
+RATE_LIMITER_ENABLED = True  # pace report pages with a shared token bucket instead of a fixed sleep
+REQUESTS_PER_SECOND = 2.0  # sustained report requests per second per app key
+RATE_LIMIT_BURST = 2  # requests allowed back to back before pacing kicks in
+
 # Default Channel and Tags
 DEFAULT_CHANNEL = "OEM2_VIVO_PUSH"
 DEFAULT_TAGS = ["111-WA-ABC", "222-CC-DD"]
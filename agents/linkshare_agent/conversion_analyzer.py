@@ -4,69 +4,132 @@ LinkShare Conversion Report Analyzer
 轉化報告分析和導出功能
 """
 
+import numpy as np
 import pandas as pd
-from datetime import datetime
+from datetime import datetime, timezone
 from typing import Dict, List, Optional, Tuple
 from collections import defaultdict
 import json
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
+# 訂單字段及缺失時的默認值（同時決定 DataFrame 的列順序）
+ORDER_COLUMNS = {
+    'affiliate_order_id': '',
+    'shop_order_id': '',
+    'product_id': '',
+    'product_name': '',
+    'order_amount': 0.0,
+    'commission_amount': 0.0,
+    'commission_rate': 0.0,
+    'order_status': '',
+    'currency': 'USD',
+    'affiliate_link': '',
+    'order_create_time': 0,
+    'commission_settle_time': 0,
+}
+NUMERIC_COLUMNS = ('order_amount', 'commission_amount', 'commission_rate')
+# 時間戳列 -> 派生的日期列
+TIMESTAMP_COLUMNS = {
+    'order_create_time': 'order_date',
+    'commission_settle_time': 'settle_date',
+}
+
+# 本地時區的 UTC 偏移只會在整 15 分鐘處變化（夏令時切換等）
+_OFFSET_GRANULARITY = 900
+_SECONDS_PER_DAY = 86400
+
+
+def _format_local_dates(timestamps: pd.Series) -> np.ndarray:
+    """
+    將秒級時間戳列轉換為本地日期字符串（%Y-%m-%d，與 datetime.fromtimestamp 一致），
+    0 或缺失時為空字符串
+
+    本地偏移按 15 分鐘分桶後只對不同的桶調用 time.localtime，日期字符串也只對
+    不同的日期格式化一次，其餘都是數組運算
+    """
+    values = timestamps.to_numpy(dtype='int64')
+    valid = values != 0
+    labels = np.full(len(values), '', dtype=object)
+    if not valid.any():
+        return labels
+    
+    values = values[valid]
+    buckets, bucket_index = np.unique(values // _OFFSET_GRANULARITY, return_inverse=True)
+    offsets = np.fromiter((time.localtime(int(bucket) * _OFFSET_GRANULARITY).tm_gmtoff for bucket in buckets),
+                          dtype='int64', count=len(buckets))
+    days, day_index = np.unique((values + offsets[bucket_index.ravel()]) // _SECONDS_PER_DAY,
+                                return_inverse=True)
+    day_labels = np.array([datetime.fromtimestamp(int(day) * _SECONDS_PER_DAY, timezone.utc).strftime('%Y-%m-%d')
+                           for day in days], dtype=object)
+    labels[valid] = day_labels[day_index.ravel()]
+    return labels
+
+
 class ConversionAnalyzer:
     """轉化報告分析器"""
     
-    def __init__(self, orders_data: List[Dict]):
+    def __init__(self, orders_data: Optional[List[Dict]] = None):
         """
         初始化分析器
         
         Args:
-            orders_data: 訂單數據列表
+            orders_data: 訂單數據列表；為空時可之後通過 add_orders 逐頁流式傳入
         """
-        self.orders_data = orders_data
-        self.df = self._create_dataframe()
+        self.orders_data = []
+        self._frames = []  # 每批訂單轉換後的 DataFrame 分塊
+        self._df = None
+        if orders_data:
+            self.add_orders(orders_data)
+    
+    def add_orders(self, orders: List[Dict]) -> None:
+        """追加一批訂單（例如逐頁流式傳入），立即轉換為 DataFrame 分塊"""
+        if not orders:
+            return
+        self.orders_data.extend(orders)
+        self._frames.append(self._create_dataframe(orders))
+        self._df = None
+    
+    @property
+    def df(self) -> pd.DataFrame:
+        """所有已傳入訂單的 DataFrame（首次訪問時合併分塊）"""
+        if self._df is None:
+            if not self._frames:
+                self._df = pd.DataFrame()
+            elif len(self._frames) == 1:
+                self._df = self._frames[0]
+            else:
+                self._df = pd.concat(self._frames, ignore_index=True)
+                self._frames = [self._df]
+        return self._df
         
-    def _create_dataframe(self) -> pd.DataFrame:
-        """創建 pandas DataFrame"""
-        if not self.orders_data:
+    def _create_dataframe(self, orders: List[Dict]) -> pd.DataFrame:
+        """
+        創建 pandas DataFrame（列式構建）
+
+        一次性將原始記錄規整為列，數值列和時間戳列使用向量化轉換，
+        避免逐行調用 float() / datetime.fromtimestamp()
+        """
+        if not orders:
             return pd.DataFrame()
         
-        # 轉換數據
-        processed_data = []
-        for order in self.orders_data:
-            processed_order = {
-                'affiliate_order_id': order.get('affiliate_order_id', ''),
-                'shop_order_id': order.get('shop_order_id', ''),
-                'product_id': order.get('product_id', ''),
-                'product_name': order.get('product_name', ''),
-                'order_amount': float(order.get('order_amount', 0)),
-                'commission_amount': float(order.get('commission_amount', 0)),
-                'commission_rate': float(order.get('commission_rate', 0)),
-                'order_status': order.get('order_status', ''),
-                'currency': order.get('currency', 'USD'),
-                'affiliate_link': order.get('affiliate_link', ''),
-                'order_create_time': order.get('order_create_time', 0),
-                'commission_settle_time': order.get('commission_settle_time', 0)
-            }
-            
-            # 轉換時間戳為日期
-            if processed_order['order_create_time']:
-                processed_order['order_date'] = datetime.fromtimestamp(
-                    processed_order['order_create_time']
-                ).strftime('%Y-%m-%d')
-            else:
-                processed_order['order_date'] = ''
-                
-            if processed_order['commission_settle_time']:
-                processed_order['settle_date'] = datetime.fromtimestamp(
-                    processed_order['commission_settle_time']
-                ).strftime('%Y-%m-%d')
+        df = pd.DataFrame.from_records(orders, columns=list(ORDER_COLUMNS))
+        
+        for column, default in ORDER_COLUMNS.items():
+            if column in NUMERIC_COLUMNS:
+                df[column] = pd.to_numeric(df[column]).fillna(default).astype('float64')
+            elif column in TIMESTAMP_COLUMNS:
+                df[column] = pd.to_numeric(df[column]).fillna(default).astype('int64')
             else:
-                processed_order['settle_date'] = ''
-            
-            processed_data.append(processed_order)
+                df[column] = df[column].fillna(default).astype(object)
+        
+        # 轉換時間戳為本地日期（與 datetime.fromtimestamp 一致），時間戳為 0 時為空字符串
+        for ts_column, date_column in TIMESTAMP_COLUMNS.items():
+            df[date_column] = _format_local_dates(df[ts_column])
         
-        return pd.DataFrame(processed_data)
+        return df
     
     def get_summary_statistics(self) -> Dict:
         """獲取總體統計數據"""
@@ -5,6 +5,7 @@ Main entry point for the LinkShare module
 """
 
 import argparse
+import asyncio
 import sys
 import logging
 from typing import Optional
@@ -115,13 +116,16 @@ def get_conversion_report(start_date: str, end_date: str, auth_code: Optional[st
             logger.info("🔗 Example: https://auth.tiktok-shops.com/api/v2/authorization?app_key=YOUR_APP_KEY")
             return False
         
-        # Step 2: Get all conversion data
-        logger.info("📊 Fetching conversion data...")
-        orders_data = api.get_all_conversion_data(
+        # Step 2 & 3: Fetch conversion data and stream each page into the analyzer
+        # (the next page is downloaded while the current one is being processed)
+        logger.info("📊 Fetching and analyzing conversion data...")
+        analyzer = ConversionAnalyzer()
+        orders_data = asyncio.run(api.get_all_conversion_data_async(
             start_date=start_date,
             end_date=end_date,
-            shop_region=DEFAULT_SHOP_REGION
-        )
+            shop_region=DEFAULT_SHOP_REGION,
+            analyzer=analyzer
+        ))
         
         if orders_data is None:
             logger.error("❌ Failed to get conversion data")
@@ -131,10 +135,6 @@ def get_conversion_report(start_date: str, end_date: str, auth_code: Optional[st
             logger.warning("⚠️ No conversion data found for the specified date range")
             return True
         
-        # Step 3: Analyze data
-        logger.info("📈 Analyzing conversion data...")
-        analyzer = ConversionAnalyzer(orders_data)
-        
         # Step 4: Display/Export results
         if export_format in ["console", "all"]:
             analyzer.print_summary_report()
@@ -1,11 +1,16 @@
+import asyncio
 import requests
+import httpx
 import hashlib
 import time
 import json
 import logging
-from typing import Dict, List, Optional
+from typing import AsyncIterator, Dict, List, Optional, Tuple
 from .config import *
 from datetime import datetime, timedelta
+from modules.resilience import ResilienceError, call_with_retry, get_destination, is_connect_error, is_transient_status
+from modules.rate_limiter import TokenBucketRateLimiter
+from modules.adaptive_concurrency import parse_retry_after
 
 # Configure logging
 logging.basicConfig(level=getattr(logging, LOG_LEVEL), format=LOG_FORMAT)
@@ -19,7 +24,38 @@ class TikTokAPI:
         self.app_secret = TIKTOK_APP_SECRET
         self.access_token = None
         self.access_token_expire_in = None
+        # Shared token bucket pacing report requests across processes using this app key
+        self.rate_limiter = TokenBucketRateLimiter(
+            self.app_secret, self.app_key, rate=REQUESTS_PER_SECOND, burst=RATE_LIMIT_BURST
+        ) if RATE_LIMITER_ENABLED else None
         
+    def _request(self, method: str, url: str, idempotent: Optional[bool] = None, **kwargs) -> requests.Response:
+        """
+        Send a request through the per-host circuit breaker and retry budget.
+        Idempotent requests (GET by default) retry network errors, 429 and 5xx with jittered backoff;
+        non-idempotent ones only retry when the connection could not be established, so a request
+        that may have reached the server is never sent twice. Raises ResilienceError when the host's
+        breaker is open or its retry budget is exhausted.
+        """
+        if idempotent is None:
+            idempotent = method.upper() in ('GET', 'HEAD', 'OPTIONS')
+        kwargs.setdefault('timeout', REQUEST_TIMEOUT)
+        if not idempotent:
+            return call_with_retry(
+                get_destination(url),
+                lambda: requests.request(method, url, **kwargs),
+                max_retries=MAX_RETRIES,
+                retry_error=is_connect_error,
+                label=f"TikTok {method}"
+            )
+        return call_with_retry(
+            get_destination(url),
+            lambda: requests.request(method, url, **kwargs),
+            max_retries=MAX_RETRIES,
+            should_retry=lambda response: response.status_code == 429 or is_transient_status(response.status_code),
+            label=f"TikTok {method}"
+        )
+    
     def _generate_signature(self, params: Dict[str, str]) -> str:
         """Generate signature for API requests"""
         # Sort parameters by key
@@ -68,7 +104,7 @@ class TikTokAPI:
             logger.info(f"📋 Parameters: app_key={self.app_key}, auth_code={auth_code[:20]}...")
             logger.info(f"🔧 Full URL: {TIKTOK_AUTH_URL}?app_key={self.app_key}&auth_code={auth_code}&grant_type=authorized_code")
             
-            response = requests.get(TIKTOK_AUTH_URL, params=params)
+            response = self._request('GET', TIKTOK_AUTH_URL, params=params)
             response.raise_for_status()
             
             data = response.json()
@@ -91,6 +127,9 @@ class TikTokAPI:
                 logger.error(f"❌ Failed to get access token: {data.get('message')}")
                 return None
                 
+        except ResilienceError as e:
+            logger.error(f"❌ Request rejected: {e}")
+            return None
         except requests.exceptions.RequestException as e:
             logger.error(f"❌ Network error: {e}")
             return None
@@ -156,7 +195,8 @@ class TikTokAPI:
             logger.info(f"📡 Making request to: {TIKTOK_TRACKING_LINK_URL}")
             logger.info(f"📋 Request body: {json.dumps(request_body, indent=2)}")
             
-            response = requests.post(
+            response = self._request(
+                'POST',
                 TIKTOK_TRACKING_LINK_URL,
                 params=params,
                 json=request_body,
@@ -188,6 +228,9 @@ class TikTokAPI:
                 logger.error(f"❌ Failed to generate tracking link: {data.get('message')}")
                 return None
                 
+        except ResilienceError as e:
+            logger.error(f"❌ Request rejected: {e}")
+            return None
         except requests.exceptions.RequestException as e:
             logger.error(f"❌ Network error: {e}")
             return None
@@ -214,6 +257,77 @@ class TikTokAPI:
             return result['tracking_links'][0].get('affiliate_sharing_link')
         return None
     
+    def _build_report_request(self,
+                              start_date: str,
+                              end_date: str,
+                              page_size: int = DEFAULT_PAGE_SIZE,
+                              cursor: str = "",
+                              order_status: List[str] = None,
+                              shop_region: str = DEFAULT_SHOP_REGION) -> Tuple[Dict, Dict]:
+        """Build signed query parameters and body for the orders search endpoint"""
+        # Default order status if not provided
+        if order_status is None:
+            order_status = DEFAULT_ORDER_STATUSES
+            
+        # Prepare request body
+        request_body = {
+            "start_date": start_date,
+            "end_date": end_date,
+            "page_size": min(max(page_size, 1), 100),  # Ensure page_size is between 1-100
+            "shop_region": shop_region
+        }
+        
+        # Add optional parameters
+        if cursor:
+            request_body["cursor"] = cursor
+        if order_status:
+            request_body["order_status"] = order_status
+        
+        # Prepare query parameters
+        timestamp = str(int(time.time()))
+        params = {
+            'app_key': self.app_key,
+            'access_token': self.access_token,
+            'timestamp': timestamp
+        }
+        
+        # Generate signature
+        sign = self._generate_signature(params)
+        params['sign'] = sign
+        return params, request_body
+    
+    @staticmethod
+    def _parse_report_response(data: Dict, page_size: int) -> Optional[Dict]:
+        """Convert an orders search response into the report page structure (None on API error)"""
+        if data.get('code') != 0:
+            logger.error(f"❌ Failed to get conversion report: {data.get('message')}")
+            return None
+        
+        orders = data.get('data', {}).get('orders', [])
+        total_count = data.get('data', {}).get('total_count', 0)
+        cursor = data.get('data', {}).get('cursor', '')
+        return {
+            'orders': orders,
+            'total_count': total_count,
+            'cursor': cursor,
+            'request_id': data.get('request_id'),
+            'page_info': {
+                'current_page_size': len(orders),
+                'requested_page_size': page_size,
+                'has_more': bool(cursor)
+            }
+        }
+    
+    @staticmethod
+    def _validate_dates(start_date: str, end_date: str) -> bool:
+        try:
+            datetime.strptime(start_date, "%Y-%m-%d")
+            datetime.strptime(end_date, "%Y-%m-%d")
+            return True
+        except ValueError:
+            logger.error("❌ Invalid date format. Please use YYYY-MM-DD")
+            return False
+    
     def get_conversion_report(self, 
                             start_date: str, 
                             end_date: str,
@@ -245,80 +359,41 @@ class TikTokAPI:
             logger.info(f"🌏 Shop region: {shop_region}")
             
             # Validate date format
-            try:
-                datetime.strptime(start_date, "%Y-%m-%d")
-                datetime.strptime(end_date, "%Y-%m-%d")
-            except ValueError:
-                logger.error("❌ Invalid date format. Please use YYYY-MM-DD")
+            if not self._validate_dates(start_date, end_date):
                 return None
             
-            # Default order status if not provided
-            if order_status is None:
-                order_status = DEFAULT_ORDER_STATUSES
-                
-            # Prepare request body
-            request_body = {
-                "start_date": start_date,
-                "end_date": end_date,
-                "page_size": min(max(page_size, 1), 100),  # Ensure page_size is between 1-100
-                "shop_region": shop_region
-            }
-            
-            # Add optional parameters
-            if cursor:
-                request_body["cursor"] = cursor
-            if order_status:
-                request_body["order_status"] = order_status
-            
-            # Prepare query parameters
-            timestamp = str(int(time.time()))
-            params = {
-                'app_key': self.app_key,
-                'access_token': self.access_token,
-                'timestamp': timestamp
-            }
-            
-            # Generate signature
-            sign = self._generate_signature(params)
-            params['sign'] = sign
+            params, request_body = self._build_report_request(
+                start_date, end_date, page_size, cursor, order_status, shop_region)
             
             logger.info(f"📡 Making request to: {TIKTOK_ORDERS_SEARCH_URL}")
             logger.info(f"📋 Request body: {json.dumps(request_body, indent=2)}")
             
-            response = requests.post(
+            if self.rate_limiter:
+                self.rate_limiter.acquire()
+            response = self._request(
+                'POST',
                 TIKTOK_ORDERS_SEARCH_URL,
+                idempotent=True,  # read-only search
                 params=params,
                 json=request_body,
                 headers={'Content-Type': 'application/json'}
             )
+            if response.status_code == 429 and self.rate_limiter:
+                self.rate_limiter.penalize(parse_retry_after(response.headers.get('Retry-After')))
             response.raise_for_status()
             
             data = response.json()
             logger.info(f"📥 Response received: {data.get('code')} - {data.get('message')}")
             
-            if data.get('code') == 0:
-                orders = data.get('data', {}).get('orders', [])
-                total_count = data.get('data', {}).get('total_count', 0)
-                cursor = data.get('data', {}).get('cursor', '')
-                
+            result = self._parse_report_response(data, page_size)
+            if result:
                 logger.info(f"✅ Conversion report retrieved successfully!")
-                logger.info(f"📦 Found {len(orders)} orders (Total: {total_count})")
-                
-                return {
-                    'orders': orders,
-                    'total_count': total_count,
-                    'cursor': cursor,
-                    'request_id': data.get('request_id'),
-                    'page_info': {
-                        'current_page_size': len(orders),
-                        'requested_page_size': page_size,
-                        'has_more': bool(cursor)
-                    }
-                }
-            else:
-                logger.error(f"❌ Failed to get conversion report: {data.get('message')}")
-                return None
+                logger.info(f"📦 Found {len(result['orders'])} orders (Total: {result['total_count']})")
+            return result
                 
+        except ResilienceError as e:
+            logger.error(f"❌ Request rejected: {e}")
+            return None
         except requests.exceptions.RequestException as e:
             logger.error(f"❌ Network error: {e}")
             return None
@@ -352,6 +427,7 @@ class TikTokAPI:
         while True:
             logger.info(f"📄 Fetching page {page_num}...")
             
+            # Requests are paced by the shared rate limiter inside get_conversion_report
             result = self.get_conversion_report(
                 start_date=start_date,
                 end_date=end_date,
@@ -375,9 +451,137 @@ class TikTokAPI:
                 break
                 
             page_num += 1
-            
-            # Add a small delay to avoid rate limiting
-            time.sleep(0.5)
         
         logger.info(f"✅ Retrieved all conversion data: {len(all_orders)} total orders")
-        return all_orders 
\ No newline at end of file
+        return all_orders
+    
+    async def _fetch_report_page_async(self,
+                                       client: httpx.AsyncClient,
+                                       start_date: str,
+                                       end_date: str,
+                                       cursor: str,
+                                       order_status: List[str],
+                                       shop_region: str,
+                                       page_size: int) -> Optional[Dict]:
+        """Fetch one report page; paced by the shared rate limiter, retried under the host's circuit breaker"""
+        destination = get_destination(TIKTOK_ORDERS_SEARCH_URL)
+        attempt = 0
+        while True:
+            destination.begin(attempt)
+            if self.rate_limiter:
+                await self.rate_limiter.acquire_async()
+            # Sign per attempt so the timestamp stays fresh
+            params, request_body = self._build_report_request(
+                start_date, end_date, page_size, cursor, order_status, shop_region)
+            response = None
+            try:
+                response = await client.post(TIKTOK_ORDERS_SEARCH_URL, params=params, json=request_body)
+            except httpx.RequestError as e:
+                destination.record_failure()
+                if attempt >= MAX_RETRIES:
+                    raise
+                logger.warning(f"⚠️ Network error, retrying: {e}")
+            else:
+                if response.status_code == 429:
+                    # Throttling is handled by the pacer, not counted against the breaker
+                    if self.rate_limiter:
+                        await self.rate_limiter.penalize_async(parse_retry_after(response.headers.get('Retry-After')))
+                    else:
+                        await asyncio.sleep(parse_retry_after(response.headers.get('Retry-After')) or 1.0)
+                    if attempt >= MAX_RETRIES:
+                        response.raise_for_status()
+                elif is_transient_status(response.status_code):
+                    destination.record_failure()
+                    if attempt >= MAX_RETRIES:
+                        response.raise_for_status()
+                else:
+                    response.raise_for_status()
+                    destination.record_success()
+                    return self._parse_report_response(response.json(), page_size)
+            attempt += 1
+            if response is None or response.status_code != 429:
+                await asyncio.sleep(destination.backoff(attempt))
+    
+    async def iter_conversion_pages_async(self,
+                                          start_date: str,
+                                          end_date: str,
+                                          order_status: List[str] = None,
+                                          shop_region: str = DEFAULT_SHOP_REGION,
+                                          page_size: int = DEFAULT_PAGE_SIZE) -> AsyncIterator[Dict]:
+        """
+        Yield report pages while the next page is already in flight
+        
+        The cursor for page N+1 is read as soon as page N arrives and its request is
+        started before page N is handed to the caller, so network round trips overlap
+        with the caller's parsing. Stops early (after logging) if a page fails.
+        
+        Yields:
+            Dictionary per page, same structure as get_conversion_report
+        """
+        if not self.access_token:
+            logger.error("❌ No access token available. Please get access token first.")
+            return
+        if not self._validate_dates(start_date, end_date):
+            return
+        
+        async with httpx.AsyncClient(timeout=REQUEST_TIMEOUT,
+                                     headers={'Content-Type': 'application/json'}) as client:
+            def start_fetch(cursor: str) -> asyncio.Task:
+                return asyncio.ensure_future(self._fetch_report_page_async(
+                    client, start_date, end_date, cursor, order_status, shop_region, page_size))
+            
+            in_flight = start_fetch("")
+            page_num = 1
+            try:
+                while in_flight is not None:
+                    try:
+                        result = await in_flight
+                    except (ResilienceError, httpx.HTTPError) as e:
+                        logger.error(f"❌ Failed to fetch page {page_num}: {e}")
+                        return
+                    in_flight = None
+                    if not result:
+                        logger.error(f"❌ Failed to fetch page {page_num}")
+                        return
+                    
+                    # Prefetch the next page before handing this one to the caller
+                    if result.get('cursor'):
+                        in_flight = start_fetch(result['cursor'])
+                    logger.info(f"📦 Page {page_num}: {len(result['orders'])} orders")
+                    yield result
+                    page_num += 1
+            finally:
+                if in_flight is not None and not in_flight.done():
+                    in_flight.cancel()
+    
+    async def get_all_conversion_data_async(self,
+                                            start_date: str,
+                                            end_date: str,
+                                            order_status: List[str] = None,
+                                            shop_region: str = DEFAULT_SHOP_REGION,
+                                            analyzer=None) -> Optional[List[Dict]]:
+        """
+        Async variant of get_all_conversion_data with cursor prefetching
+        
+        Args:
+            analyzer: Optional ConversionAnalyzer; each page is streamed into
+                      analyzer.add_orders() in a worker thread while the next page downloads
+            
+        Returns:
+            List of all orders, or None if the first page failed
+        """
+        all_orders = []
+        pages = 0
+        logger.info("📊 Getting all conversion data with cursor prefetching...")
+        
+        async for result in self.iter_conversion_pages_async(start_date, end_date, order_status, shop_region):
+            orders = result.get('orders', [])
+            all_orders.extend(orders)
+            pages += 1
+            if analyzer is not None and orders:
+                await asyncio.to_thread(analyzer.add_orders, orders)
+        
+        if pages == 0:
+            return None
+        logger.info(f"✅ Retrieved all conversion data: {len(all_orders)} total orders in {pages} pages")
+        return all_orders
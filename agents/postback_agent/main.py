@@ -16,6 +16,16 @@ import uvicorn
 from typing import Optional, Dict, Any
 import time
 
+try:
+    from app.middleware.rate_limit import TenantRateLimitMiddleware
+except ImportError:
+    TenantRateLimitMiddleware = None
+
+try:
+    from app.services.conversion_writer import shutdown_conversion_write_buffer
+except ImportError:
+    shutdown_conversion_write_buffer = None
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -45,6 +55,9 @@ async def lifespan(app: FastAPI):
         raise
     finally:
         logger.info("🔄 Postback-Agent 关闭中...")
+        # 写完write-behind缓冲区中尚未写入数据库的conversion
+        if shutdown_conversion_write_buffer is not None:
+            await shutdown_conversion_write_buffer()
 
 def create_app() -> FastAPI:
     """Create FastAPI application"""
@@ -55,6 +68,12 @@ def create_app() -> FastAPI:
         lifespan=lifespan
     )
     
+    # Add tenant rate limit middleware (429 before reading the request body)
+    if TenantRateLimitMiddleware is not None:
+        app.add_middleware(TenantRateLimitMiddleware)
+    else:
+        logger.warning("⚠️ 限流中间件不可用，跳过租户限流")
+    
     # Add CORS middleware
     app.add_middleware(
         CORSMiddleware,
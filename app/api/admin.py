@@ -12,6 +12,7 @@ from sqlalchemy import text
 
 from app.models.database import get_db
 from app.models.partner import Partner
+from app.services.lookup_cache import get_partner_cache, get_tenant_cache, invalidate_lookup_caches
 
 logger = logging.getLogger(__name__)
 
@@ -153,7 +154,21 @@ async def init_database(db: AsyncSession = Depends(get_db)):
             CREATE INDEX IF NOT EXISTS idx_partner_conversions_received_at ON partner_conversions(received_at);
         """))
         
+        # 去重所需的唯一索引（INSERT ... ON CONFLICT），已有重複數據時跳過，不影響其餘初始化
+        for table, index_sql in (
+            ("partner_conversions", "CREATE UNIQUE INDEX IF NOT EXISTS idx_partner_conversion "
+                                    "ON partner_conversions(partner_id, conversion_id)"),
+            ("postback_conversions", "CREATE UNIQUE INDEX IF NOT EXISTS idx_tenant_conversion "
+                                     "ON postback_conversions(tenant_id, conversion_id)"),
+        ):
+            try:
+                async with db.begin_nested():
+                    await db.execute(text(index_sql))
+            except Exception as e:
+                logger.warning(f"⚠️ 無法為 {table} 創建唯一索引: {str(e)}")
+        
         await db.commit()
+        invalidate_lookup_caches()
         
         # 驗證數據
         result = await db.execute(text("SELECT COUNT(*) FROM partners WHERE is_active = TRUE"))
@@ -184,6 +199,19 @@ async def init_database(db: AsyncSession = Depends(get_db)):
         await db.rollback()
         raise HTTPException(status_code=500, detail=f"數據庫初始化失敗: {str(e)}")
 
+@router.post("/cache/invalidate")
+async def invalidate_cache():
+    """
+    清空Partner和租戶的查找緩存（直接修改數據庫配置後調用，無需等待TTL或版本檢查）
+    """
+    invalidate_lookup_caches()
+    return JSONResponse({
+        "status": "success",
+        "message": "查找緩存已清空",
+        "partner_cache": get_partner_cache().stats,
+        "tenant_cache": get_tenant_cache().stats
+    })
+
 @router.get("/partners")
 async def list_partners(db: AsyncSession = Depends(get_db)):
     """
@@ -102,23 +102,8 @@ async def dynamic_partner_endpoint(
             # 合併映射後的數據
             raw_data.update(mapped_data)
         
-        # 步驟4: 檢查重複轉化
-        logger.info(f"🔍 步驟4: 檢查重複轉化")
-        if conversion_id:
-            is_duplicate = await partner_service.check_duplicate_conversion(
-                partner.id, conversion_id
-            )
-            if is_duplicate:
-                logger.warning(f"⚠️ 發現重複轉化: conversion_id={conversion_id}")
-                return JSONResponse({
-                    "status": "duplicate",
-                    "partner": partner.partner_name,
-                    "conversion_id": conversion_id,
-                    "message": "Duplicate conversion detected"
-                })
-        
-        # 步驟5: 創建轉化記錄
-        logger.info(f"💾 步驟5: 創建轉化記錄")
+        # 步驟4: 創建轉化記錄（寫入時去重，無需預先查詢）
+        logger.info(f"💾 步驟4: 創建轉化記錄")
         conversion = await partner_service.create_partner_conversion(
             partner_id=partner.id,
             raw_data=raw_data,
@@ -133,8 +118,16 @@ async def dynamic_partner_endpoint(
                 detail="Failed to create conversion record"
             )
         
-        # 步驟6: 標記為已處理
-        logger.info(f"✅ 步驟6: 標記為已處理")
+        if conversion.is_duplicate:
+            return JSONResponse({
+                "status": "duplicate",
+                "partner": partner.partner_name,
+                "conversion_id": conversion.conversion_id,
+                "message": "Duplicate conversion detected"
+            })
+        
+        # 步驟5: 標記為已處理
+        logger.info(f"✅ 步驟5: 標記為已處理")
         await partner_service.mark_conversion_processed(conversion.id)
         
         # 計算處理時間
@@ -243,24 +236,8 @@ async def dynamic_partner_endpoint_post(
             
             raw_data.update(mapped_data)
         
-        # 步驟4: 檢查重複轉化
-        logger.info(f"🔍 步驟4: 檢查重複轉化")
-        conversion_id = raw_data.get('conversion_id')
-        if conversion_id:
-            is_duplicate = await partner_service.check_duplicate_conversion(
-                partner.id, conversion_id
-            )
-            if is_duplicate:
-                logger.warning(f"⚠️ 發現重複轉化: conversion_id={conversion_id}")
-                return JSONResponse({
-                    "status": "duplicate",
-                    "partner": partner.partner_name,
-                    "conversion_id": conversion_id,
-                    "message": "Duplicate conversion detected"
-                })
-        
-        # 步驟5: 創建轉化記錄
-        logger.info(f"💾 步驟5: 創建轉化記錄")
+        # 步驟4: 創建轉化記錄（寫入時去重，無需預先查詢）
+        logger.info(f"💾 步驟4: 創建轉化記錄")
         conversion = await partner_service.create_partner_conversion(
             partner_id=partner.id,
             raw_data=raw_data,
@@ -275,8 +252,16 @@ async def dynamic_partner_endpoint_post(
                 detail="Failed to create conversion record"
             )
         
-        # 步驟6: 標記為已處理
-        logger.info(f"✅ 步驟6: 標記為已處理")
+        if conversion.is_duplicate:
+            return JSONResponse({
+                "status": "duplicate",
+                "partner": partner.partner_name,
+                "conversion_id": conversion.conversion_id,
+                "message": "Duplicate conversion detected"
+            })
+        
+        # 步驟5: 標記為已處理
+        logger.info(f"✅ 步驟5: 標記為已處理")
         await partner_service.mark_conversion_processed(conversion.id)
         
         # 計算處理時間
@@ -10,7 +10,6 @@ from fastapi.responses import PlainTextResponse, JSONResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional, Dict, Any
 import logging
-from datetime import datetime
 
 # 简化的导入，避免复杂依赖
 try:
@@ -20,18 +19,24 @@ try:
     from app.services.token_service import TokenService
     from app.middleware.auth import verify_tenant_token
     from app.config import settings
+    from app.services.conversion_writer import (
+        INSERT_CONVERSION_SQL, build_conversion_row,
+        get_conversion_write_buffer, shutdown_conversion_write_buffer,
+    )
     DB_AVAILABLE = True
 except ImportError:
     DB_AVAILABLE = False
 
+from app.services.postback_record_store import get_postback_record_store
+
 logger = logging.getLogger(__name__)
 
 # 创建路由器，移除prefix以便直接访问 /involve/event
-router = APIRouter(tags=["Postback"])
+# 应用关闭时写完write-behind缓冲区中的数据（使用lifespan的应用需在lifespan中调用 shutdown_conversion_write_buffer）
+router = APIRouter(tags=["Postback"], on_shutdown=[shutdown_conversion_write_buffer] if DB_AVAILABLE else [])
 
-# 内存存储（用于简化测试）
-postback_records = []
-record_counter = 0
+# 内存存储（用于简化测试）：固定容量的最近记录 + 增量统计
+postback_store = get_postback_record_store()
 
 # 数据库存储函数
 async def store_conversion_to_db(
@@ -40,55 +45,42 @@ async def store_conversion_to_db(
     request_info: Dict[str, Any],
     partner_id: int = 1  # 添加partner_id参数，默认为involve_asia (ID=1)
 ):
-    """存储转化数据到数据库"""
+    """
+    存储转化数据到数据库
+
+    启用write-behind时只把规整后的数据放入写入缓冲区，由后台任务批量写入；
+    否则立即INSERT并提交
+
+    Returns:
+        str: "stored"（已提交）、"queued"（已进入写入缓冲区，尚未写入）或 "failed"
+    """
+    row = build_conversion_row(conversion_data, partner_id)
+    if settings.postback_write_behind:
+        try:
+            await get_conversion_write_buffer().enqueue(row)
+            return "queued"
+        except Exception as e:
+            logger.error(f"❌ 写入缓冲区入队失败，改为直接写入: {str(e)}")
+    
     try:
-        # 直接插入conversions表
-        from sqlalchemy import text
-        import json
-        
-        # 解析时间
-        datetime_conversion = None
-        if conversion_data.get('conversion_datetime'):
-            try:
-                datetime_conversion = datetime.fromisoformat(conversion_data['conversion_datetime'].replace('Z', '+00:00'))
-            except:
-                pass
-        
-        # 将conversion_data转换为JSON字符串
-        raw_data_json = json.dumps(conversion_data)
-        
-        # 插入数据，添加partner_id字段
-        await db.execute(text("""
-            INSERT INTO conversions (
-                tenant_id, conversion_id, offer_name, 
-                usd_sale_amount, usd_payout, aff_sub, 
-                event_time, raw_data, created_at, partner_id
-            ) VALUES (
-                :tenant_id, :conversion_id, :offer_name,
-                :usd_sale_amount, :usd_payout, :aff_sub,
-                :event_time, :raw_data, :created_at, :partner_id
-            )
-        """), {
-            'tenant_id': 1,  # 默认租户
-            'conversion_id': conversion_data.get('conversion_id'),
-            'offer_name': conversion_data.get('offer_name'),
-            'usd_sale_amount': conversion_data.get('usd_sale_amount'),
-            'usd_payout': conversion_data.get('usd_payout'),
-            'aff_sub': conversion_data.get('aff_sub'),
-            'event_time': datetime_conversion,
-            'raw_data': raw_data_json,  # 使用JSON字符串
-            'created_at': datetime.utcnow(),
-            'partner_id': partner_id  # 添加partner_id
-        })
-        
+        await db.execute(INSERT_CONVERSION_SQL, row)
         await db.commit()
         logger.info(f"✅ 数据库存储成功: conversion_id={conversion_data.get('conversion_id')}, partner_id={partner_id}")
-        return True
+        return "stored"
         
     except Exception as e:
         logger.error(f"❌ 数据库存储失败: {str(e)}")
         await db.rollback()
-        return False
+        return "failed"
+
+
+def describe_storage(subject: str, db_status: str) -> str:
+    """按存储状态生成响应消息，write-behind入队的数据不报告为已存储"""
+    if db_status == "stored":
+        return f"{subject} received and stored successfully"
+    if db_status == "queued":
+        return f"{subject} received and queued for storage"
+    return f"{subject} received but not stored in database"
 
 
 # ====== ByteC定制化Endpoint ======
@@ -132,11 +124,10 @@ async def bytec_involve_endpoint(
     - conversion_id -> conversion_id
     - conversion_datetime -> datetime_conversion
     """
-    global record_counter
     start_time = time.time()
     
     try:
-        record_counter += 1
+        record_id = postback_store.next_id()
         
         # 安全转换字符串到数字的函数
         def safe_float_convert(value):
@@ -179,7 +170,7 @@ async def bytec_involve_endpoint(
         }
         
         # 存储到数据库
-        db_success = False
+        db_status = "skipped"
         if DB_AVAILABLE and db:
             request_info = {
                 "method": request.method,
@@ -188,29 +179,30 @@ async def bytec_involve_endpoint(
                 "client_ip": request.client.host if request.client else "unknown"
             }
             
-            db_success = await store_conversion_to_db(db, processed_data, request_info, partner_id=1)  # InvolveAsia ID=1
+            db_status = await store_conversion_to_db(db, processed_data, request_info, partner_id=1)  # InvolveAsia ID=1
         
         # 存储到内存记录（备用）
         record = {
-            "id": record_counter,
+            "id": record_id,
             "timestamp": time.time(),
             "method": "GET",
             "endpoint": "/involve/event",
             "data": processed_data,
             "processing_time_ms": 0,
-            "db_stored": db_success
+            "db_stored": db_status == "stored",
+            "db_queued": db_status == "queued"
         }
         
         # 计算处理时间
         processing_time = (time.time() - start_time) * 1000
         record["processing_time_ms"] = processing_time
         
-        postback_records.append(record)
+        postback_store.add(record, partner="involve")
         
         # 记录日志
         logger.info(f"ByteC Involve Postback处理完成: conversion_id={conversion_id}, "
                    f"click_id={click_id}, media_id={media_id}, "
-                   f"usd_payout={usd_payout}, db_stored={db_success}, time={processing_time:.2f}ms")
+                   f"usd_payout={usd_payout}, db_status={db_status}, time={processing_time:.2f}ms")
         
         # 返回JSON响应（便于调试）
         return JSONResponse({
@@ -218,9 +210,10 @@ async def bytec_involve_endpoint(
             "method": "GET",
             "endpoint": "/involve/event",
             "data": processed_data,
-            "record_id": record_counter,
-            "db_stored": db_success,
-            "message": "Event received and stored successfully"
+            "record_id": record_id,
+            "db_stored": db_status == "stored",
+            "db_queued": db_status == "queued",
+            "message": describe_storage("Event", db_status)
         })
         
     except Exception as e:
@@ -263,11 +256,10 @@ async def bytec_involve_endpoint_post(
     """
     ByteC定制化Involve Postback端点 (POST方法)
     """
-    global record_counter
     start_time = time.time()
     
     try:
-        record_counter += 1
+        record_id = postback_store.next_id()
         
         # 安全转换字符串到数字的函数
         def safe_float_convert(value):
@@ -330,7 +322,7 @@ async def bytec_involve_endpoint_post(
         }
         
         # 存储到数据库
-        db_success = False
+        db_status = "skipped"
         if DB_AVAILABLE and db:
             request_info = {
                 "method": request.method,
@@ -339,29 +331,30 @@ async def bytec_involve_endpoint_post(
                 "client_ip": request.client.host if request.client else "unknown"
             }
             
-            db_success = await store_conversion_to_db(db, processed_data, request_info, partner_id=1)  # InvolveAsia ID=1
+            db_status = await store_conversion_to_db(db, processed_data, request_info, partner_id=1)  # InvolveAsia ID=1
         
         # 存储到内存记录（备用）
         record = {
-            "id": record_counter,
+            "id": record_id,
             "timestamp": time.time(),
             "method": "POST",
             "endpoint": "/involve/event",
             "data": processed_data,
             "processing_time_ms": 0,
-            "db_stored": db_success
+            "db_stored": db_status == "stored",
+            "db_queued": db_status == "queued"
         }
         
         # 计算处理时间
         processing_time = (time.time() - start_time) * 1000
         record["processing_time_ms"] = processing_time
         
-        postback_records.append(record)
+        postback_store.add(record, partner="involve")
         
         # 记录日志
         logger.info(f"ByteC Involve Postback (POST) 处理完成: conversion_id={final_params['conversion_id']}, "
                    f"click_id={final_params['click_id']}, media_id={final_params['media_id']}, "
-                   f"usd_payout={final_params['usd_payout']}, db_stored={db_success}, time={processing_time:.2f}ms")
+                   f"usd_payout={final_params['usd_payout']}, db_status={db_status}, time={processing_time:.2f}ms")
         
         # 返回JSON响应
         return JSONResponse({
@@ -369,9 +362,10 @@ async def bytec_involve_endpoint_post(
             "method": "POST",
             "endpoint": "/involve/event",
             "data": processed_data,
-            "record_id": record_counter,
-            "db_stored": db_success,
-            "message": "Event received and stored successfully"
+            "record_id": record_id,
+            "db_stored": db_status == "stored",
+            "db_queued": db_status == "queued",
+            "message": describe_storage("Event", db_status)
         })
         
     except Exception as e:
@@ -427,11 +421,10 @@ async def bytec_acesstrade_endpoint(
     - conversion_id -> conversion_id
     - conversion_datetime -> datetime_conversion
     """
-    global record_counter
     start_time = time.time()
     
     try:
-        record_counter += 1
+        record_id = postback_store.next_id()
         
         # 安全转换字符串到数字的函数
         def safe_float_convert(value):
@@ -475,7 +468,7 @@ async def bytec_acesstrade_endpoint(
         }
         
         # 存储到数据库
-        db_success = False
+        db_status = "skipped"
         if DB_AVAILABLE and db:
             request_info = {
                 "method": request.method,
@@ -484,29 +477,30 @@ async def bytec_acesstrade_endpoint(
                 "client_ip": request.client.host if request.client else "unknown"
             }
             
-            db_success = await store_conversion_to_db(db, processed_data, request_info, partner_id=2) # AccessTrade ID is 2
+            db_status = await store_conversion_to_db(db, processed_data, request_info, partner_id=2) # AccessTrade ID is 2
         
         # 存储到内存记录（备用）
         record = {
-            "id": record_counter,
+            "id": record_id,
             "timestamp": time.time(),
             "method": "GET",
             "endpoint": "/acesstrade/event",
             "data": processed_data,
             "processing_time_ms": 0,
-            "db_stored": db_success
+            "db_stored": db_status == "stored",
+            "db_queued": db_status == "queued"
         }
         
         # 计算处理时间
         processing_time = (time.time() - start_time) * 1000
         record["processing_time_ms"] = processing_time
         
-        postback_records.append(record)
+        postback_store.add(record, partner="acesstrade")
         
         # 记录日志
         logger.info(f"ByteC AccessTrade Postback处理完成: conversion_id={conversion_id}, "
                    f"click_id={click_id}, media_id={media_id}, "
-                   f"usd_payout={usd_payout}, db_stored={db_success}, time={processing_time:.2f}ms")
+                   f"usd_payout={usd_payout}, db_status={db_status}, time={processing_time:.2f}ms")
         
         # 返回JSON响应（便于调试）
         return JSONResponse({
@@ -514,9 +508,10 @@ async def bytec_acesstrade_endpoint(
             "method": "GET",
             "endpoint": "/acesstrade/event",
             "data": processed_data,
-            "record_id": record_counter,
-            "db_stored": db_success,
-            "message": "AccessTrade event received and stored successfully"
+            "record_id": record_id,
+            "db_stored": db_status == "stored",
+            "db_queued": db_status == "queued",
+            "message": describe_storage("AccessTrade event", db_status)
         })
         
     except Exception as e:
@@ -572,11 +567,10 @@ async def bytec_digenesia_endpoint(
     - conversion_id -> conversion_id
     - conversion_datetime -> datetime_conversion
     """
-    global record_counter
     start_time = time.time()
     
     try:
-        record_counter += 1
+        record_id = postback_store.next_id()
         
         # 安全转换字符串到数字的函数
         def safe_float_convert(value):
@@ -620,7 +614,7 @@ async def bytec_digenesia_endpoint(
         }
         
         # 存储到数据库
-        db_success = False
+        db_status = "skipped"
         if DB_AVAILABLE and db:
             request_info = {
                 "method": request.method,
@@ -629,29 +623,30 @@ async def bytec_digenesia_endpoint(
                 "client_ip": request.client.host if request.client else "unknown"
             }
             
-            db_success = await store_conversion_to_db(db, processed_data, request_info, partner_id=2)  # Digenesia ID=2
+            db_status = await store_conversion_to_db(db, processed_data, request_info, partner_id=2)  # Digenesia ID=2
         
         # 存储到内存记录（备用）
         record = {
-            "id": record_counter,
+            "id": record_id,
             "timestamp": time.time(),
             "method": "GET",
             "endpoint": "/digenesia/event",
             "data": processed_data,
             "processing_time_ms": 0,
-            "db_stored": db_success
+            "db_stored": db_status == "stored",
+            "db_queued": db_status == "queued"
         }
         
         # 计算处理时间
         processing_time = (time.time() - start_time) * 1000
         record["processing_time_ms"] = processing_time
         
-        postback_records.append(record)
+        postback_store.add(record, partner="digenesia")
         
         # 记录日志
         logger.info(f"ByteC Digenesia Postback处理完成: conversion_id={conversion_id}, "
                    f"click_id={click_id}, media_id={media_id}, "
-                   f"usd_payout={usd_payout}, db_stored={db_success}, time={processing_time:.2f}ms")
+                   f"usd_payout={usd_payout}, db_status={db_status}, time={processing_time:.2f}ms")
         
         # 返回JSON响应（便于调试）
         return JSONResponse({
@@ -659,9 +654,10 @@ async def bytec_digenesia_endpoint(
             "method": "GET",
             "endpoint": "/digenesia/event",
             "data": processed_data,
-            "record_id": record_counter,
-            "db_stored": db_success,
-            "message": "Digenesia event received and stored successfully"
+            "record_id": record_id,
+            "db_stored": db_status == "stored",
+            "db_queued": db_status == "queued",
+            "message": describe_storage("Digenesia event", db_status)
         })
         
     except Exception as e:
@@ -683,10 +679,11 @@ async def get_involve_records(limit: int = Query(10, description="返回记录
     """
     获取最近的involve事件记录
     """
-    recent_records = postback_records[-limit:] if postback_records else []
+    recent_records = postback_store.recent(limit)
     return {
         "status": "success",
-        "total_records": len(postback_records),
+        "total_records": postback_store.total,
+        "retained_records": len(postback_store),
         "recent_records": recent_records,
         "message": f"返回最近{len(recent_records)}条记录"
     }
@@ -702,7 +699,7 @@ async def involve_health_check():
         "service": "ByteC Postback System",
         "endpoint": "/involve/event",
         "methods": ["GET", "POST"],
-        "total_records": len(postback_records),
+        "total_records": postback_store.total,
         "timestamp": time.time(),
         "database_enabled": DB_AVAILABLE
     }
@@ -801,11 +798,10 @@ async def postback_endpoint_get(
     接收电商平台的转化回传数据，这是系统的核心入口点。
     支持Involve Asia标准的所有参数，同时支持多租户Token验证。
     """
-    global record_counter
     start_time = time.time()
     
     try:
-        record_counter += 1
+        record_id = postback_store.next_id()
         
         # 构造处理后的数据
         processed_data = {
@@ -841,7 +837,7 @@ async def postback_endpoint_get(
         
         # 存储到内存记录
         record = {
-            "id": record_counter,
+            "id": record_id,
             "timestamp": time.time(),
             "method": "GET",
             "endpoint": "/postback/",
@@ -853,7 +849,7 @@ async def postback_endpoint_get(
         processing_time = (time.time() - start_time) * 1000
         record["processing_time_ms"] = processing_time
         
-        postback_records.append(record)
+        postback_store.add(record, partner="unknown")
         
         # 记录日志
         logger.info(f"Postback处理完成: conversion_id={conversion_id}, "
@@ -865,7 +861,7 @@ async def postback_endpoint_get(
             "method": "GET",
             "endpoint": "/postback/",
             "data": processed_data,
-            "record_id": record_counter,
+            "record_id": record_id,
             "message": "Postback received successfully"
         })
         
@@ -894,11 +890,10 @@ async def postback_endpoint_post(
     
     提供JSON格式的Postback数据接收，适用于高级集成场景。
     """
-    global record_counter
     start_time = time.time()
     
     try:
-        record_counter += 1
+        record_id = postback_store.next_id()
         
         # 尝试从POST body中获取数据
         body_data = {}
@@ -924,7 +919,7 @@ async def postback_endpoint_post(
         
         # 存储到内存记录
         record = {
-            "id": record_counter,
+            "id": record_id,
             "timestamp": time.time(),
             "method": "POST",
             "endpoint": "/postback/",
@@ -936,9 +931,9 @@ async def postback_endpoint_post(
         processing_time = (time.time() - start_time) * 1000
         record["processing_time_ms"] = processing_time
         
-        postback_records.append(record)
+        postback_store.add(record, partner="unknown")
         
-        logger.info(f"Postback(POST)处理完成: record_id={record_counter}, "
+        logger.info(f"Postback(POST)处理完成: record_id={record_id}, "
                    f"time={processing_time:.2f}ms")
         
         return JSONResponse({
@@ -946,7 +941,7 @@ async def postback_endpoint_post(
             "method": "POST",
             "endpoint": "/postback/",
             "data": processed_data,
-            "record_id": record_counter,
+            "record_id": record_id,
             "message": "Postback received successfully"
         })
         
@@ -974,12 +969,13 @@ async def get_conversions(
     """
     try:
         # 从内存记录中获取数据
-        total_records = len(postback_records)
-        records = postback_records[offset:offset + limit] if postback_records else []
+        # 内存中只保留最近的 postback_records_capacity 条记录，offset 相对于保留的最旧记录
+        records = postback_store.page(offset, limit)
         
         return {
             "status": "success",
-            "total_records": total_records,
+            "total_records": postback_store.total,
+            "retained_records": len(postback_store),
             "limit": limit,
             "offset": offset,
             "records": records,
@@ -1007,7 +1003,7 @@ async def health_check():
             "status": "healthy",
             "timestamp": time.time(),
             "database": "memory_storage",
-            "total_records": len(postback_records),
+            "total_records": postback_store.total,
             "message": "Postback service is running normally"
         }
         
@@ -1031,34 +1027,27 @@ async def get_stats(
     提供实时的转换统计数据，用于监控和分析。
     """
     try:
-        # 计算统计数据
+        # 统计数据在写入时增量维护，这里只汇总指定时间范围内的时间桶
         current_time = time.time()
-        cutoff_time = current_time - (hours * 3600)
-        
-        # 过滤指定时间范围内的记录
-        recent_records = [r for r in postback_records if r.get("timestamp", 0) >= cutoff_time]
-        
-        # 按方法分组统计
-        get_count = sum(1 for r in recent_records if r.get("method") == "GET")
-        post_count = sum(1 for r in recent_records if r.get("method") == "POST")
-        
-        # 按端点分组统计
-        involve_count = sum(1 for r in recent_records if "/involve/event" in r.get("endpoint", ""))
-        postback_count = sum(1 for r in recent_records if "/postback/" in r.get("endpoint", ""))
+        recent = postback_store.stats(hours)
         
         stats = {
             "status": "success",
             "time_range_hours": hours,
-            "total_records": len(postback_records),
-            "recent_records": len(recent_records),
+            "total_records": postback_store.total,
+            "recent_records": recent["count"],
             "by_method": {
-                "GET": get_count,
-                "POST": post_count
+                "GET": recent["by_method"].get("GET", 0),
+                "POST": recent["by_method"].get("POST", 0)
             },
             "by_endpoint": {
-                "involve_event": involve_count,
-                "postback": postback_count
+                "involve_event": recent["by_endpoint"].get("involve_event", 0),
+                "postback": recent["by_endpoint"].get("postback", 0),
+                **recent["by_endpoint"]
             },
+            "by_partner": recent["by_partner"],
+            "by_status": recent["by_status"],
+            "partner_totals": recent["partner_totals"],
             "timestamp": current_time
         }
         
@@ -4,7 +4,7 @@ Postback系统配置文件
 """
 
 import os
-from typing import Optional
+from typing import List, Optional
 try:
     from pydantic_settings import BaseSettings
 except ImportError:
@@ -46,6 +46,36 @@ class Settings(BaseSettings):
     max_requests_per_minute: int = Field(default=1000, env="MAX_REQUESTS_PER_MINUTE")
     enable_duplicate_check: bool = Field(default=True, env="ENABLE_DUPLICATE_CHECK")
     
+    # Postback write-behind批量写入配置
+    # 开启后请求先返回、数据在缓冲区停留最多 postback_flush_interval_ms 再批量写库；
+    # 实例被回收（如Cloud Run缩容）且未执行关闭流程时，缓冲区中的数据会丢失，因此默认关闭（每个请求直接写库）
+    postback_write_behind: bool = Field(default=False, env="POSTBACK_WRITE_BEHIND")
+    postback_batch_size: int = Field(default=500, env="POSTBACK_BATCH_SIZE")  # 每批最多写入的条数
+    postback_flush_interval_ms: int = Field(default=200, env="POSTBACK_FLUSH_INTERVAL_MS")  # 持久化窗口：数据在缓冲区的最长停留时间
+    postback_buffer_size: int = Field(default=20000, env="POSTBACK_BUFFER_SIZE")  # 缓冲区上限，满时端点等待
+    
+    # Postback内存记录配置
+    postback_records_capacity: int = Field(default=1000, env="POSTBACK_RECORDS_CAPACITY")  # 内存中保留的最近记录数
+    postback_stats_retention_hours: int = Field(default=168, env="POSTBACK_STATS_RETENTION_HOURS")  # 按时间范围统计可追溯的小时数
+    
+    # Partner/租户查找缓存配置
+    lookup_cache_ttl_seconds: int = Field(default=300, env="LOOKUP_CACHE_TTL_SECONDS")  # 缓存条目的有效期
+    lookup_cache_version_check_seconds: int = Field(default=30, env="LOOKUP_CACHE_VERSION_CHECK_SECONDS")  # 检查表版本（其他实例的修改）的间隔
+    lookup_cache_max_entries: int = Field(default=10000, env="LOOKUP_CACHE_MAX_ENTRIES")  # 每个缓存的最大条目数
+    
+    # 转化写入时去重配置
+    dedup_lru_size: int = Field(default=100000, env="DEDUP_LRU_SIZE")  # 进程内记住的最近conversion_id数量
+    
+    # 租户限流配置（每分钟上限使用 max_requests_per_minute）
+    rate_limit_enabled: bool = Field(default=True, env="RATE_LIMIT_ENABLED")
+    rate_limit_backend: str = Field(default="memory", env="RATE_LIMIT_BACKEND")  # memory | redis（多实例共享计数）
+    rate_limit_default_daily_quota: int = Field(default=100000, env="RATE_LIMIT_DEFAULT_DAILY_QUOTA")  # 缓存中没有租户/Partner配置时的每日配额
+    rate_limit_max_keys: int = Field(default=10000, env="RATE_LIMIT_MAX_KEYS")  # 进程内计数的最大键数
+    rate_limit_exempt_paths: List[str] = Field(
+        default=["/", "/health", "/postback/health", "/involve/health"],
+        env="RATE_LIMIT_EXEMPT_PATHS"
+    )  # 不限流的路径（健康检查等）
+    
     # 日志配置
     log_level: str = Field(default="INFO", env="LOG_LEVEL")
     log_format: str = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
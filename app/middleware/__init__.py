@@ -3,7 +3,9 @@
 """
 
 from .auth import verify_tenant_token
+from .rate_limit import TenantRateLimitMiddleware
 
 __all__ = [
-    "verify_tenant_token"
+    "verify_tenant_token",
+    "TenantRateLimitMiddleware"
 ] 
\ No newline at end of file
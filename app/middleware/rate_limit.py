@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+租户限流中间件
+每个租户（按Token识别）或每个Postback端点（无Token的Partner回传）独立计数，
+缓存中没有识别结果的Token按端点共用一个计数（轮换Token不会产生新的计数键）：
+- 滑动窗口：按前后两个一分钟窗口加权估算最近60秒的请求数，上限 max_requests_per_minute
+- 每日配额：按UTC日期计数，上限取 Tenant / Partner 的 max_daily_requests（缓存中没有时用默认值）
+
+超限请求在读取请求体、查询数据库之前直接返回429，单个租户的重试风暴不会占满接收服务。
+计数默认在进程内；rate_limit_backend=redis 时使用Redis共享计数（多实例部署），
+Redis不可用时退回进程内计数
+"""
+
+import json
+import logging
+import time
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs
+
+from app.config import settings
+from app.services.lookup_cache import get_partner_cache, get_tenant_cache
+
+try:
+    from redis import asyncio as redis_asyncio
+except ImportError:
+    redis_asyncio = None
+
+logger = logging.getLogger(__name__)
+
+ALLOWED = 0
+WINDOW_EXCEEDED = 1
+DAILY_QUOTA_EXCEEDED = 2
+
+# 进程内计数的键超过上限时，新的未识别键共用这个计数
+OVERFLOW_KEY = "overflow"
+
+# 已识别的租户 / Partner 的键（数量受配置表限制），始终独立计数，不会并入 OVERFLOW_KEY
+RESOLVED_KEY_PREFIXES = ("tenant:", "partner:")
+
+# Redis中原子地检查并计数（与 MemoryRateLimitStore.hit 的逻辑一致）
+_REDIS_HIT_SCRIPT = """
+local current = tonumber(redis.call('GET', KEYS[1]) or '0')
+local previous = tonumber(redis.call('GET', KEYS[2]) or '0')
+local daily = tonumber(redis.call('GET', KEYS[3]) or '0')
+local weight = tonumber(ARGV[1])
+local window_limit = tonumber(ARGV[2])
+local daily_limit = tonumber(ARGV[3])
+if daily_limit > 0 and daily >= daily_limit then return 2 end
+if window_limit > 0 and previous * weight + current >= window_limit then return 1 end
+redis.call('INCR', KEYS[1])
+redis.call('EXPIRE', KEYS[1], 120)
+redis.call('INCR', KEYS[3])
+redis.call('EXPIRE', KEYS[3], 90000)
+return 0
+"""
+
+
+class MemoryRateLimitStore:
+    """进程内计数：每个键保存 [当前分钟, 当前分钟计数, 上一分钟计数, UTC日期, 当日计数]"""
+
+    def __init__(self, max_keys: Optional[int] = None):
+        self.max_keys = max_keys or settings.rate_limit_max_keys
+        self._counters: Dict[str, List[int]] = {}
+
+    def _counter(self, key: str, minute: int, day: int) -> List[int]:
+        counter = self._counters.get(key)
+        if counter is not None:
+            return counter
+        if len(self._counters) >= self.max_keys:
+            # 清理一分钟以上没有请求、且不在当日的键
+            self._counters = {k: c for k, c in self._counters.items() if c[0] >= minute - 1 or c[3] == day}
+            if len(self._counters) >= self.max_keys and not key.startswith(RESOLVED_KEY_PREFIXES):
+                key = OVERFLOW_KEY
+        return self._counters.setdefault(key, [minute, 0, 0, day, 0])
+
+    async def hit(self, key: str, now: float, window_limit: int, daily_limit: int) -> int:
+        minute, day = int(now // 60), int(now // 86400)
+        counter = self._counter(key, minute, day)
+        if counter[0] != minute:
+            counter[2] = counter[1] if counter[0] == minute - 1 else 0
+            counter[0], counter[1] = minute, 0
+        if counter[3] != day:
+            counter[3], counter[4] = day, 0
+
+        if daily_limit > 0 and counter[4] >= daily_limit:
+            return DAILY_QUOTA_EXCEEDED
+        weight = 1 - (now % 60) / 60
+        if window_limit > 0 and counter[2] * weight + counter[1] >= window_limit:
+            return WINDOW_EXCEEDED
+        counter[1] += 1
+        counter[4] += 1
+        return ALLOWED
+
+
+class RedisRateLimitStore:
+    """Redis共享计数（多实例部署），每次检查一个往返"""
+
+    def __init__(self, url: Optional[str] = None, password: Optional[str] = None):
+        self._client = redis_asyncio.from_url(url or settings.redis_url, password=password or settings.redis_password)
+        self._script = self._client.register_script(_REDIS_HIT_SCRIPT)
+
+    async def hit(self, key: str, now: float, window_limit: int, daily_limit: int) -> int:
+        minute, day = int(now // 60), int(now // 86400)
+        keys = [f"ratelimit:{key}:m:{minute}", f"ratelimit:{key}:m:{minute - 1}", f"ratelimit:{key}:d:{day}"]
+        weight = 1 - (now % 60) / 60
+        return int(await self._script(keys=keys, args=[weight, window_limit, daily_limit]))
+
+
+class TenantRateLimitMiddleware:
+    """
+    ASGI中间件：按租户 / 端点限流
+
+    使用方式: app.add_middleware(TenantRateLimitMiddleware)
+    """
+
+    def __init__(self, app, store=None, exempt_paths: Optional[List[str]] = None):
+        self.app = app
+        self.enabled = settings.rate_limit_enabled
+        self.window_limit = settings.max_requests_per_minute
+        self.default_daily_limit = settings.rate_limit_default_daily_quota
+        self.exempt_paths = set(exempt_paths if exempt_paths is not None else settings.rate_limit_exempt_paths)
+        self.memory_store = MemoryRateLimitStore()
+        self.store = store or self._create_store()
+        self.stats = {'allowed': 0, 'rejected': 0}
+        self._warned: Dict[str, int] = {}
+
+    def _create_store(self):
+        if settings.rate_limit_backend == "redis":
+            if redis_asyncio is None:
+                logger.warning("⚠️ 未安装redis，限流使用进程内计数")
+            else:
+                return RedisRateLimitStore()
+        return self.memory_store
+
+    def _resolve(self, path: str, query_string: bytes) -> Tuple[str, int]:
+        """
+        识别限流对象和每日配额（只读取查询参数和进程内缓存，不访问数据库）
+
+        Returns:
+            (计数键, 每日配额)
+        """
+        params = parse_qs(query_string.decode('latin-1')) if query_string else {}
+        tokens = tuple((params.get(name) or [None])[0] for name in ("ts_token", "ts_param", "tlm_token"))
+        if any(tokens):
+            hit, tenant = get_tenant_cache().peek(tokens)
+            if hit and tenant is not None:
+                return f"tenant:{tenant.tenant_code}", tenant.max_daily_requests or self.default_daily_limit
+            # 不以原始Token作为键，避免轮换Token占满计数键
+            return f"unresolved:{path}", self.default_daily_limit
+
+        partner_cache = get_partner_cache()
+        for endpoint_path in (path, path.lstrip('/')):
+            hit, partner = partner_cache.peek(endpoint_path)
+            if hit and partner is not None:
+                return f"partner:{partner.partner_code}", partner.max_daily_requests or self.default_daily_limit
+        return f"endpoint:{path}", self.default_daily_limit
+
+    async def _check(self, key: str, daily_limit: int) -> int:
+        now = time.time()
+        if self.store is not self.memory_store:
+            try:
+                return await self.store.hit(key, now, self.window_limit, daily_limit)
+            except Exception as e:
+                logger.warning(f"⚠️ 共享限流计数失败，使用进程内计数: {str(e)}")
+        return await self.memory_store.hit(key, now, self.window_limit, daily_limit)
+
+    async def __call__(self, scope, receive, send):
+        if not self.enabled or scope["type"] != "http" or scope["path"] in self.exempt_paths:
+            await self.app(scope, receive, send)
+            return
+
+        key, daily_limit = self._resolve(scope["path"], scope.get("query_string", b""))
+        result = await self._check(key, daily_limit)
+        if result == ALLOWED:
+            self.stats['allowed'] += 1
+            await self.app(scope, receive, send)
+            return
+
+        self.stats['rejected'] += 1
+        now = time.time()
+        if result == DAILY_QUOTA_EXCEEDED:
+            retry_after = int(86400 - now % 86400) + 1
+            message = "Daily request quota exceeded"
+        else:
+            retry_after = int(60 - now % 60) + 1
+            message = "Rate limit exceeded"
+        # 重试风暴下每个键每分钟只记录一次日志
+        minute = int(now // 60)
+        if self._warned.get(key) != minute:
+            if len(self._warned) >= self.memory_store.max_keys:
+                self._warned.clear()
+            self._warned[key] = minute
+            logger.warning(f"🚦 限流拒绝: {key}, {message}")
+        await self._reject(send, message, retry_after)
+
+    @staticmethod
+    async def _reject(send, message: str, retry_after: int):
+        """直接返回429，不读取请求体"""
+        body = json.dumps({"status": "error", "message": message, "retry_after": retry_after}).encode('utf-8')
+        await send({
+            "type": "http.response.start",
+            "status": 429,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode('ascii')),
+                (b"retry-after", str(retry_after).encode('ascii')),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
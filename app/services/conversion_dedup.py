@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+转化数据的写入时去重
+代替“先SELECT检查重复、再INSERT”的两次数据库往返：
+- 进程内LRU记录最近写入/确认过的 (范围, conversion_id)，Partner重试或重复回传的请求在内存中直接判定为重复
+- 其余请求由唯一约束 + INSERT ... ON CONFLICT 在一条语句内完成插入或判重，并发下也不会重复写入
+
+数据库中还没有对应唯一索引（旧表未执行 /init-database）时，自动退回原有的先查询后插入方式
+"""
+
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Sequence, Set
+
+from sqlalchemy import and_, select
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class ConversionDeduplicator:
+    """最近写入过的conversion_id（LRU）"""
+
+    def __init__(self, lru_size: Optional[int] = None):
+        self.lru_size = max(1, lru_size or settings.dedup_lru_size)
+        self._recent: "OrderedDict[str, None]" = OrderedDict()
+        self.stats = {'memory_duplicates': 0, 'db_duplicates': 0, 'inserted': 0}
+
+    @staticmethod
+    def _key(scope: Hashable, conversion_id: str) -> str:
+        return f"{scope}:{conversion_id}"
+
+    def seen(self, scope: Hashable, conversion_id: str) -> bool:
+        """最近是否已写入/确认过该转化"""
+        key = self._key(scope, conversion_id)
+        if key in self._recent:
+            self._recent.move_to_end(key)
+            self.stats['memory_duplicates'] += 1
+            return True
+        return False
+
+    def remember(self, scope: Hashable, conversion_id: str):
+        key = self._key(scope, conversion_id)
+        self._recent[key] = None
+        self._recent.move_to_end(key)
+        if len(self._recent) > self.lru_size:
+            self._recent.popitem(last=False)
+
+
+_deduplicator: Optional[ConversionDeduplicator] = None
+# 数据库中缺少唯一索引、无法使用 ON CONFLICT 的表
+_on_conflict_unsupported: Set[str] = set()
+
+
+def get_conversion_deduplicator() -> ConversionDeduplicator:
+    """获取进程内共享的去重器"""
+    global _deduplicator
+    if _deduplicator is None:
+        _deduplicator = ConversionDeduplicator()
+    return _deduplicator
+
+
+def _is_missing_unique_index(error: DBAPIError) -> bool:
+    """ON CONFLICT 的冲突列上没有唯一索引/约束（PostgreSQL 42P10 / SQLite 对应错误信息）"""
+    orig = getattr(error, 'orig', None)
+    if getattr(orig, 'pgcode', None) == '42P10' or getattr(orig, 'sqlstate', None) == '42P10':
+        return True
+    return 'does not match any PRIMARY KEY or UNIQUE constraint' in str(orig)
+
+
+def _dialect_insert(db: AsyncSession):
+    """当前数据库方言支持 ON CONFLICT 的 insert 构造函数"""
+    dialect = db.bind.dialect.name if db.bind is not None else ""
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+        return insert
+    if dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+        return insert
+    return None
+
+
+async def _insert_with_precheck(db: AsyncSession, model, values: Dict[str, Any],
+                                conflict_columns: Sequence[str], upsert: bool) -> Optional[int]:
+    """原有方式：先查询是否存在再插入/更新"""
+    conditions = [getattr(model, column) == values[column] for column in conflict_columns]
+    existing = (await db.execute(select(model).where(and_(*conditions)))).scalar_one_or_none()
+    if existing is not None:
+        if not upsert:
+            return None
+        for column, value in values.items():
+            setattr(existing, column, value)
+        await db.commit()
+        return existing.id
+    record = model(**values)
+    db.add(record)
+    await db.commit()
+    return record.id
+
+
+async def insert_conversion(db: AsyncSession, model, values: Dict[str, Any],
+                            conflict_columns: Sequence[str], scope: Hashable,
+                            upsert: bool = False) -> Optional[int]:
+    """
+    写入一条转化记录并在写入时去重，提交事务
+
+    Args:
+        model: 转化模型（需在 conflict_columns 上有唯一约束）
+        values: 列值，必须包含 conflict_columns 和 conversion_id
+        scope: 去重范围（如 ("partner", partner_id)），与conversion_id组合为去重键
+        upsert: 为True时重复数据覆盖已有记录（ON CONFLICT DO UPDATE），否则丢弃（DO NOTHING）
+
+    Returns:
+        新记录（或被覆盖记录）的ID；判定为重复时返回None
+    """
+    dedup = get_conversion_deduplicator()
+    conversion_id = values['conversion_id']
+    if not upsert and dedup.seen(scope, conversion_id):
+        return None
+
+    table = model.__tablename__
+    insert = _dialect_insert(db) if table not in _on_conflict_unsupported else None
+    if insert is None:
+        record_id = await _insert_with_precheck(db, model, values, conflict_columns, upsert)
+    else:
+        statement = insert(model).values(**values)
+        if upsert:
+            statement = statement.on_conflict_do_update(
+                index_elements=list(conflict_columns),
+                set_={column: statement.excluded[column] for column in values if column not in conflict_columns},
+            )
+        else:
+            statement = statement.on_conflict_do_nothing(index_elements=list(conflict_columns))
+        try:
+            result = await db.execute(statement.returning(model.id))
+            record_id = result.scalar_one_or_none()
+            await db.commit()
+        except DBAPIError as e:
+            await db.rollback()
+            if not _is_missing_unique_index(e):
+                raise
+            # 表上还没有唯一索引
+            _on_conflict_unsupported.add(table)
+            logger.warning(f"⚠️ {table} 缺少 ({', '.join(conflict_columns)}) 唯一索引，"
+                           f"退回先查询后插入的去重方式，请执行 /init-database 创建索引")
+            record_id = await _insert_with_precheck(db, model, values, conflict_columns, upsert)
+
+    dedup.remember(scope, conversion_id)
+    if record_id is None:
+        dedup.stats['db_duplicates'] += 1
+    else:
+        dedup.stats['inserted'] += 1
+    return record_id
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Postback转化数据的write-behind批量写入
+端点把规整后的转化行放入进程内缓冲区后立即返回，后台写入任务按批量大小或时间窗口
+（以先到者为准）用一条多行INSERT写入并提交一次，代替每个请求一次INSERT + COMMIT；
+应用关闭时写完缓冲区中剩余的数据
+
+数据在进程内最多停留 postback_flush_interval_ms（持久化窗口）；缓冲区满时入队等待，
+由写入速度对端点形成背压，而不是丢弃数据。实例未经关闭流程被终止时（如Cloud Run强制回收），
+缓冲区中尚未写入的数据会丢失，因此默认关闭，需设置 POSTBACK_WRITE_BEHIND=true 开启
+"""
+
+import asyncio
+import json
+import logging
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import text
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+INSERT_CONVERSION_SQL = text("""
+    INSERT INTO conversions (
+        tenant_id, conversion_id, offer_name,
+        usd_sale_amount, usd_payout, aff_sub,
+        event_time, raw_data, created_at, partner_id
+    ) VALUES (
+        :tenant_id, :conversion_id, :offer_name,
+        :usd_sale_amount, :usd_payout, :aff_sub,
+        :event_time, :raw_data, :created_at, :partner_id
+    )
+""")
+
+
+def build_conversion_row(conversion_data: Dict[str, Any], partner_id: int = 1) -> Dict[str, Any]:
+    """将postback转化数据规整为conversions表的一行"""
+    # 解析时间
+    datetime_conversion = None
+    if conversion_data.get('conversion_datetime'):
+        try:
+            datetime_conversion = datetime.fromisoformat(conversion_data['conversion_datetime'].replace('Z', '+00:00'))
+        except (ValueError, AttributeError):
+            pass
+
+    return {
+        'tenant_id': 1,  # 默认租户
+        'conversion_id': conversion_data.get('conversion_id'),
+        'offer_name': conversion_data.get('offer_name'),
+        'usd_sale_amount': conversion_data.get('usd_sale_amount'),
+        'usd_payout': conversion_data.get('usd_payout'),
+        'aff_sub': conversion_data.get('aff_sub'),
+        'event_time': datetime_conversion,
+        'raw_data': json.dumps(conversion_data),  # 使用JSON字符串
+        'created_at': datetime.utcnow(),
+        'partner_id': partner_id,
+    }
+
+
+class ConversionWriteBuffer:
+    """进程内write-behind缓冲区 + 后台批量写入任务"""
+
+    def __init__(self, session_factory=None, batch_size: Optional[int] = None,
+                 flush_interval: Optional[float] = None, max_pending: Optional[int] = None):
+        self._session_factory = session_factory
+        self.batch_size = max(1, batch_size or settings.postback_batch_size)
+        self.flush_interval = (flush_interval if flush_interval is not None
+                               else settings.postback_flush_interval_ms / 1000)
+        self.max_pending = max(self.batch_size, max_pending or settings.postback_buffer_size)
+        self._queue: Optional[asyncio.Queue] = None
+        self._flusher: Optional[asyncio.Task] = None
+        self._closing = False
+        self.stats = {'enqueued': 0, 'written': 0, 'failed': 0, 'batches': 0, 'last_batch_ms': 0.0}
+
+    def _get_session_factory(self):
+        if self._session_factory is None:
+            from app.models.database import get_async_session
+            self._session_factory = get_async_session()
+        return self._session_factory
+
+    def _ensure_started(self):
+        """在当前事件循环中启动后台写入任务（首次入队时调用）"""
+        if self._flusher is None or self._flusher.done():
+            self._queue = self._queue or asyncio.Queue(maxsize=self.max_pending)
+            self._flusher = asyncio.get_running_loop().create_task(self._run())
+
+    async def enqueue(self, row: Dict[str, Any]):
+        """放入一行待写入的数据（缓冲区满时等待）"""
+        if self._closing:
+            raise RuntimeError("写入缓冲区已关闭")
+        self._ensure_started()
+        await self._queue.put(row)
+        self.stats['enqueued'] += 1
+
+    @property
+    def pending(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def _collect_batch(self) -> List[Dict[str, Any]]:
+        """等待第一行后，在时间窗口内继续收集，直到达到批量大小"""
+        batch = [await self._queue.get()]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or self._closing:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._collect_batch()
+            try:
+                await self._write_batch(batch)
+            except Exception as e:
+                self.stats['failed'] += len(batch)
+                logger.error(f"❌ 批量写入失败，丢弃 {len(batch)} 条转化: {str(e)}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _write_batch(self, rows: List[Dict[str, Any]]):
+        """一次事务写入整批数据；失败时逐行重试，只丢弃真正有问题的行"""
+        start = time.monotonic()
+        session_factory = self._get_session_factory()
+        try:
+            async with session_factory() as session:
+                await session.execute(INSERT_CONVERSION_SQL, rows)
+                await session.commit()
+            self.stats['written'] += len(rows)
+        except Exception as e:
+            logger.warning(f"⚠️ 批量写入 {len(rows)} 条转化失败，改为逐条写入: {str(e)}")
+            for row in rows:
+                try:
+                    async with session_factory() as session:
+                        await session.execute(INSERT_CONVERSION_SQL, row)
+                        await session.commit()
+                    self.stats['written'] += 1
+                except Exception as row_error:
+                    self.stats['failed'] += 1
+                    logger.error(f"❌ 数据库存储失败: conversion_id={row.get('conversion_id')}, "
+                                 f"partner_id={row.get('partner_id')}: {str(row_error)}")
+        self.stats['batches'] += 1
+        self.stats['last_batch_ms'] = (time.monotonic() - start) * 1000
+        logger.info(f"✅ 批量写入 {len(rows)} 条转化, 耗时 {self.stats['last_batch_ms']:.1f}ms, "
+                    f"缓冲区剩余 {self.pending} 条")
+
+    async def close(self):
+        """停止接收新数据，写完缓冲区中的剩余数据后停止后台任务"""
+        self._closing = True
+        if self._flusher is None:
+            return
+        if not self._flusher.done():
+            await self._queue.join()
+            self._flusher.cancel()
+            try:
+                await self._flusher
+            except asyncio.CancelledError:
+                pass
+        self._flusher = None
+        logger.info(f"✅ 写入缓冲区已关闭: 写入 {self.stats['written']} 条, 失败 {self.stats['failed']} 条, "
+                    f"共 {self.stats['batches']} 批")
+
+
+_write_buffer: Optional[ConversionWriteBuffer] = None
+
+
+def get_conversion_write_buffer() -> ConversionWriteBuffer:
+    """获取进程内共享的写入缓冲区"""
+    global _write_buffer
+    if _write_buffer is None:
+        _write_buffer = ConversionWriteBuffer()
+    return _write_buffer
+
+
+async def shutdown_conversion_write_buffer():
+    """应用关闭时调用（lifespan / shutdown事件），写完缓冲区中的数据"""
+    global _write_buffer
+    if _write_buffer is not None:
+        await _write_buffer.close()
+        _write_buffer = None
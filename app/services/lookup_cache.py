@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Partner / 租户查找的进程内缓存
+Postback请求的Partner配置和租户Token识别结果缓存在进程内，稳定状态下不访问数据库：
+- 每个条目有TTL（lookup_cache_ttl_seconds），过期后重新查询
+- 每隔 lookup_cache_version_check_seconds 用一条聚合查询（行数 + 最大 updated_at）检查表版本，
+  版本变化时清空整个缓存，其他实例对配置的修改在该间隔内生效
+- 本进程内修改配置后调用 invalidate() 立即失效
+
+缓存的是与会话分离的ORM对象副本（只含列属性），可以跨请求安全使用，但不应再 add 到会话中
+"""
+
+import logging
+import time
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+from sqlalchemy import inspect, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def detached_copy(instance: Any) -> Any:
+    """复制ORM对象的列属性，得到不属于任何会话的同类型对象"""
+    if instance is None:
+        return None
+    mapper = inspect(instance).mapper
+    return mapper.class_(**{attr.key: getattr(instance, attr.key) for attr in mapper.column_attrs})
+
+
+class LookupCache:
+    """带TTL和表版本校验的查找缓存（查不到的结果同样缓存）"""
+
+    def __init__(self, name: str, table: str, ttl: Optional[float] = None,
+                 version_check_interval: Optional[float] = None, max_entries: Optional[int] = None):
+        self.name = name
+        self.ttl = ttl if ttl is not None else settings.lookup_cache_ttl_seconds
+        self.version_check_interval = (version_check_interval if version_check_interval is not None
+                                       else settings.lookup_cache_version_check_seconds)
+        self.max_entries = max_entries or settings.lookup_cache_max_entries
+        self._version_sql = text(f"SELECT COUNT(*), MAX(updated_at) FROM {table}")
+        self._entries: Dict[Hashable, Tuple[float, Any]] = {}
+        self._version: Optional[Tuple[Any, ...]] = None
+        self._checked_at = 0.0
+        self.stats = {'hits': 0, 'misses': 0, 'invalidations': 0}
+
+    async def check_version(self, db: AsyncSession):
+        """距上次检查超过间隔时查询表版本，版本变化则清空缓存"""
+        now = time.monotonic()
+        if now - self._checked_at < self.version_check_interval:
+            return
+        self._checked_at = now
+        try:
+            result = await db.execute(self._version_sql)
+            version = tuple(result.one())
+        except Exception as e:
+            # 版本检查失败不影响查找，依靠TTL兜底
+            logger.warning(f"⚠️ {self.name}缓存版本检查失败: {str(e)}")
+            return
+        if self._version is not None and version != self._version:
+            logger.info(f"🔄 {self.name}表已变更，清空缓存")
+            self.invalidate()
+        self._version = version
+
+    def get(self, key: Hashable) -> Tuple[bool, Any]:
+        """返回 (是否命中, 缓存值)"""
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            self.stats['misses'] += 1
+            return False, None
+        self.stats['hits'] += 1
+        return True, entry[1]
+
+    def peek(self, key: Hashable) -> Tuple[bool, Any]:
+        """与 get 相同，但不计入命中统计（供只读取缓存、不回源的调用方使用）"""
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            return False, None
+        return True, entry[1]
+
+    def set(self, key: Hashable, value: Any):
+        if len(self._entries) >= self.max_entries and key not in self._entries:
+            self._entries.clear()
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+
+    def invalidate(self, key: Optional[Hashable] = None):
+        """失效单个条目，不传key时清空整个缓存"""
+        if key is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(key, None)
+        self.stats['invalidations'] += 1
+
+
+_partner_cache: Optional[LookupCache] = None
+_tenant_cache: Optional[LookupCache] = None
+
+
+def get_partner_cache() -> LookupCache:
+    """endpoint_path -> Partner 缓存"""
+    global _partner_cache
+    if _partner_cache is None:
+        _partner_cache = LookupCache("Partner", "partners")
+    return _partner_cache
+
+
+def get_tenant_cache() -> LookupCache:
+    """(ts_token, ts_param, tlm_token) -> Tenant 缓存"""
+    global _tenant_cache
+    if _tenant_cache is None:
+        _tenant_cache = LookupCache("租户", "tenants")
+    return _tenant_cache
+
+
+def invalidate_lookup_caches():
+    """Partner或租户配置变更后调用，清空所有查找缓存"""
+    get_partner_cache().invalidate()
+    get_tenant_cache().invalidate()
@@ -13,6 +13,8 @@ from datetime import datetime
 
 from app.models.partner import Partner, PartnerConversion
 from app.models.database import get_db
+from app.services.conversion_dedup import insert_conversion
+from app.services.lookup_cache import get_partner_cache, detached_copy
 
 logger = logging.getLogger(__name__)
 
@@ -27,8 +29,14 @@ class PartnerService:
         self.db = db_session
     
     async def get_partner_by_endpoint(self, endpoint_path: str) -> Optional[Partner]:
-        """根據endpoint路徑獲取Partner"""
+        """根據endpoint路徑獲取Partner（優先使用進程內緩存）"""
         try:
+            cache = get_partner_cache()
+            await cache.check_version(self.db)
+            hit, partner = cache.get(endpoint_path)
+            if hit:
+                return partner
+            
             logger.info(f"🔍 查找Partner: endpoint_path={endpoint_path}")
             
             query = select(Partner).where(
@@ -45,6 +53,8 @@ class PartnerService:
             else:
                 logger.warning(f"❌ 未找到Partner: endpoint_path={endpoint_path}")
             
+            # 未找到的結果同樣緩存，避免未知路徑的請求反覆查詢
+            cache.set(endpoint_path, detached_copy(partner))
             return partner
             
         except Exception as e:
@@ -58,7 +68,12 @@ class PartnerService:
         request_headers: Dict[str, Any],
         request_ip: str
     ) -> Optional[PartnerConversion]:
-        """創建Partner轉化記錄"""
+        """
+        創建Partner轉化記錄（寫入時去重）
+        
+        Returns:
+            PartnerConversion: 新記錄；重複轉化時返回 is_duplicate=True 且未寫入的記錄；失敗時返回None
+        """
         try:
             logger.info(f"📝 創建Partner轉化記錄: partner_id={partner_id}")
             
@@ -115,7 +130,7 @@ class PartnerService:
             click_id = raw_data.get('click_id')
             
             # 創建轉化記錄
-            conversion = PartnerConversion(
+            values = dict(
                 partner_id=partner_id,
                 conversion_id=conversion_id,
                 offer_id=offer_id,
@@ -131,10 +146,27 @@ class PartnerService:
                 request_ip=request_ip
             )
             
-            self.db.add(conversion)
-            await self.db.commit()
-            await self.db.refresh(conversion)
+            if not conversion_id:
+                conversion = PartnerConversion(**values)
+                self.db.add(conversion)
+                await self.db.commit()
+                await self.db.refresh(conversion)
+                logger.info(f"✅ Partner轉化記錄創建成功: id={conversion.id}, conversion_id={conversion_id}")
+                return conversion
+            
+            # 寫入時去重：一條 INSERT ... ON CONFLICT DO NOTHING，最近見過的重複直接在內存中判定
+            record_id = await insert_conversion(
+                self.db,
+                PartnerConversion,
+                values,
+                conflict_columns=("partner_id", "conversion_id"),
+                scope=("partner", partner_id)
+            )
+            if record_id is None:
+                logger.warning(f"⚠️ 發現重複轉化: partner_id={partner_id}, conversion_id={conversion_id}")
+                return PartnerConversion(is_duplicate=True, **values)
             
+            conversion = PartnerConversion(id=record_id, **values)
             logger.info(f"✅ Partner轉化記錄創建成功: id={conversion.id}, conversion_id={conversion_id}")
             return conversion
             
@@ -143,32 +175,6 @@ class PartnerService:
             await self.db.rollback()
             return None
     
-    async def check_duplicate_conversion(
-        self, 
-        partner_id: int, 
-        conversion_id: str
-    ) -> bool:
-        """檢查重複轉化"""
-        try:
-            query = select(PartnerConversion).where(
-                and_(
-                    PartnerConversion.partner_id == partner_id,
-                    PartnerConversion.conversion_id == conversion_id
-                )
-            )
-            result = await self.db.execute(query)
-            existing = result.scalar_one_or_none()
-            
-            if existing:
-                logger.warning(f"⚠️ 發現重複轉化: partner_id={partner_id}, conversion_id={conversion_id}")
-                return True
-            
-            return False
-            
-        except Exception as e:
-            logger.error(f"❌ 檢查重複轉化失敗: {str(e)}")
-            return False
-    
     async def get_partner_stats(self, partner_id: int, hours: int = 24) -> Dict[str, Any]:
         """獲取Partner統計信息"""
         try:
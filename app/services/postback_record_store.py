@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Postback内存记录存储
+最近的记录保存在固定容量的环形缓冲区中（超出容量时丢弃最旧的记录），
+统计数据（按方法、端点、Partner、状态的计数和金额合计）在写入时增量维护，
+并按时间分桶以支持按时间范围统计；
+内存占用与实例运行时长无关，统计查询的开销与记录数量无关
+"""
+
+import threading
+import time
+from collections import Counter, deque
+from itertools import islice
+from typing import Any, Dict, List, Optional
+
+from app.config import settings
+
+# 按时间范围统计时的分桶粒度（秒）
+STATS_BUCKET_SECONDS = 300
+
+
+def _to_float(value: Any) -> float:
+    if value is None or isinstance(value, bool):
+        return 0.0
+    try:
+        return float(value)
+    except (ValueError, TypeError):
+        return 0.0
+
+
+def _endpoint_group(endpoint: str) -> str:
+    """端点分组（与原统计口径一致）"""
+    if "/involve/event" in endpoint:
+        return "involve_event"
+    if "/postback/" in endpoint:
+        return "postback"
+    return endpoint.strip("/").split("/")[0] or "other"
+
+
+class PostbackRecordStore:
+    """最近记录的环形缓冲区 + 增量统计（线程安全）"""
+
+    def __init__(self, capacity: Optional[int] = None, retention_hours: Optional[int] = None):
+        self.capacity = max(1, capacity or settings.postback_records_capacity)
+        retention_hours = max(1, retention_hours or settings.postback_stats_retention_hours)
+        self._records: deque = deque(maxlen=self.capacity)
+        # 每个时间桶: [桶起始时间, Counter]，只保留统计保留期内的桶
+        self._buckets: deque = deque(maxlen=retention_hours * 3600 // STATS_BUCKET_SECONDS)
+        self._totals: Counter = Counter()
+        self._partners: Dict[str, Dict[str, float]] = {}
+        self._last_id = 0
+        self._lock = threading.Lock()
+
+    def next_id(self) -> int:
+        """分配下一个记录ID"""
+        with self._lock:
+            self._last_id += 1
+            return self._last_id
+
+    @property
+    def last_id(self) -> int:
+        return self._last_id
+
+    @property
+    def total(self) -> int:
+        """实例启动以来存储的记录总数（含已被环形缓冲区淘汰的记录）"""
+        return self._totals["count"]
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def add(self, record: Dict[str, Any], partner: str = "unknown"):
+        """存储一条记录并更新统计"""
+        data = record.get("data") or {}
+        status = data.get("status") or "unknown"
+        usd_payout = _to_float(data.get("usd_payout"))
+        usd_sale_amount = _to_float(data.get("usd_sale_amount"))
+        keys = (
+            "count",
+            ("method", record.get("method")),
+            ("endpoint", _endpoint_group(record.get("endpoint", ""))),
+            ("partner", partner),
+            ("status", status),
+        )
+        timestamp = record.get("timestamp") or time.time()
+        bucket_start = timestamp - timestamp % STATS_BUCKET_SECONDS
+
+        with self._lock:
+            self._records.append(record)
+            self._totals.update(keys)
+            if not self._buckets or self._buckets[-1][0] < bucket_start:
+                self._buckets.append([bucket_start, Counter()])
+            self._buckets[-1][1].update(keys)
+
+            partner_stats = self._partners.get(partner)
+            if partner_stats is None:
+                partner_stats = self._partners[partner] = {
+                    "count": 0, "db_stored": 0, "db_queued": 0, "usd_payout": 0.0, "usd_sale_amount": 0.0}
+            partner_stats["count"] += 1
+            partner_stats["db_stored"] += 1 if record.get("db_stored") else 0
+            partner_stats["db_queued"] += 1 if record.get("db_queued") else 0
+            partner_stats["usd_payout"] += usd_payout
+            partner_stats["usd_sale_amount"] += usd_sale_amount
+
+    def recent(self, limit: int) -> List[Dict[str, Any]]:
+        """最近的 limit 条记录（按时间先后）"""
+        with self._lock:
+            size = len(self._records)
+            return list(islice(self._records, max(0, size - max(0, limit)), size))
+
+    def page(self, offset: int, limit: int) -> List[Dict[str, Any]]:
+        """缓冲区内从最旧记录起的第 offset 条开始的 limit 条记录"""
+        offset = max(0, offset)
+        with self._lock:
+            return list(islice(self._records, offset, offset + max(0, limit)))
+
+    def stats(self, hours: Optional[float] = None) -> Dict[str, Any]:
+        """
+        统计数据
+
+        Args:
+            hours: 只统计最近若干小时内的记录（按 STATS_BUCKET_SECONDS 分桶，
+                   最多可追溯 postback_stats_retention_hours）；为None时统计全部记录
+                   partner_totals（各Partner的条数、入库数和金额合计）始终为实例启动以来的累计值
+        """
+        with self._lock:
+            if hours is None:
+                counts = Counter(self._totals)
+            else:
+                cutoff = time.time() - hours * 3600
+                counts = Counter()
+                for bucket_start, bucket in reversed(self._buckets):
+                    if bucket_start + STATS_BUCKET_SECONDS <= cutoff:
+                        break
+                    counts.update(bucket)
+            partners = {partner: dict(values) for partner, values in self._partners.items()}
+
+        grouped: Dict[str, Dict[str, int]] = {"method": {}, "endpoint": {}, "partner": {}, "status": {}}
+        for key, value in counts.items():
+            if isinstance(key, tuple):
+                grouped[key[0]][key[1]] = value
+        for values in partners.values():
+            values["usd_payout"] = round(values["usd_payout"], 2)
+            values["usd_sale_amount"] = round(values["usd_sale_amount"], 2)
+        return {
+            "count": counts["count"],
+            "by_method": grouped["method"],
+            "by_endpoint": grouped["endpoint"],
+            "by_partner": grouped["partner"],
+            "by_status": grouped["status"],
+            "partner_totals": partners,
+        }
+
+
+_record_store: Optional[PostbackRecordStore] = None
+
+
+def get_postback_record_store() -> PostbackRecordStore:
+    """获取进程内共享的记录存储"""
+    global _record_store
+    if _record_store is None:
+        _record_store = PostbackRecordStore()
+    return _record_store
@@ -10,7 +10,7 @@ from datetime import datetime, timedelta
 from decimal import Decimal
 from typing import Optional, Dict, Any, List
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, and_, or_, desc
+from sqlalchemy import select, func, desc
 from fastapi import Request
 
 from app.models.tenant import Tenant
@@ -23,6 +23,7 @@ from app.schemas.postback import (
     ConversionDetail
 )
 from app.config import settings
+from app.services.conversion_dedup import insert_conversion
 
 logger = logging.getLogger(__name__)
 
@@ -52,17 +53,8 @@ class PostbackService:
     ) -> PostbackResponse:
         """处理Postback数据的核心方法"""
         try:
-            # 1. 重复检查
-            is_duplicate = False
-            if tenant.enable_duplicate_check:
-                is_duplicate = await self._check_duplicate(
-                    tenant.id, 
-                    postback_data.conversion_id, 
-                    db
-                )
-            
-            # 2. 构造数据库记录
-            conversion_record = PostbackConversion(
+            # 1. 构造数据库记录
+            values = dict(
                 tenant_id=tenant.id,
                 conversion_id=postback_data.conversion_id,
                 offer_id=postback_data.offer_id,
@@ -79,17 +71,23 @@ class PostbackService:
                 aff_sub=postback_data.aff_sub,
                 aff_sub2=postback_data.aff_sub2,
                 status=postback_data.status,
-                is_duplicate=is_duplicate,
+                is_duplicate=False,
                 raw_data=serialize_for_json(postback_data.dict()),
                 request_headers=serialize_for_json(dict(request.headers)),
                 request_ip=self._get_client_ip(request)
             )
             
-            # 3. 保存到数据库
-            if not is_duplicate:
-                db.add(conversion_record)
-                await db.commit()
-                await db.refresh(conversion_record)
+            # 2. 写入并在写入时去重（一条 INSERT ... ON CONFLICT，最近见过的重复在内存中直接判定）
+            # 未启用重复检查的租户，重复回传覆盖已有记录
+            record_id = await insert_conversion(
+                db,
+                PostbackConversion,
+                values,
+                conflict_columns=("tenant_id", "conversion_id"),
+                scope=("tenant", tenant.id),
+                upsert=not tenant.enable_duplicate_check
+            )
+            is_duplicate = record_id is None
             
             return PostbackResponse(
                 success=True,
@@ -109,17 +107,6 @@ class PostbackService:
                 tenant_code=tenant.tenant_code
             )
     
-    async def _check_duplicate(self, tenant_id: int, conversion_id: str, db: AsyncSession) -> bool:
-        """检查重复转换"""
-        query = select(PostbackConversion).where(
-            and_(
-                PostbackConversion.tenant_id == tenant_id,
-                PostbackConversion.conversion_id == conversion_id
-            )
-        )
-        result = await db.execute(query)
-        return result.scalar_one_or_none() is not None
-    
     def _parse_datetime(self, datetime_str: Optional[str]) -> Optional[datetime]:
         """解析时间字符串"""
         if not datetime_str:
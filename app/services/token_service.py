@@ -13,6 +13,7 @@ from sqlalchemy import select, or_, and_
 
 from app.models.tenant import Tenant
 from app.config import settings
+from app.services.lookup_cache import get_tenant_cache, detached_copy
 
 logger = logging.getLogger(__name__)
 
@@ -28,7 +29,7 @@ class TokenService:
         db: AsyncSession = None
     ) -> Optional[Tenant]:
         """
-        根据Token参数识别租户
+        根据Token参数识别租户（优先使用进程内缓存）
         
         Args:
             ts_token: TS Token
@@ -39,11 +40,32 @@ class TokenService:
         Returns:
             Tenant: 识别到的租户对象，如果未找到则返回None
         """
+        if not db:
+            logger.error("数据库会话不能为空")
+            return None
+        
+        cache = get_tenant_cache()
+        cache_key = (ts_token, ts_param, tlm_token)
+        await cache.check_version(db)
+        hit, tenant = cache.get(cache_key)
+        if hit:
+            return tenant
+        
+        tenant = await self._query_tenant(ts_token, ts_param, tlm_token, db)
+        if tenant is not None:
+            # 识别失败（返回None）时不缓存，下次请求重新查询
+            cache.set(cache_key, detached_copy(tenant))
+        return tenant
+    
+    async def _query_tenant(
+        self,
+        ts_token: Optional[str],
+        ts_param: Optional[str],
+        tlm_token: Optional[str],
+        db: AsyncSession
+    ) -> Optional[Tenant]:
+        """从数据库识别租户，未匹配时返回默认租户"""
         try:
-            if not db:
-                logger.error("数据库会话不能为空")
-                return None
-            
             # 1. 构建查询条件
             conditions = []
             
@@ -114,6 +136,7 @@ class TokenService:
             await db.commit()
             await db.refresh(default_tenant)
             
+            get_tenant_cache().invalidate()
             logger.info("已创建默认租户")
             return default_tenant
             
@@ -309,6 +332,7 @@ class TokenService:
                 tenant.ts_param = ts_param
             
             await db.commit()
+            get_tenant_cache().invalidate()
             logger.info(f"已更新租户Token: {tenant.tenant_code}")
             return True
             
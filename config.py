@@ -44,6 +44,41 @@ REQUEST_TIMEOUT = 30  # 增加到30秒，提升大数据量请求的稳定性
 MAX_RETRY_ATTEMPTS = 5  # 增加重试次数，提升容错性
 REQUEST_DELAY = 0.5  # 减少请求间隔到0.5秒，提升获取速度
 RATE_LIMIT_DELAY = 30  # 遇到429错误时的等待时间(秒)
+HTTP_CONNECT_TIMEOUT = 10  # 建立连接超时(秒)，读取超时使用 REQUEST_TIMEOUT
+
+# 跨进程限流配置 - 同一API Key的所有进程共享一个令牌桶（状态文件位于 STATE_DIR 下）
+RATE_LIMITER_ENABLED = True
+RATE_LIMIT_REQUESTS_PER_SECOND = 10.0  # 每个API Key的总请求速率，按服务商限额调整
+RATE_LIMIT_BURST = 20  # 令牌桶容量（允许的瞬时突发请求数）
+RATE_LIMIT_STATE_FILE = "rate_limiter.json"
+
+# 失败页面恢复队列配置 - 获取结束时低并发补拉失败页面，仍失败的页面持久化供 --resume 使用
+RECOVERY_ENABLED = True
+RECOVERY_CONCURRENCY = 2  # 异步模式下补拉失败页面的并发数（同步模式逐页补拉）
+RECOVERY_MAX_ATTEMPTS = 3  # 每个失败页面的补拉次数
+RECOVERY_BACKOFF_BASE = 2.0  # 补拉退避基数(秒)，按 2^n 增长并加入随机抖动
+RECOVERY_BACKOFF_MAX = 30.0  # 补拉退避上限(秒)
+RECOVERY_QUEUE_FILE = "recovery_queue.json"  # 位于 STATE_DIR 下
+
+# 同步客户端配置 - 基于连接池复用的 requests.Session
+SYNC_PARALLEL_PAGES = 1  # 同步模式下并行获取的页数（有界线程池），默认1逐页顺序获取；服务商限额允许时可调大
+
+# 认证Token缓存配置 - 跨进程/跨定时任务复用Token，跳过重复的 /authenticate 调用
+TOKEN_CACHE_ENABLED = True
+TOKEN_CACHE_FILE = "involve_asia_tokens.json"  # 位于 STATE_DIR 下
+TOKEN_CACHE_TTL = 3600  # 认证响应未提供有效期时的默认Token有效期(秒)
+TOKEN_REFRESH_MARGIN = 300  # 距离过期不足该秒数时提前刷新Token
+
+# 本地状态目录（Token缓存、共享令牌桶等），可用环境变量 BYTEC_STATE_DIR 指向持久化卷
+# 默认固定在项目根目录下，从不同工作目录启动的进程（web_server、各Agent、main.py）共用同一份状态
+STATE_DIR = os.getenv('BYTEC_STATE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), "temp", "state"))
+
+# 增量同步配置 - 按API记录水位线，只拉取新增/变化的conversion
+INCREMENTAL_SYNC_ENABLED = True  # 关闭后 --incremental 退回完整获取，不读写水位线
+INCREMENTAL_OPEN_STATUSES = ['pending']  # 仍可能变化的状态，这些记录每次都会重新检查
+INCREMENTAL_OVERLAP_DAYS = 2  # 从上次同步结束日期往前回看的天数，覆盖延迟入库的conversion
+INCREMENTAL_RETENTION_DAYS = 60  # 状态中保留的conversion指纹天数，更早的记录视为已定稿
+INCREMENTAL_STATE_PREFIX = "incremental_sync"  # 状态文件名前缀，位于 STATE_DIR 下
 
 # 增强版API配置 - 资源监控和错误处理
 RESOURCE_MONITOR_ENABLED = True  # 启用资源监控
@@ -51,8 +86,24 @@ MAX_SKIPPED_PAGES = 10  # 最大跳过页面数，超过此数停止获取
 CONNECTIVITY_CHECK_HOST = '8.8.8.8'  # 网络连通性检查主机
 CONNECTIVITY_CHECK_PORT = 53  # 网络连通性检查端口
 CONNECTIVITY_CHECK_TIMEOUT = 5  # 网络连通性检查超时(秒)
+CONNECTIVITY_CHECK_CACHE_SECONDS = 60  # 连通性检查结果缓存时间(秒)，避免每次重试都发起探测
+RESOURCE_SAMPLE_INTERVAL = 1.0  # 后台资源采样间隔(秒)
+RESOURCE_SAMPLE_HISTORY = 3600  # 环形缓冲区保存的采样数（默认约1小时）
+RESOURCE_TIMELINE_POINTS = 12  # 工作流结束时资源时间线的分段数
+INGESTION_TELEMETRY_ENABLED = True  # 是否为每次获取运行在输出目录写入逐页遥测(NDJSON)
 THREAD_TIMEOUT_BUFFER = 5  # 线程超时缓冲时间(秒)
 
+# 出站调用弹性配置 - 按目标主机共享的熔断器、重试预算和抖动退避（Involve Asia/SMTP/飞书/TikTok）
+CIRCUIT_BREAKER_FAILURE_THRESHOLD = 5  # 连续失败达到该次数时打开熔断器
+CIRCUIT_BREAKER_RECOVERY_TIMEOUT = 30.0  # 熔断器打开后的冷却时间(秒)，之后放行探测请求
+CIRCUIT_BREAKER_HALF_OPEN_CALLS = 1  # 半开状态下同时放行的探测请求数
+RETRY_BUDGET_RATIO = 0.2  # 每个首次请求存入的重试令牌数（即重试最多占请求量的20%）
+RETRY_BUDGET_MIN_TOKENS = 10  # 初始重试令牌数，保证低流量时仍可重试
+RETRY_BUDGET_MAX_TOKENS = 100  # 重试令牌上限
+RETRY_BACKOFF_BASE = 1.0  # 重试退避基数(秒)，按2的幂增长并加入随机抖动
+RETRY_BACKOFF_MAX = 30.0  # 单次重试退避上限(秒)
+RETRY_MAX_ATTEMPTS = 3  # 通用出站调用的默认重试次数
+
 # 分页配置
 DEFAULT_PAGE_LIMIT = 100
 MAX_RECORDS_LIMIT = None  # 最大记录数限制，None表示不限制，例如设置100表示最多获取100条记录
@@ -63,6 +114,8 @@ TARGET_PARTNER = None  # 指定要处理的Partner，None表示处理所有Partn
 # =============================================================================
 # Partner 和 Sources 映射配置
 # =============================================================================
+PARTNER_MATCH_CACHE_SIZE = 65536  # Source -> Partner 匹配结果缓存的最大条目数
+
 # Partner 到 Sources 的映射关系
 # Partner 是逻辑概念，不会出现在 aff_sub1 字段中
 # Sources 是 aff_sub1 字段的实际值
@@ -222,6 +275,7 @@ FEISHU_MULTIPART_UPLOAD_URL = "https://open.feishu.cn/open-apis/drive/v1/files/u
 FEISHU_ACCESS_TOKEN = "your_feishu_access_token_here"  # 自动获取，无需手动设置
 FEISHU_PARENT_NODE = "Px2HfS7N8lRcF0d3A5Mcdjzynyc"  # 飞书文件夹节点ID
 FEISHU_FILE_TYPE = "sheet"  # 文件类型
+FEISHU_MAX_RETRIES = 2  # 上传/认证遇到网络错误或5xx时的重试次数
 
 # 飞书认证配置
 FEISHU_APP_ID = "cli_a8cc16008c50d00d"
@@ -296,18 +350,13 @@ def get_pattern_for_partner(partner_name):
     return partner_config.get('pattern', '')
 
 def match_source_to_partner(source_name):
-    """将Source映射到对应的Partner"""
-    import re
-    for partner, config in PARTNER_SOURCES_MAPPING.items():
-        # 先检查sources列表
-        if source_name in config.get('sources', []):
-            return partner
-        # 再检查正则表达式模式
-        pattern = config.get('pattern', '')
-        if pattern and re.match(pattern, source_name):
-            return partner
-    # 如果没有匹配到，返回原始source_name作为partner
-    return source_name
+    """
+    将Source映射到对应的Partner
+    按 PARTNER_SOURCES_MAPPING 的顺序先检查sources列表、再检查正则表达式模式，
+    没有匹配到时返回原始source_name作为partner（组合正则 + 缓存，见 modules/partner_matcher.py）
+    """
+    from modules.partner_matcher import get_partner_matcher
+    return get_partner_matcher().match(source_name)
 
 def get_partner_email_config(partner_name):
     """获取Partner的邮件配置"""
@@ -585,10 +634,44 @@ def get_pub_commission_rate(partner_name, offer_name):
 # 最大并发请求数 - 针对超时问题优化
 MAX_CONCURRENT_REQUESTS = 8  # 增加到8个并发请求
 
+# 多API并发配置 - 所有API在同一个事件循环内并发获取
+MULTI_API_GLOBAL_CONCURRENCY = 12  # 所有API共享的最大并发请求数
+MULTI_API_PER_API_CONCURRENCY = None  # 单个API的最大并发请求数，None表示使用MAX_CONCURRENT_REQUESTS
+
 # HTTP连接池配置
 HTTP_MAX_KEEPALIVE_CONNECTIONS = 10
 HTTP_MAX_CONNECTIONS = 20
 HTTP_KEEPALIVE_EXPIRY = 30
+HTTP2_ENABLED = True  # 启用HTTP/2多路复用（需安装 httpx[http2]，未安装时自动回退HTTP/1.1）
+
+# 自适应并发(AIMD)配置 - 启用后根据延迟/429/超时动态调整在途请求数，取代固定的MAX_CONCURRENT_REQUESTS
+ADAPTIVE_CONCURRENCY_ENABLED = True
+ADAPTIVE_MIN_CONCURRENCY = 1  # 并发下限
+ADAPTIVE_MAX_CONCURRENCY = 32  # 并发上限
+ADAPTIVE_ADDITIVE_INCREASE = 1.0  # 每个成功窗口增加的并发数
+ADAPTIVE_DECREASE_FACTOR = 0.5  # 遇到429/超时/5xx时的并发乘数
+ADAPTIVE_LATENCY_TOLERANCE = 2.0  # 延迟超过最低延迟的该倍数时停止增加并发
+ADAPTIVE_THROTTLE_BACKOFF = 5.0  # 429且无Retry-After时新请求的退避时间(秒)，取代整体休眠RATE_LIMIT_DELAY
+ADAPTIVE_PERSIST_LIMIT = True  # 按API Key保存学习到的并发上限，供下次运行使用
+ADAPTIVE_STATE_FILE = "adaptive_concurrency.json"  # 位于 STATE_DIR 下
+
+# 日期分片配置 - 将大范围拆分为按天/按小时的分片并行获取，避免单次查询的页数上限和深分页变慢
+MAX_PAGES_PER_QUERY = 1000  # 单次查询总页数超过该值时异步客户端改用日期分片（不截断，所有页面都会获取）
+SHARDED_FETCH_ENABLED = True  # 单次查询超过页数上限时自动切换为分片模式
+SHARD_TARGET_PAGES = 100  # 单个分片的目标页数，按天分片超过该值时进一步拆分为小时分片
+SHARD_CONCURRENCY = 4  # 同时进行中的分片数（页面请求仍受共享并发预算限制）
+
+# 请求对冲配置 - 慢请求超过近期延迟高分位数时补发一个相同请求，先返回者胜出
+HEDGED_REQUESTS_ENABLED = False  # 是否启用请求对冲
+HEDGE_LATENCY_PERCENTILE = 95  # 对冲阈值使用的延迟分位数
+HEDGE_WINDOW_SIZE = 200  # 计算分位数的最近成功请求数
+HEDGE_MIN_SAMPLES = 20  # 样本数达到该值后才开始对冲
+HEDGE_MIN_DELAY = 1.0  # 对冲阈值下限(秒)，避免延迟很低时频繁对冲
+HEDGE_BUDGET_RATIO = 0.05  # 每次运行对冲请求数上限占请求总数的比例
+HEDGE_BUDGET_MIN = 2  # 每次运行至少允许的对冲请求数
+
+# 批量获取调度配置（多平台 / 多日期范围）
+FETCH_BATCH_MAX_IN_FLIGHT = 4  # 同时进行的获取任务数上限
 
 # 异步批次处理配置 - 针对超时优化
 ASYNC_BATCH_SIZE = 15  # 每批最多处理的页面数，提高吞吐量
@@ -609,6 +692,11 @@ def get_async_config():
         'http_max_connections': HTTP_MAX_CONNECTIONS,
         'http_keepalive_expiry': HTTP_KEEPALIVE_EXPIRY,
         'async_batch_size': ASYNC_BATCH_SIZE,
+        'adaptive_concurrency_enabled': ADAPTIVE_CONCURRENCY_ENABLED,
+        'adaptive_max_concurrency': ADAPTIVE_MAX_CONCURRENCY,
+        'sharded_fetch_enabled': SHARDED_FETCH_ENABLED,
+        'shard_target_pages': SHARD_TARGET_PAGES,
+        'hedged_requests_enabled': HEDGED_REQUESTS_ENABLED,
         'enable_performance_monitoring': ENABLE_ASYNC_PERFORMANCE_MONITORING
     }
 
@@ -618,7 +706,7 @@ def should_use_async_api():
     return os.getenv('USE_ASYNC_API', 'true').lower() in ('true', '1', 'yes')
 
 def get_optimal_concurrent_requests(total_pages):
-    """根据总页数获取最优并发数"""
+    """根据总页数获取最优并发数（静态估算；启用ADAPTIVE_CONCURRENCY_ENABLED时由自适应控制器决定）"""
     if total_pages <= 5:
         return min(total_pages, 3)
     elif total_pages <= 20:
@@ -16,6 +16,8 @@ from modules.feishu_uploader import FeishuUploader
 from agents.data_output_agent.email_sender import EmailSender
 from modules.scheduler import ReportScheduler
 from modules.bytec_report_generator import ByteCReportGenerator
+from modules.resource_sampler import get_resource_sampler
+from modules.ingestion_telemetry import start_ingestion_telemetry, finish_ingestion_telemetry
 from utils.logger import print_step, log_error
 import config
 
@@ -60,6 +62,9 @@ class WeeklyReporter:
         """
         从多个API获取数据并合并
         
+        异步模式下所有API在同一个事件循环内并发获取（受全局与单API并发上限约束），
+        每个API完成后立即合并；同步模式下逐个API顺序获取。
+        
         Args:
             api_list: API配置列表 [{'name': 'LisaidByteC', 'secret': '...', 'key': '...'}, ...]
             start_date: 开始日期
@@ -72,131 +77,119 @@ class WeeklyReporter:
         print_step("多API模式", f"开始从 {len(api_list)} 个API获取数据")
         
         all_conversions = []
+        recovery_runs = {}  # api_name -> 未恢复页面的批次ID
         api_errors = []
         api_success_count = 0
         total_records = 0
         
-        for i, api_config in enumerate(api_list, 1):
+        def merge_api_result(index, api_config, api_data, error):
+            """合并单个API的结果（按完成顺序调用）"""
+            nonlocal api_success_count, total_records
             api_name = api_config['name']
-            api_secret = api_config['secret']
-            api_key = api_config['key']
             
-            print()
-            print("=" * 60)
-            print(f"🚀 API {i}/{len(api_list)}: {api_name}")
-            print("=" * 60)
-            print_step(f"API-{api_name}", f"开始获取 {api_name} 数据...")
+            if error:
+                api_errors.append(error)
+                print_step(f"API-{api_name}", f"❌ {error}")
+                return
             
-            # 强制刷新输出
-            import sys
-            sys.stdout.flush()
+            conversions = self._extract_api_conversions(api_data)
+            if conversions is None:
+                error_msg = f"数据获取失败: {api_name}"
+                api_errors.append(error_msg)
+                print_step(f"API-{api_name}", f"❌ {error_msg}")
+                return
             
-            try:
-                # 创建临时API客户端（根据主客户端类型选择）
-                if self.use_async:
-                    temp_client = AsyncInvolveAsiaAPI(api_secret=api_secret, api_key=api_key)
-                else:
-                    temp_client = InvolveAsiaAPI(api_secret=api_secret, api_key=api_key)
-                
-                # 临时设置记录限制
-                original_limit = config.MAX_RECORDS_LIMIT
-                if max_records is not None:
-                    config.MAX_RECORDS_LIMIT = max_records
+            recovery_run_id = api_data['data'].get('recovery_run_id') if isinstance(api_data['data'], dict) else None
+            if recovery_run_id:
+                recovery_runs[api_name] = recovery_run_id
+            
+            record_count = len(conversions)
+            
+            # 检查是否没有数据 - 这是正常情况，不应该算作错误
+            if record_count == 0:
+                print_step(f"API-{api_name}", f"⚠️ {api_name} 在指定日期范围内没有数据，跳过该API")
+                print("=" * 60)
+                print(f"⚠️ API {index}/{len(api_list)} ({api_name}) 无数据但继续执行")
+                print("=" * 60)
+                # 将这个API标记为成功但无数据
+                api_success_count += 1
+                return
+            
+            # 为每条记录添加API来源标记（只有在需要ByteC报表时才添加）
+            should_add_api_fields = self._should_add_api_source_fields()
+            if should_add_api_fields:
+                for conversion in conversions:
+                    conversion['api_source'] = api_name
+                    conversion['api_platform'] = config.get_platform_from_api_secret(api_config['secret'])
+                print_step(f"API-{api_name}", f"为ByteC报表添加API来源标记: {api_name}")
+            else:
+                print_step(f"API-{api_name}", f"非ByteC报表模式，跳过API来源标记")
+            
+            all_conversions.extend(conversions)
+            total_records += record_count
+            api_success_count += 1
+            
+            print_step(f"API-{api_name}", f"✅ 成功获取 {record_count:,} 条记录")
+            print("=" * 60)
+            print(f"✅ API {index}/{len(api_list)} ({api_name}) 完成")
+            print("=" * 60)
+        
+        # 临时设置记录限制
+        original_limit = config.MAX_RECORDS_LIMIT
+        if max_records is not None:
+            config.MAX_RECORDS_LIMIT = max_records
+        
+        try:
+            if self.use_async:
+                # 异步模式：所有API在同一个事件循环内并发获取，按完成顺序合并
+                import asyncio
+                from modules.involve_asia_api_async import iter_multi_api_conversions
                 
-                # 认证
-                print_step(f"API-{api_name}", f"开始认证...")
-                sys.stdout.flush()
+                async def fetch_all_apis():
+                    completed = 0
+                    async for api_config, api_data, error in iter_multi_api_conversions(
+                            api_list, start_date, end_date):
+                        completed += 1
+                        merge_api_result(completed, api_config, api_data, error)
+                        sys.stdout.flush()
                 
-                # 异步认证需要使用asyncio
-                if self.use_async:
-                    import asyncio
-                    
-                    async def authenticate_and_get_data():
-                        if not await temp_client.authenticate():
-                            return None
-                        return await temp_client.get_conversions_async(start_date, end_date, api_name=api_name)
-                    
-                    api_data = asyncio.run(authenticate_and_get_data())
-                    
-                    if api_data is None:
-                        error_msg = f"API认证失败: {api_name}"
-                        api_errors.append(error_msg)
-                        print_step(f"API-{api_name}", f"❌ {error_msg}")
-                        continue
-                else:
-                    # 同步认证
-                    if not temp_client.authenticate():
-                        error_msg = f"API认证失败: {api_name}"
-                        api_errors.append(error_msg)
-                        print_step(f"API-{api_name}", f"❌ {error_msg}")
-                        continue
-                    
-                    print_step(f"API-{api_name}", f"认证成功，开始获取数据...")
-                    sys.stdout.flush()
+                asyncio.run(fetch_all_apis())
+            else:
+                for i, api_config in enumerate(api_list, 1):
+                    api_name = api_config['name']
                     
-                    # 获取数据
-                    print_step(f"API-{api_name}", f"调用get_conversions方法...")
-                    sys.stdout.flush()
-                    api_data = temp_client.get_conversions(start_date, end_date, api_name=api_name)
-                    print_step(f"API-{api_name}", f"get_conversions方法执行完成")
-                    sys.stdout.flush()
-                
-                # 恢复原始限制
-                config.MAX_RECORDS_LIMIT = original_limit
-                
-                if not api_data or 'data' not in api_data:
-                    error_msg = f"数据获取失败: {api_name}"
-                    api_errors.append(error_msg)
-                    print_step(f"API-{api_name}", f"❌ {error_msg}")
-                    continue
-                
-                # 获取转换记录 - 修复数据路径
-                if 'data' in api_data and 'data' in api_data['data']:
-                    # 标准API返回结构: {'data': {'data': [conversions...]}}
-                    conversions = api_data['data']['data']
-                elif 'data' in api_data and 'conversions' in api_data['data']:
-                    # 备用结构: {'data': {'conversions': [...]}}
-                    conversions = api_data['data']['conversions']
-                else:
-                    # 其他可能结构
-                    conversions = api_data.get('data', [])
-                
-                record_count = len(conversions) if isinstance(conversions, list) else 0
-                
-                # 检查是否没有数据 - 这是正常情况，不应该算作错误
-                if record_count == 0:
-                    print_step(f"API-{api_name}", f"⚠️ {api_name} 在指定日期范围内没有数据，跳过该API")
+                    print()
                     print("=" * 60)
-                    print(f"⚠️ API {i}/{len(api_list)} ({api_name}) 无数据但继续执行")
+                    print(f"🚀 API {i}/{len(api_list)}: {api_name}")
                     print("=" * 60)
-                    # 将这个API标记为成功但无数据
-                    api_success_count += 1
-                    continue
-                
-                # 为每条记录添加API来源标记（只有在需要ByteC报表时才添加）
-                should_add_api_fields = self._should_add_api_source_fields()
-                if should_add_api_fields:
-                    for conversion in conversions:
-                        conversion['api_source'] = api_name
-                        conversion['api_platform'] = config.get_platform_from_api_secret(api_secret)
-                    print_step(f"API-{api_name}", f"为ByteC报表添加API来源标记: {api_name}")
-                else:
-                    print_step(f"API-{api_name}", f"非ByteC报表模式，跳过API来源标记")
-                
-                all_conversions.extend(conversions)
-                total_records += record_count
-                api_success_count += 1
-                
-                print_step(f"API-{api_name}", f"✅ 成功获取 {record_count:,} 条记录")
-                print("=" * 60)
-                print(f"✅ API {i}/{len(api_list)} ({api_name}) 完成")
-                print("=" * 60)
-                
-            except Exception as e:
-                error_msg = f"API异常: {api_name} - {str(e)}"
-                api_errors.append(error_msg)
-                print_step(f"API-{api_name}", f"❌ {error_msg}")
-                continue
+                    print_step(f"API-{api_name}", f"开始获取 {api_name} 数据...")
+                    sys.stdout.flush()
+                    
+                    try:
+                        temp_client = InvolveAsiaAPI(api_secret=api_config['secret'], api_key=api_config['key'])
+                        
+                        # 同步认证
+                        print_step(f"API-{api_name}", f"开始认证...")
+                        sys.stdout.flush()
+                        if not temp_client.authenticate():
+                            merge_api_result(i, api_config, None, f"API认证失败: {api_name}")
+                            continue
+                        
+                        print_step(f"API-{api_name}", f"认证成功，开始获取数据...")
+                        sys.stdout.flush()
+                        
+                        # 获取数据
+                        api_data = temp_client.get_conversions(start_date, end_date, api_name=api_name)
+                        print_step(f"API-{api_name}", f"get_conversions方法执行完成")
+                        sys.stdout.flush()
+                        
+                        merge_api_result(i, api_config, api_data, None)
+                        
+                    except Exception as e:
+                        merge_api_result(i, api_config, None, f"API异常: {api_name} - {str(e)}")
+        finally:
+            # 恢复原始限制
+            config.MAX_RECORDS_LIMIT = original_limit
         
         # 检查是否有任何API成功获取了数据
         if api_success_count == 0:
@@ -253,6 +246,7 @@ class WeeklyReporter:
                 'current_page_count': total_records,
                 'total_count': total_records,
                 'api_sources': [api['name'] for api in api_list],
+                'recovery_runs': recovery_runs,
                 'merge_info': {
                     'total_apis': len(api_list),
                     'successful_apis': api_success_count,
@@ -270,6 +264,29 @@ class WeeklyReporter:
         
         return merged_data
     
+    def _extract_api_conversions(self, api_data):
+        """
+        从单个API的返回结果中提取转换记录列表
+        
+        Returns:
+            list: 转换记录列表；返回结构无效时返回None
+        """
+        if not api_data or 'data' not in api_data:
+            return None
+        
+        # 获取转换记录 - 修复数据路径
+        if 'data' in api_data and 'data' in api_data['data']:
+            # 标准API返回结构: {'data': {'data': [conversions...]}}
+            conversions = api_data['data']['data']
+        elif 'data' in api_data and 'conversions' in api_data['data']:
+            # 备用结构: {'data': {'conversions': [...]}}
+            conversions = api_data['data']['conversions']
+        else:
+            # 其他可能结构
+            conversions = api_data.get('data', [])
+        
+        return conversions if isinstance(conversions, list) else []
+    
     def _is_bytec_processing(self):
         """
         判断当前是否在处理ByteC Partner
@@ -355,6 +372,9 @@ class WeeklyReporter:
             dict: 包含生成文件路径的结果
         """
         print_step("工作流开始", "开始执行WeeklyReporter完整工作流")
+        workflow_start = time.time()
+        resource_sampler = get_resource_sampler()
+        start_ingestion_telemetry("WeeklyReporter")
         
         # 应用配置参数
         if max_records is not None:
@@ -462,6 +482,9 @@ class WeeklyReporter:
                     
                     result['json_file'] = json_filepath
                     print_step("JSON保存", f"✅ 已保存多API格式JSON: {json_filepath}")
+                    # 各API未恢复的页面在 --resume 时合并到该文件
+                    from modules.recovery_queue import attach_multi_api_runs
+                    attach_multi_api_runs(api_configs, conversion_data, json_filepath)
                 else:
                     # 标准单API模式：使用原有方法
                     json_file = self.api_client.save_to_json(conversion_data)
@@ -614,6 +637,11 @@ class WeeklyReporter:
             log_error(error_msg)
             result['error'] = error_msg
             return result
+        finally:
+            # 输出本次工作流的逐页获取遥测汇总和资源时间线（不影响工作流本身）
+            finish_ingestion_telemetry()
+            if resource_sampler is not None:
+                resource_sampler.print_timeline("工作流", since=workflow_start)
         
     def run_feishu_upload_only(self, file_patterns=None):
         """
@@ -886,7 +914,7 @@ class WeeklyReporter:
             'pub_files': partner_files_info  # 保持向后兼容性
         }
     
-    def run_api_only(self, start_date=None, end_date=None, save_to_file=True):
+    def run_api_only(self, start_date=None, end_date=None, save_to_file=True, stream_jsonl=False):
         """
         只运行API数据获取
         
@@ -894,28 +922,36 @@ class WeeklyReporter:
             start_date: 开始日期
             end_date: 结束日期
             save_to_file: 是否保存到文件
+            stream_jsonl: 异步模式下逐页写入JSON Lines文件，不在内存中保留全部记录（适用于大日期范围）
         
         Returns:
-            dict: API返回的数据
+            dict: API返回的数据（stream_jsonl 时只包含统计信息和文件路径）
         """
         print_step("API模式", "只执行API数据获取")
         
+        if stream_jsonl and self.use_async:
+            return self._stream_api_data_to_jsonl(start_date, end_date)
+        if stream_jsonl:
+            print_step("API模式", "逐页写入JSONL需要异步API模式，改为普通获取")
+        
         if self.use_async:
             # 异步模式
             import asyncio
             
             async def get_data_async():
-                # 认证
-                if not await self.api_client.authenticate():
-                    return None
-                
-                # 获取数据
-                if start_date and end_date:
-                    data = await self.api_client.get_conversions_async(start_date, end_date)
-                else:
-                    data = await self.api_client.get_conversions_default_range_async()
-                
-                return data
+                # 认证与分页请求复用同一个长连接客户端
+                async with self.api_client:
+                    # 认证
+                    if not await self.api_client.authenticate():
+                        return None
+                    
+                    # 获取数据
+                    if start_date and end_date:
+                        data = await self.api_client.get_conversions_async(start_date, end_date)
+                    else:
+                        data = await self.api_client.get_conversions_default_range_async()
+                    
+                    return data
             
             data = asyncio.run(get_data_async())
         else:
@@ -936,6 +972,110 @@ class WeeklyReporter:
         
         return data
     
+    def _stream_api_data_to_jsonl(self, start_date=None, end_date=None):
+        """异步逐页获取数据并写入JSON Lines文件，峰值内存只与单页大小相关"""
+        import asyncio
+        from modules.page_sinks import JSONLinesPageSink
+        
+        if not start_date or not end_date:
+            start_date, end_date = config.get_default_date_range()
+        config.ensure_output_dirs()
+        sink = JSONLinesPageSink()
+        
+        async def stream_async():
+            async with self.api_client:
+                if not await self.api_client.authenticate():
+                    return None
+                return await self.api_client.stream_conversions_async(start_date, end_date, [sink])
+        
+        stats = asyncio.run(stream_async())
+        if not stats:
+            return None
+        return {
+            'data': {
+                'current_page_count': stats['records'],
+                'pages_fetched': stats['pages'],
+                'skipped_pages': stats['skipped_pages'],
+                'recovery_run_id': stats['recovery_run_id'],
+                'jsonl_file': sink.filepath,
+            }
+        }
+    
+    def run_incremental_sync(self, start_date=None, end_date=None, api_name=None, save_to_file=True):
+        """
+        增量同步：按水位线只拉取可能变化的日期范围，输出新增/变化的conversion
+        
+        Args:
+            start_date: 开始日期（默认使用配置的日期范围）
+            end_date: 结束日期
+            api_name: API名称，用于日志和状态标识
+            save_to_file: 是否将delta保存为JSON文件（结构与API返回一致，可直接用于 --convert-only）
+        
+        Returns:
+            dict: 增量同步结果（含 delta 列表和统计）
+        """
+        from modules.incremental_sync import IncrementalSyncer
+        
+        print_step("增量同步模式", "只获取新增或状态变化的conversion")
+        if not start_date or not end_date:
+            start_date, end_date = config.get_default_date_range()
+        
+        syncer = IncrementalSyncer(self.api_client.api_secret, self.api_client.api_key, api_name=api_name)
+        
+        if self.use_async:
+            import asyncio
+            
+            async def sync_async():
+                async with self.api_client:
+                    if not await self.api_client.authenticate():
+                        return None
+                    return await syncer.sync_async(self.api_client, start_date, end_date)
+            
+            result = asyncio.run(sync_async())
+        else:
+            if not self.api_client.authenticate():
+                return None
+            result = syncer.sync(self.api_client, start_date, end_date)
+        
+        if result and save_to_file and result['delta']:
+            delta_data = {
+                "status": "success",
+                "data": {
+                    "count": len(result['delta']),
+                    "current_page_count": len(result['delta']),
+                    "incremental": True,
+                    "fetched_range": list(result['fetched_range']),
+                    "watermark": result['watermark'],
+                    "data": result['delta']
+                }
+            }
+            filename = f"incremental_delta_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+            result['delta_file'] = self.api_client.save_to_json(delta_data, filename)
+        
+        return result
+    
+    def run_resume_recovery(self, api_name=None):
+        """
+        补拉之前运行中未能恢复的失败页面，并合并到当时保存的数据集
+        
+        Args:
+            api_name: API名称，用于日志标识
+        
+        Returns:
+            dict: 恢复统计，认证失败时返回None
+        """
+        from modules.recovery_queue import resume_recovery
+        
+        print_step("恢复模式", "补拉恢复队列中的失败页面")
+        if self.use_async:
+            import asyncio
+            authenticated = asyncio.run(self.api_client._run_and_close(self.api_client.authenticate()))
+        else:
+            authenticated = self.api_client.authenticate()
+        if not authenticated:
+            return None
+        return resume_recovery(self.api_client, api_name)
+    
     def run_convert_only(self, json_input, output_filename=None):
         """
         只运行JSON到Excel转换
@@ -1061,6 +1201,13 @@ def create_parser():
 
   # 只获取API数据
   python main.py --api-only
+  python main.py --api-only --async --stream-jsonl --start-date 2025-06-01 --end-date 2025-06-30  # 大范围逐页写入JSONL
+
+  # 增量同步（只获取新增/变化的conversion）
+  python main.py --incremental --api LisaidByteC
+
+  # 补拉之前运行中失败的页面并合并到已保存的数据
+  python main.py --resume --api LisaidByteC
 
   # 只转换现有JSON文件
   python main.py --convert-only conversions.json
@@ -1136,12 +1283,20 @@ def create_parser():
     # 模式选择
     parser.add_argument('--api-only', action='store_true',
                        help='只执行API数据获取')
+    parser.add_argument('--stream-jsonl', action='store_true',
+                       help='与 --api-only 一起使用（异步模式），逐页写入JSON Lines文件，不在内存中保留全部记录')
     parser.add_argument('--convert-only', type=str, metavar='JSON_FILE',
                        help='只执行JSON到Excel转换，指定JSON文件路径')
     parser.add_argument('--process-only', type=str, metavar='DATA_FILE',
                        help='只执行数据处理，指定Excel或JSON文件路径')
     parser.add_argument('--upload-only', action='store_true',
                        help='只执行飞书上传，上传output目录下所有Excel文件')
+    parser.add_argument('--incremental', action='store_true',
+                       help='增量同步：按水位线只获取新增或变化的conversion')
+    parser.add_argument('--reset-watermark', action='store_true',
+                       help='与 --incremental 一起使用，清空水位线后重新建立基线')
+    parser.add_argument('--resume', action='store_true',
+                       help='补拉之前运行中失败的页面，并合并到已保存的数据集')
     
     # 其他选项 - 默认值为True，用户可以通过--no-save-json等来禁用
     parser.add_argument('--save-json', action='store_true', default=True,
@@ -1454,6 +1609,42 @@ def main():
             else:
                 print(f"\n❌ 飞书上传失败: {result.get('error', '未知错误')}")
             
+        elif args.resume:
+            # 恢复模式
+            summary = reporter.run_resume_recovery(api_name=selected_api)
+            if summary is None:
+                print("\n❌ 认证失败，无法补拉失败页面")
+            else:
+                print(f"\n✅ 恢复完成: {summary['runs']} 个批次, 恢复 {summary['recovered_pages']} 页, "
+                      f"新增 {summary['added_records']} 条记录, 仍失败 {summary['remaining_pages']} 页")
+                for dataset in summary['datasets']:
+                    print(f"📁 已更新: {dataset}")
+                
+        elif args.incremental:
+            # 增量同步模式
+            if args.reset_watermark:
+                from modules.incremental_sync import IncrementalSyncer
+                IncrementalSyncer(reporter.api_client.api_secret, reporter.api_client.api_key).reset()
+                print("🧹 已清空增量同步水位线")
+            
+            if not getattr(config, 'INCREMENTAL_SYNC_ENABLED', True):
+                # 增量同步已关闭：退回完整获取，不读写水位线
+                print("⚠️ 增量同步已关闭 (INCREMENTAL_SYNC_ENABLED=False)，改为获取完整日期范围")
+                data = reporter.run_api_only(args.start_date, args.end_date)
+                if data:
+                    print(f"\n✅ API数据获取完成，共 {data['data']['current_page_count']} 条记录")
+                else:
+                    print("\n❌ API数据获取失败")
+            else:
+                result = reporter.run_incremental_sync(args.start_date, args.end_date, api_name=selected_api)
+                if result:
+                    print(f"\n✅ 增量同步完成: 新增 {result['new_count']} 条, 变化 {result['changed_count']} 条, "
+                          f"未变化 {result['unchanged_count']} 条")
+                    if result.get('delta_file'):
+                        print(f"📁 Delta文件: {result['delta_file']}")
+                else:
+                    print("\n❌ 增量同步失败")
+                
         elif args.api_only:
             # 应用配置参数
             if args.limit is not None:
@@ -1465,7 +1656,7 @@ def main():
                 print(f"📋 设置目标Partner: {args.partner}")
             
             # 只获取API数据模式
-            data = reporter.run_api_only(args.start_date, args.end_date)
+            data = reporter.run_api_only(args.start_date, args.end_date, stream_jsonl=args.stream_jsonl)
             if data:
                 print(f"\n✅ API数据获取完成，共 {data['data']['current_page_count']} 条记录")
             else:
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+自适应并发控制模块 (AIMD)
+根据请求延迟和错误情况动态调整在途请求数：
+- 延迟与错误率正常时加性增加 (Additive Increase)
+- 遇到429/超时/5xx时乘性减少 (Multiplicative Decrease)
+学习到的并发上限按API Key持久化，下次运行直接从该值起步
+"""
+
+import asyncio
+import hashlib
+import random
+import time
+from contextlib import asynccontextmanager
+from typing import Optional
+
+from modules.state_store import JSONStateFile
+from utils.logger import print_step
+import config
+
+
+class AdaptiveConcurrencyController:
+    """基于AIMD的自适应并发控制器（单个API Key一个实例）"""
+
+    def __init__(self, api_secret: str, api_key: str, initial_limit: Optional[int] = None,
+                 min_limit: Optional[int] = None, max_limit: Optional[int] = None,
+                 persist: Optional[bool] = None):
+        self.min_limit = min_limit or getattr(config, 'ADAPTIVE_MIN_CONCURRENCY', 1)
+        self.max_limit = max(self.min_limit, max_limit or getattr(config, 'ADAPTIVE_MAX_CONCURRENCY', 32))
+        self.additive_increase = getattr(config, 'ADAPTIVE_ADDITIVE_INCREASE', 1.0)
+        self.decrease_factor = getattr(config, 'ADAPTIVE_DECREASE_FACTOR', 0.5)
+        self.latency_tolerance = getattr(config, 'ADAPTIVE_LATENCY_TOLERANCE', 2.0)
+        self.throttle_backoff = getattr(config, 'ADAPTIVE_THROTTLE_BACKOFF', 5.0)
+
+        self.persist = getattr(config, 'ADAPTIVE_PERSIST_LIMIT', True) if persist is None else persist
+        self.state = JSONStateFile(getattr(config, 'ADAPTIVE_STATE_FILE', 'adaptive_concurrency.json'))
+        self.state_key = hashlib.sha256(f"{api_key}:{api_secret}".encode('utf-8')).hexdigest()
+
+        learned_limit = self._load_learned_limit() if self.persist else None
+        start_limit = learned_limit or initial_limit or getattr(config, 'MAX_CONCURRENT_REQUESTS', 5)
+        self.limit = float(min(self.max_limit, max(self.min_limit, start_limit)))
+        self.learned_from_state = learned_limit is not None
+
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self.last_decrease_at = 0.0
+        self.min_latency = None
+
+        # 运行统计
+        self.stats = {'success': 0, 'throttled': 0, 'timeouts': 0, 'errors': 0,
+                      'increases': 0, 'decreases': 0, 'peak_limit': self.limit}
+
+        self._condition = None
+        self._condition_loop = None
+
+    # ------------------------------------------------------------------
+    # 状态持久化
+    # ------------------------------------------------------------------
+    def _load_learned_limit(self) -> Optional[int]:
+        entry = self.state.read().get(self.state_key)
+        if entry and entry.get('limit'):
+            return int(entry['limit'])
+        return None
+
+    def save(self):
+        """保存本次学习到的并发上限"""
+        if not self.persist:
+            return
+        limit = int(self.limit)
+
+        def mutate(data):
+            data[self.state_key] = {'limit': limit, 'updated_at': time.time()}
+
+        try:
+            self.state.update(mutate)
+        except OSError as e:
+            print_step("并发状态", f"保存自适应并发上限失败: {str(e)}")
+
+    # ------------------------------------------------------------------
+    # 并发槽位
+    # ------------------------------------------------------------------
+    def _get_condition(self) -> asyncio.Condition:
+        loop = asyncio.get_running_loop()
+        if self._condition is None or self._condition_loop is not loop:
+            self._condition = asyncio.Condition()
+            self._condition_loop = loop
+        return self._condition
+
+    @property
+    def current_limit(self) -> int:
+        return max(self.min_limit, int(self.limit))
+
+    async def acquire(self):
+        """等待直到在途请求数低于当前上限且不处于限流退避期"""
+        condition = self._get_condition()
+        while True:
+            pause = self.paused_until - time.monotonic()
+            if pause > 0:
+                await asyncio.sleep(pause)
+                continue
+            async with condition:
+                if self.in_flight < self.current_limit:
+                    self.in_flight += 1
+                    return
+                await condition.wait()
+
+    async def release(self):
+        condition = self._get_condition()
+        async with condition:
+            self.in_flight = max(0, self.in_flight - 1)
+            condition.notify_all()
+
+    @asynccontextmanager
+    async def slot(self):
+        await self.acquire()
+        try:
+            yield
+        finally:
+            await self.release()
+
+    # ------------------------------------------------------------------
+    # 反馈信号
+    # ------------------------------------------------------------------
+    def on_success(self, latency: float):
+        """请求成功：延迟未明显劣化时加性增加上限（每个窗口约+1）"""
+        self.stats['success'] += 1
+        if self.min_latency is None or latency < self.min_latency:
+            self.min_latency = latency
+        if latency > self.min_latency * self.latency_tolerance:
+            return  # 延迟已明显升高，保持当前上限
+        if self.limit < self.max_limit:
+            self.limit = min(self.max_limit, self.limit + self.additive_increase / max(self.limit, 1.0))
+            self.stats['increases'] += 1
+            self.stats['peak_limit'] = max(self.stats['peak_limit'], self.limit)
+
+    def _decrease(self):
+        now = time.monotonic()
+        # 同一批在途请求产生的多次拥塞信号只减少一次
+        if now - self.last_decrease_at < (self.min_latency or 1.0):
+            return
+        self.last_decrease_at = now
+        self.limit = max(float(self.min_limit), self.limit * self.decrease_factor)
+        self.stats['decreases'] += 1
+
+    def on_throttle(self, retry_after: Optional[float] = None) -> float:
+        """
+        收到429：乘性减少上限，并让新请求短暂退避
+
+        Returns:
+            float: 本次退避秒数
+        """
+        self.stats['throttled'] += 1
+        self._decrease()
+        backoff = retry_after if retry_after and retry_after > 0 else self.throttle_backoff
+        backoff = backoff * random.uniform(0.8, 1.2)
+        self.paused_until = max(self.paused_until, time.monotonic() + backoff)
+        return backoff
+
+    def on_timeout(self):
+        """请求超时：乘性减少上限"""
+        self.stats['timeouts'] += 1
+        self._decrease()
+
+    def on_server_error(self):
+        """服务端5xx：视为拥塞信号，乘性减少上限"""
+        self.stats['errors'] += 1
+        self._decrease()
+
+    def summary(self) -> str:
+        return (f"当前并发上限 {self.current_limit} (峰值 {int(self.stats['peak_limit'])}), "
+                f"成功 {self.stats['success']}, 429 {self.stats['throttled']}, "
+                f"超时 {self.stats['timeouts']}, 5xx {self.stats['errors']}, "
+                f"降低 {self.stats['decreases']} 次")
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """解析Retry-After响应头（仅支持秒数格式）"""
+    if not value:
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
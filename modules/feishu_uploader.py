@@ -7,8 +7,10 @@
 import requests
 import os
 import json
+from contextlib import contextmanager
 from datetime import datetime
 from utils.logger import print_step
+from modules.resilience import call_with_retry, get_destination, is_connect_error, is_transient_status
 import config
 
 try:
@@ -30,6 +32,33 @@ class FeishuUploader:
         self.upload_url = config.FEISHU_UPLOAD_URL
         self.parent_node = config.FEISHU_PARENT_NODE
         self.file_type = config.FEISHU_FILE_TYPE
+        # 飞书开放平台的熔断器与重试预算：故障时剩余文件快速失败，不逐个等待超时
+        self.resilience = get_destination(self.upload_url)
+        self.max_retries = getattr(config, 'FEISHU_MAX_RETRIES', 2)
+    
+    def _post_with_retry(self, label, url, open_files=None, idempotent=True, **kwargs):
+        """
+        发送POST请求，连接错误/超时/5xx/429 时带抖动退避重试
+        
+        Args:
+            open_files: 每次尝试时调用以重新打开上传文件（文件流只能读取一次）
+            idempotent: 为False时（如上传文件）只在连接建立失败时重试，
+                        请求已发出后的超时/5xx不重试，避免重复上传
+        """
+        def send():
+            if open_files is None:
+                return requests.post(url, **kwargs)
+            with open_files() as files:
+                return requests.post(url, files=files, **kwargs)
+        
+        if not idempotent:
+            return call_with_retry(self.resilience, send, max_retries=self.max_retries,
+                                   retry_error=is_connect_error, label=label)
+        return call_with_retry(
+            self.resilience, send, max_retries=self.max_retries,
+            should_retry=lambda response: is_transient_status(response.status_code) or response.status_code == 429,
+            label=label
+        )
     
     def authenticate(self):
         """
@@ -50,7 +79,8 @@ class FeishuUploader:
                 "app_secret": self.app_secret
             }
             
-            response = requests.post(
+            response = self._post_with_retry(
+                "飞书认证",
                 self.auth_url,
                 headers=headers,
                 json=payload,
@@ -170,26 +200,30 @@ class FeishuUploader:
             file_size = os.path.getsize(file_path)
             
             # 按照官方curl示例准备multipart表单数据
-            with open(file_path, 'rb') as f:
-                files = {
-                    'file': (filename, f, 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-                }
-                
-                data = {
-                    'file_name': filename,
-                    'parent_type': 'explorer', 
-                    'parent_node': self.parent_node,
-                    'size': str(file_size)
-                }
-                
-                # 发送请求
-                response = requests.post(
-                    self.upload_url,
-                    headers=headers,
-                    data=data,
-                    files=files,
-                    timeout=60
-                )
+            @contextmanager
+            def open_files():
+                with open(file_path, 'rb') as f:
+                    yield {
+                        'file': (filename, f, 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+                    }
+            
+            data = {
+                'file_name': filename,
+                'parent_type': 'explorer', 
+                'parent_node': self.parent_node,
+                'size': str(file_size)
+            }
+            
+            # 发送请求（只在连接失败时重试，每次重试重新打开文件）
+            response = self._post_with_retry(
+                f"飞书上传 {filename}",
+                self.upload_url,
+                open_files=open_files,
+                idempotent=False,
+                headers=headers,
+                data=data,
+                timeout=60
+            )
             
             # 检查响应
             if response.status_code == 200:
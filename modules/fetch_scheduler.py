@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+批量获取调度模块
+多个日期范围 / API配置的获取任务在一个全局并发上限下执行：
+- 按任务权重（如日期范围的天数）从大到小调度，大范围先开始，尾部由小任务填满
+- 每个任务完成即产出结果，已完成的数据不会因其他任务失败而丢失
+- 单个任务的异常被隔离，记录在该任务的结果中
+"""
+
+import asyncio
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+import config
+
+
+@dataclass
+class FetchTask:
+    """一个获取任务"""
+    key: str
+    func: Callable[[], Awaitable[Any]]
+    weight: float = 1.0
+    metadata: Dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass
+class FetchOutcome:
+    """获取任务的结果"""
+    key: str
+    success: bool
+    result: Any = None
+    error: Optional[str] = None
+    duration: float = 0.0
+    metadata: Dict[str, Any] = field(default_factory=dict)
+
+
+class FetchScheduler:
+    """
+    有界并发的获取调度器
+
+    同一个调度器实例上的所有 run() 调用共享同一个并发上限
+    """
+
+    def __init__(self, max_in_flight: Optional[int] = None):
+        self.max_in_flight = max(1, max_in_flight or getattr(config, 'FETCH_BATCH_MAX_IN_FLIGHT', 4))
+        self._semaphore = asyncio.Semaphore(self.max_in_flight)
+
+    async def _execute(self, task: FetchTask) -> FetchOutcome:
+        start = time.perf_counter()
+        async with self._semaphore:
+            try:
+                result = await task.func()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                return FetchOutcome(task.key, False, error=f"{type(e).__name__}: {e}",
+                                    duration=time.perf_counter() - start, metadata=task.metadata)
+        return FetchOutcome(task.key, True, result=result,
+                            duration=time.perf_counter() - start, metadata=task.metadata)
+
+    async def run(self, tasks: List[FetchTask]) -> AsyncIterator[FetchOutcome]:
+        """按权重从大到小调度任务，按完成顺序逐个产出结果"""
+        pending = deque(sorted(tasks, key=lambda task: task.weight, reverse=True))
+        if not pending:
+            return
+        outcomes: asyncio.Queue = asyncio.Queue()
+
+        async def worker():
+            while pending:
+                await outcomes.put(await self._execute(pending.popleft()))
+
+        workers = [asyncio.ensure_future(worker()) for _ in range(min(self.max_in_flight, len(pending)))]
+        try:
+            for _ in range(len(tasks)):
+                yield await outcomes.get()
+        finally:
+            # 调用方提前结束迭代（或被取消）时取消仍在进行的任务
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
+    async def run_all(self, tasks: List[FetchTask]) -> List[FetchOutcome]:
+        """执行全部任务并返回所有结果（按完成顺序）"""
+        return [outcome async for outcome in self.run(tasks)]
+
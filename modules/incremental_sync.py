@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+Involve Asia 增量同步模块
+为每个API Key维护一个水位线状态（最后一次看到的 datetime_conversion_updated、
+仍处于开放状态的conversion、各conversion的内容指纹），每次只拉取可能发生变化的日期范围，
+并只输出新增或变化的conversion（delta集合）
+
+用法示例:
+    syncer = IncrementalSyncer(api_secret, api_key, api_name="LisaidByteC")
+    async with AsyncInvolveAsiaAPI(api_secret, api_key) as api:
+        await api.authenticate()
+        result = await syncer.sync_async(api, start_date, end_date)
+    print(result['delta'])
+"""
+
+import hashlib
+import json
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from modules.state_store import JSONStateFile
+from utils.logger import print_step
+import config
+
+DATE_FORMAT = '%Y-%m-%d'
+
+
+def _record_date(record: Dict[str, Any]) -> Optional[str]:
+    """conversion所属日期 (YYYY-MM-DD)"""
+    value = record.get('datetime_conversion')
+    return str(value)[:10] if value else None
+
+
+def _record_updated_at(record: Dict[str, Any]) -> Optional[str]:
+    """conversion最后更新时间，接口未返回时退化为 datetime_conversion"""
+    value = record.get('datetime_conversion_updated') or record.get('datetime_conversion')
+    return str(value) if value else None
+
+
+def _record_fingerprint(record: Dict[str, Any]) -> str:
+    """conversion内容指纹，任意字段变化都会改变指纹"""
+    payload = json.dumps(record, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()[:16]
+
+
+class IncrementalSyncer:
+    """单个API Key的增量同步器"""
+
+    def __init__(self, api_secret: str, api_key: str, api_name: Optional[str] = None,
+                 open_statuses: Optional[Iterable[str]] = None,
+                 overlap_days: Optional[int] = None, retention_days: Optional[int] = None):
+        self.api_name = api_name or 'default'
+        self.open_statuses = {status.lower() for status in
+                              (open_statuses or getattr(config, 'INCREMENTAL_OPEN_STATUSES', ['pending']))}
+        self.overlap_days = overlap_days if overlap_days is not None else getattr(config, 'INCREMENTAL_OVERLAP_DAYS', 2)
+        self.retention_days = retention_days or getattr(config, 'INCREMENTAL_RETENTION_DAYS', 60)
+
+        # 每个API Key一个状态文件，避免多个API同时同步时互相争用锁
+        state_key = hashlib.sha256(f"{api_key}:{api_secret}".encode('utf-8')).hexdigest()
+        prefix = getattr(config, 'INCREMENTAL_STATE_PREFIX', 'incremental_sync')
+        self.state = JSONStateFile(f"{prefix}_{state_key[:16]}.json")
+
+    # ------------------------------------------------------------------
+    # 同步范围规划
+    # ------------------------------------------------------------------
+    def plan_range(self, start_date: str, end_date: str) -> Tuple[str, str]:
+        """
+        根据水位线计算实际需要拉取的日期范围
+
+        - 首次同步：拉取完整范围，建立基线
+        - 之后：从 min(最早的开放conversion日期, 上次同步结束日期 - 回看天数) 开始，
+          且不早于请求的开始日期；更早且已定稿的conversion不再重复拉取
+
+        Returns:
+            tuple: (实际开始日期, 原因说明)
+        """
+        state = self.state.read()
+        last_synced_end = state.get('last_synced_end')
+        if not last_synced_end:
+            return start_date, "首次同步，拉取完整日期范围"
+
+        candidates = []
+        resume = datetime.strptime(last_synced_end, DATE_FORMAT) - timedelta(days=self.overlap_days)
+        candidates.append(resume.strftime(DATE_FORMAT))
+
+        open_dates = [entry[0] for entry in state.get('records', {}).values()
+                      if entry[1] in self.open_statuses and entry[0] and entry[0] >= start_date]
+        if open_dates:
+            candidates.append(min(open_dates))
+
+        fetch_start = min(end_date, max(start_date, min(candidates)))
+        reason = (f"上次同步至 {last_synced_end}，开放conversion {len(open_dates)} 条"
+                  f"{'，最早 ' + min(open_dates) if open_dates else ''}")
+        return fetch_start, reason
+
+    # ------------------------------------------------------------------
+    # delta计算
+    # ------------------------------------------------------------------
+    def diff_records(self, records: Iterable[Dict[str, Any]], known: Dict[str, list],
+                     watermark: Optional[str], updates: Optional[Dict[str, list]] = None
+                     ) -> Tuple[List[Dict], Dict[str, int], Optional[str]]:
+        """
+        将拉取到的conversion与状态中的指纹比较，原地更新 known；
+        传入 updates 时本次看到的条目同时记录到 updates（commit 时只合并这些条目）
+
+        Returns:
+            tuple: (delta记录列表, 计数 {'new','changed','unchanged'}, 新水位线)
+        """
+        delta = []
+        counts = {'new': 0, 'changed': 0, 'unchanged': 0}
+        for record in records:
+            conversion_id = record.get('conversion_id')
+            if conversion_id is None:
+                continue
+            conversion_id = str(conversion_id)
+            status = str(record.get('conversion_status') or '').lower()
+            updated_at = _record_updated_at(record)
+            if updated_at and (watermark is None or updated_at > watermark):
+                watermark = updated_at
+
+            fingerprint = _record_fingerprint(record)
+            previous = known.get(conversion_id)
+            known[conversion_id] = entry = [_record_date(record), status, fingerprint]
+            if updates is not None:
+                updates[conversion_id] = entry
+            if previous is None:
+                counts['new'] += 1
+                delta.append(record)
+            elif previous[2] != fingerprint:
+                counts['changed'] += 1
+                delta.append(record)
+            else:
+                counts['unchanged'] += 1
+        return delta, counts, watermark
+
+    def _prune(self, known: Dict[str, list]) -> int:
+        """清理超出保留天数的指纹，返回清理条数"""
+        cutoff = (datetime.now() - timedelta(days=self.retention_days)).strftime(DATE_FORMAT)
+        stale = [cid for cid, entry in known.items() if not entry[0] or entry[0] < cutoff]
+        for cid in stale:
+            known.pop(cid, None)
+        return len(stale)
+
+    def commit(self, updates: Dict[str, list], watermark: Optional[str], end_date: str, complete: bool):
+        """
+        写回状态：在文件锁内把本次看到的条目合并到最新状态中，
+        同一API Key的并发同步不会覆盖彼此写入的指纹
+
+        Args:
+            updates: 本次同步看到的conversion条目 {conversion_id: [日期, 状态, 指纹]}
+            complete: 本次拉取是否完整（无跳过页面）；不完整时不推进 last_synced_end，
+                      下次同步会重新覆盖这段范围
+        """
+        def mutate(data):
+            records = data.setdefault('records', {})
+            records.update(updates)
+            data['api_name'] = self.api_name
+            if watermark and (not data.get('watermark') or watermark > data['watermark']):
+                data['watermark'] = watermark
+            data['open_statuses'] = sorted(self.open_statuses)
+            data['updated_at'] = time.time()
+            if complete and end_date >= data.get('last_synced_end', ''):
+                data['last_synced_end'] = end_date
+            return self._prune(records)
+
+        pruned = self.state.update(mutate)
+        if pruned:
+            print_step("增量状态", f"[{self.api_name}] 清理 {pruned} 条超出保留期的conversion指纹")
+
+    def reset(self):
+        """清空水位线，下次同步重新建立基线"""
+        self.state.update(lambda data: data.clear())
+
+    # ------------------------------------------------------------------
+    # 同步入口
+    # ------------------------------------------------------------------
+    def _build_result(self, start_date, end_date, fetch_start, delta, counts, watermark,
+                      known, pages_fetched, total_pages, complete) -> Dict[str, Any]:
+        open_count = sum(1 for entry in known.values() if entry[1] in self.open_statuses)
+        print_step("增量同步完成",
+                   f"[{self.api_name}] 拉取 {fetch_start} ~ {end_date} 共 {pages_fetched} 页, "
+                   f"新增 {counts['new']} 条, 变化 {counts['changed']} 条, 未变化 {counts['unchanged']} 条, "
+                   f"开放状态 {open_count} 条")
+        return {
+            'api_name': self.api_name,
+            'requested_range': (start_date, end_date),
+            'fetched_range': (fetch_start, end_date),
+            'pages_fetched': pages_fetched,
+            'total_pages': total_pages,
+            'complete': complete,
+            'new_count': counts['new'],
+            'changed_count': counts['changed'],
+            'unchanged_count': counts['unchanged'],
+            'open_count': open_count,
+            'watermark': watermark,
+            'delta': delta,
+        }
+
+    async def sync_async(self, api, start_date: str, end_date: str,
+                         currency: Optional[str] = None) -> Dict[str, Any]:
+        """
+        使用 AsyncInvolveAsiaAPI 逐页拉取并计算delta（api需已认证）
+        """
+        fetch_start, reason = self.plan_range(start_date, end_date)
+        print_step("增量同步", f"[{self.api_name}] {reason} -> 拉取 {fetch_start} ~ {end_date}")
+
+        state = self.state.read()
+        known = state.get('records', {})
+        updates = {}
+        watermark = state.get('watermark')
+        delta = []
+        counts = {'new': 0, 'changed': 0, 'unchanged': 0}
+
+        api.skipped_pages = []
+        api.failed_requests = []
+        async for page in api.iter_conversion_pages(fetch_start, end_date, currency, self.api_name):
+            page_delta, page_counts, watermark = self.diff_records(page['data'], known, watermark, updates)
+            delta.extend(page_delta)
+            for key, value in page_counts.items():
+                counts[key] += value
+
+        stats = getattr(api, 'page_stats', {}) or {}
+        # 第一页成功（pages_fetched > 0）才知道总页数；有任何失败页面都不算完整，
+        # 否则第一页失败时 total_pages 为0，会错误地推进 last_synced_end
+        complete = (stats.get('pages_fetched', 0) > 0
+                    and not api.skipped_pages and not api.failed_requests
+                    and stats.get('pages_fetched', 0) >= stats.get('total_pages', 0))
+        self.commit(updates, watermark, end_date, complete)
+        return self._build_result(start_date, end_date, fetch_start, delta, counts, watermark, known,
+                                  stats.get('pages_fetched', 0), stats.get('total_pages', 0), complete)
+
+    def sync(self, api, start_date: str, end_date: str,
+             currency: Optional[str] = None) -> Dict[str, Any]:
+        """
+        使用同步 InvolveAsiaAPI 拉取并计算delta（api需已认证）
+        """
+        fetch_start, reason = self.plan_range(start_date, end_date)
+        print_step("增量同步", f"[{self.api_name}] {reason} -> 拉取 {fetch_start} ~ {end_date}")
+
+        state = self.state.read()
+        known = state.get('records', {})
+        data = api.get_conversions(fetch_start, end_date, currency, self.api_name)
+        if not data:
+            print_step("增量同步失败", f"[{self.api_name}] 未获取到数据，水位线保持不变")
+            return None
+
+        data_obj = data.get('data', {})
+        updates = {}
+        delta, counts, watermark = self.diff_records(data_obj.get('data', []), known, state.get('watermark'), updates)
+        complete = not data_obj.get('skipped_pages')
+        self.commit(updates, watermark, end_date, complete)
+        return self._build_result(start_date, end_date, fetch_start, delta, counts, watermark, known,
+                                  data_obj.get('pages_fetched', 0), data_obj.get('total_pages', 0), complete)
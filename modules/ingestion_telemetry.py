@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+数据获取遥测模块
+每次获取运行记录一份结构化遥测（NDJSON，写在输出目录下）：
+- 每个分页请求一行：API、日期范围、页码、HTTP状态、延迟、响应字节数、重试次数、限流等待时间、
+  发出时的在途请求数和并发上限
+- 运行结束时追加一行汇总
+
+工作流结束时打印汇总：各API的延迟分位数/字节数/重试/限流等待、按页深度的延迟、
+最慢的页面以及在途请求数随时间的变化，不需要再临时添加调试输出来定位慢的API或日期范围
+"""
+
+import json
+import math
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from utils.logger import print_step
+import config
+
+# 按页深度统计延迟时的分段（页码上限）
+PAGE_DEPTH_BUCKETS = (10, 100, 1000)
+
+
+def _percentile(values: List[float], percentile: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, math.ceil(len(ordered) * percentile / 100) - 1))
+    return ordered[index]
+
+
+class IngestionTelemetry:
+    """单次获取运行的遥测记录器（线程安全，逐行写入NDJSON）"""
+
+    def __init__(self, filepath: Optional[str] = None, run_label: str = ""):
+        if not filepath:
+            config.ensure_output_dirs()
+            filepath = os.path.join(config.OUTPUT_DIR,
+                                    f"ingestion_telemetry_{datetime.now().strftime('%Y%m%d_%H%M%S')}.ndjson")
+        self.filepath = filepath
+        self.run_label = run_label
+        self.started_at = time.time()
+        self.pages: List[Dict[str, Any]] = []
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(self.filepath) or '.', exist_ok=True)
+        self._file = open(self.filepath, 'w', encoding='utf-8')
+        self._write({'type': 'run_start', 'run': run_label, 'timestamp': self.started_at})
+
+    def _write(self, record: Dict[str, Any]):
+        self._file.write(json.dumps(record, ensure_ascii=False, default=str))
+        self._file.write('\n')
+        self._file.flush()
+
+    def request_started(self) -> int:
+        """HTTP请求发出前调用，返回包含本请求在内的在途请求数"""
+        with self._lock:
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+            return self.in_flight
+
+    def request_finished(self):
+        with self._lock:
+            self.in_flight = max(0, self.in_flight - 1)
+
+    def record_page(self, api: str, page: Optional[int], start_date: str, end_date: str, success: bool,
+                    status: Any, latency: float, duration: float, response_bytes: int, retries: int,
+                    rate_limit_wait: float, in_flight: int, concurrency_limit: Optional[int] = None):
+        """
+        记录一个分页请求的最终结果
+
+        Args:
+            status: 最后一次响应的HTTP状态码，未收到响应时为异常类型名
+            latency: 最后一次HTTP请求的耗时(秒)
+            duration: 包含重试、退避和限流等待在内的总耗时(秒)
+            rate_limit_wait: 等待限流令牌/429退避的总秒数
+            in_flight: 最后一次请求发出时的在途请求数
+        """
+        record = {
+            'type': 'page',
+            'offset': round(time.time() - self.started_at, 3),
+            'api': api,
+            'start_date': start_date,
+            'end_date': end_date,
+            'page': page,
+            'success': success,
+            'status': status,
+            'latency': round(latency, 4),
+            'duration': round(duration, 4),
+            'bytes': response_bytes,
+            'retries': retries,
+            'rate_limit_wait': round(rate_limit_wait, 4),
+            'in_flight': in_flight,
+            'concurrency_limit': concurrency_limit,
+        }
+        with self._lock:
+            self.pages.append(record)
+            if not self._file.closed:
+                self._write(record)
+
+    def summary(self) -> Dict[str, Any]:
+        """按API汇总的统计"""
+        with self._lock:
+            pages = list(self.pages)
+        apis = {}
+        for api in dict.fromkeys(page['api'] for page in pages):
+            api_pages = [page for page in pages if page['api'] == api]
+            latencies = [page['latency'] for page in api_pages if page['success']]
+            apis[api] = {
+                'pages': len(api_pages),
+                'failed': sum(1 for page in api_pages if not page['success']),
+                'latency_p50': round(_percentile(latencies, 50), 3),
+                'latency_p95': round(_percentile(latencies, 95), 3),
+                'latency_max': round(max(latencies, default=0.0), 3),
+                'bytes': sum(page['bytes'] for page in api_pages),
+                'retries': sum(page['retries'] for page in api_pages),
+                'rate_limit_wait': round(sum(page['rate_limit_wait'] for page in api_pages), 2),
+            }
+        return {
+            'type': 'run_summary',
+            'run': self.run_label,
+            'duration': round(time.time() - self.started_at, 2),
+            'pages': len(pages),
+            'peak_in_flight': self.peak_in_flight,
+            'apis': apis,
+        }
+
+    def close(self):
+        """写入汇总行并关闭文件（重复调用无副作用）"""
+        with self._lock:
+            if self._file.closed:
+                return
+        summary = self.summary()
+        with self._lock:
+            self._write(summary)
+            self._file.close()
+
+    def _format_depth_lines(self, pages: List[Dict[str, Any]]) -> List[str]:
+        lines = []
+        lower = 1
+        for upper in PAGE_DEPTH_BUCKETS + (None,):
+            latencies = [page['latency'] for page in pages if page['success'] and page['page']
+                         and page['page'] >= lower and (upper is None or page['page'] <= upper)]
+            if latencies:
+                label = f"第{lower}-{upper}页" if upper else f"第{lower}页以后"
+                lines.append(f"{label:<12} {len(latencies):>5} 页  p50 {_percentile(latencies, 50):.2f}s  "
+                             f"p95 {_percentile(latencies, 95):.2f}s")
+            if upper is None:
+                break
+            lower = upper + 1
+        return lines
+
+    def _format_concurrency_timeline(self, pages: List[Dict[str, Any]]) -> List[str]:
+        if not pages:
+            return []
+        max_points = getattr(config, 'RESOURCE_TIMELINE_POINTS', 12)
+        end = max(page['offset'] for page in pages)
+        bucket_seconds = max(1.0, end / max_points)
+        buckets: Dict[int, List[Dict[str, Any]]] = {}
+        for page in pages:
+            buckets.setdefault(int(page['offset'] // bucket_seconds), []).append(page)
+        lines = []
+        for index in sorted(buckets):
+            bucket = buckets[index]
+            limits = [page['concurrency_limit'] for page in bucket if page['concurrency_limit']]
+            lines.append(f"{'+%.0fs' % (index * bucket_seconds):>7}  {len(bucket):>5} 页  "
+                         f"在途峰值 {max(page['in_flight'] for page in bucket):>3}  "
+                         f"并发上限 {max(limits) if limits else '-':>3}  "
+                         f"限流等待 {sum(page['rate_limit_wait'] for page in bucket):6.1f}s")
+        return lines
+
+    def print_summary(self):
+        """打印本次运行的遥测汇总"""
+        summary = self.summary()
+        if not summary['pages']:
+            return
+        with self._lock:
+            pages = list(self.pages)
+        print_step("获取遥测", f"{summary['pages']} 个页面请求 / {summary['duration']:.0f} 秒, "
+                               f"在途峰值 {summary['peak_in_flight']}, 明细: {self.filepath}")
+        for api, stats in summary['apis'].items():
+            print(f"   {api}: {stats['pages']} 页 (失败 {stats['failed']}), "
+                  f"延迟 p50 {stats['latency_p50']:.2f}s / p95 {stats['latency_p95']:.2f}s / "
+                  f"最大 {stats['latency_max']:.2f}s, {stats['bytes'] / 1024 / 1024:.1f}MB, "
+                  f"重试 {stats['retries']} 次, 限流等待 {stats['rate_limit_wait']:.1f}s")
+        for line in self._format_depth_lines(pages):
+            print(f"   {line}")
+        slowest = sorted(pages, key=lambda page: page['duration'], reverse=True)[:5]
+        print("   最慢的页面:")
+        for page in slowest:
+            print(f"     {page['api']} {page['start_date']}~{page['end_date']} 第{page['page']}页: "
+                  f"{page['duration']:.2f}s (请求 {page['latency']:.2f}s, 重试 {page['retries']}, "
+                  f"限流等待 {page['rate_limit_wait']:.1f}s, 状态 {page['status']})")
+        print("   在途请求数:")
+        for line in self._format_concurrency_timeline(pages):
+            print(f"   {line}")
+
+
+_current: Optional[IngestionTelemetry] = None
+
+
+def start_ingestion_telemetry(run_label: str = "", filepath: Optional[str] = None) -> Optional[IngestionTelemetry]:
+    """开始记录一次获取运行的遥测，配置禁用时返回None"""
+    global _current
+    if not getattr(config, 'INGESTION_TELEMETRY_ENABLED', True):
+        return None
+    if _current is not None:
+        _current.close()
+    _current = IngestionTelemetry(filepath, run_label)
+    return _current
+
+
+def get_ingestion_telemetry() -> Optional[IngestionTelemetry]:
+    """当前运行的遥测记录器（未开始记录时为None）"""
+    return _current
+
+
+def finish_ingestion_telemetry(print_summary: bool = True) -> Optional[IngestionTelemetry]:
+    """结束当前运行的遥测：写入汇总行、关闭文件并打印汇总"""
+    global _current
+    telemetry, _current = _current, None
+    if telemetry is not None:
+        telemetry.close()
+        if print_summary:
+            telemetry.print_summary()
+    return telemetry
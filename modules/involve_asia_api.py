@@ -13,8 +13,17 @@ import threading
 import os
 import sys
 import socket
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from requests.adapters import HTTPAdapter
 from utils.logger import print_step
+from modules.token_cache import get_token_cache, extract_token_lifetime
+from modules.rate_limiter import get_rate_limiter
+from modules.resilience import ResilienceError, get_destination, is_transient_status
+from modules.resource_sampler import ResourceSampler, get_resource_sampler
+from modules.adaptive_concurrency import parse_retry_after
+from modules.recovery_queue import RecoveryQueue, recovery_backoff, merge_unique_records, describe_request
+from modules.ingestion_telemetry import get_ingestion_telemetry
 import config
 
 class ResourceMonitor:
@@ -22,47 +31,56 @@ class ResourceMonitor:
     
     def __init__(self):
         self.start_time = time.time()
+        # 内存/CPU/fd/线程由后台采样线程定期采集，这里只读取最新快照
+        self.sampler = get_resource_sampler()
+        self._connectivity = None
+        self._connectivity_checked_at = 0.0
         self.initial_memory = self.get_memory_usage()
-        
-    def get_memory_usage(self):
-        """获取内存使用情况"""
+    
+    def get_snapshot(self):
+        """获取最新的资源采样快照（不阻塞）"""
         try:
-            process = psutil.Process(os.getpid())
-            memory_info = process.memory_info()
-            return {
-                'rss': memory_info.rss / 1024 / 1024,  # MB
-                'vms': memory_info.vms / 1024 / 1024,  # MB
-                'percent': process.memory_percent()
-            }
+            sampler = self.sampler or ResourceSampler(history=1)
+            snapshot = sampler.latest()
+            if 'error' in snapshot:
+                return {'error': snapshot['error']}
+            return snapshot
         except Exception as e:
             return {'error': str(e)}
+        
+    def get_memory_usage(self):
+        """获取内存使用情况"""
+        snapshot = self.get_snapshot()
+        if 'error' in snapshot:
+            return snapshot
+        return {
+            'rss': snapshot['rss_mb'],  # MB
+            'vms': snapshot['vms_mb'],  # MB
+            'percent': snapshot['memory_percent']
+        }
     
     def get_cpu_usage(self):
-        """获取CPU使用情况"""
-        try:
-            process = psutil.Process(os.getpid())
-            cpu_percent = process.cpu_percent(interval=1)
-            system_cpu = psutil.cpu_percent(interval=1)
-            return {
-                'process_cpu': cpu_percent,
-                'system_cpu': system_cpu,
-                'cpu_count': psutil.cpu_count()
-            }
-        except Exception as e:
-            return {'error': str(e)}
+        """获取CPU使用情况（采样间隔内的平均占用）"""
+        snapshot = self.get_snapshot()
+        if 'error' in snapshot:
+            return snapshot
+        return {
+            'process_cpu': snapshot['process_cpu'],
+            'system_cpu': snapshot['system_cpu'],
+            'cpu_count': psutil.cpu_count(),
+            'threads': snapshot['threads'],
+            'fds': snapshot['fds']
+        }
     
     def get_network_info(self):
-        """获取网络连接信息"""
-        try:
-            connections = psutil.net_connections(kind='inet')
-            established = len([c for c in connections if c.status == 'ESTABLISHED'])
-            return {
-                'total_connections': len(connections),
-                'established_connections': established,
-                'network_io': psutil.net_io_counters()._asdict()
-            }
-        except Exception as e:
-            return {'error': str(e)}
+        """获取本进程的网络连接信息"""
+        snapshot = self.get_snapshot()
+        if 'error' in snapshot:
+            return snapshot
+        return {
+            'total_connections': snapshot['connections'],
+            'established_connections': snapshot['established']
+        }
     
     def get_disk_usage(self):
         """获取磁盘使用情况"""
@@ -114,17 +132,35 @@ class ResourceMonitor:
             'runtime_formatted': f"{int(runtime//3600)}h {int((runtime%3600)//60)}m {int(runtime%60)}s"
         }
     
-    def check_connectivity(self, host='8.8.8.8', port=53, timeout=5):
-        """检查网络连接"""
+    def check_connectivity(self, host=None, port=None, timeout=None):
+        """检查网络连接（结果缓存 CONNECTIVITY_CHECK_CACHE_SECONDS 秒，避免每次重试都发起探测）"""
+        now = time.time()
+        cache_seconds = getattr(config, 'CONNECTIVITY_CHECK_CACHE_SECONDS', 60)
+        if self._connectivity is not None and now - self._connectivity_checked_at < cache_seconds:
+            return self._connectivity
+        
+        host = host or getattr(config, 'CONNECTIVITY_CHECK_HOST', '8.8.8.8')
+        port = port or getattr(config, 'CONNECTIVITY_CHECK_PORT', 53)
+        timeout = timeout or getattr(config, 'CONNECTIVITY_CHECK_TIMEOUT', 5)
         try:
-            socket.setdefaulttimeout(timeout)
-            socket.socket(socket.AF_INET, socket.SOCK_STREAM).connect((host, port))
-            return True
-        except socket.error:
-            return False
+            # 只为本次探测设置超时，不修改全局默认超时
+            with socket.create_connection((host, port), timeout=timeout):
+                self._connectivity = True
+        except OSError:
+            self._connectivity = False
+        self._connectivity_checked_at = now
+        return self._connectivity
+    
+    def print_resource_timeline(self, prefix=""):
+        """打印本监控器创建以来的资源时间线"""
+        if self.sampler is not None:
+            self.sampler.print_timeline(prefix, since=self.start_time)
     
     def print_resource_status(self, prefix="", show_details=True):
         """打印完整的资源使用状态"""
+        if not getattr(config, 'RESOURCE_MONITOR_ENABLED', True):
+            return
+        
         print(f"\n{'='*60}")
         print(f"🔍 {prefix} 系统资源监控报告")
         print(f"{'='*60}")
@@ -144,6 +180,7 @@ class ResourceMonitor:
         cpu = self.get_cpu_usage()
         if 'error' not in cpu:
             print(f"⚡ CPU使用: 进程 {cpu['process_cpu']:.1f}%, 系统 {cpu['system_cpu']:.1f}% (共{cpu['cpu_count']}核)")
+            print(f"🧵 线程/文件描述符: {cpu['threads']} 个线程, {cpu['fds'] if cpu['fds'] is not None else '-'} 个fd")
         else:
             print(f"⚡ CPU使用: 获取失败 - {cpu['error']}")
         
@@ -179,7 +216,7 @@ class ResourceMonitor:
 class InvolveAsiaAPI:
     """Involve Asia API客户端 - 增强版"""
     
-    def __init__(self, api_secret=None, api_key=None):
+    def __init__(self, api_secret=None, api_key=None, parallel_pages=None):
         # 使用配置文件中的值或传入的值
         self.api_secret = api_secret or config.INVOLVE_ASIA_API_SECRET
         self.api_key = api_key or config.INVOLVE_ASIA_API_KEY
@@ -196,14 +233,62 @@ class InvolveAsiaAPI:
         
         # 跳过的页面记录
         self.skipped_pages = []
+        # 失败请求明细（日期范围 + 页码），供结束时的恢复队列重新获取
+        self.failed_requests = []
         
         # 请求超时设置
         self.request_timeout = getattr(config, 'REQUEST_TIMEOUT', 30)
         self.max_retries = getattr(config, 'MAX_RETRY_ATTEMPTS', 5)
         self.request_delay = getattr(config, 'REQUEST_DELAY', 0.5)
+        self.connect_timeout = getattr(config, 'HTTP_CONNECT_TIMEOUT', 10)
+        
+        # 并行页数：大于1时第一页之后的页面由有界线程池并行获取
+        self.parallel_pages = max(1, parallel_pages or getattr(config, 'SYNC_PARALLEL_PAGES', 1))
+        
+        # 连接池Session：认证与所有分页请求复用，首次使用时创建
+        self.session = None
+        self._auth_lock = threading.Lock()
+        
+        # 跨进程共享的令牌桶限流器（同一API Key的所有进程共用）
+        self.rate_limiter = get_rate_limiter(self.api_secret, self.api_key)
+        
+        # 按主机共享的熔断器与重试预算：服务商故障时快速失败，失败页面交给恢复队列
+        self.resilience = get_destination(self.conversions_url)
+    
+    def _get_session(self):
+        """获取连接池Session（连接池大小覆盖并行页数）"""
+        if self.session is None:
+            pool_size = max(self.parallel_pages, getattr(config, 'HTTP_MAX_KEEPALIVE_CONNECTIONS', 10))
+            session = requests.Session()
+            # 重试由 _handle_page_request 统一处理，适配器本身不重试
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            self.session = session
+        return self.session
     
-    def authenticate(self):
-        """执行API认证"""
+    def close(self):
+        """关闭连接池Session"""
+        if self.session is not None:
+            self.session.close()
+            self.session = None
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+    
+    def authenticate(self, force_refresh=False):
+        """执行API认证（优先复用缓存中未过期的Token）"""
+        token_cache = get_token_cache()
+        if token_cache and not force_refresh:
+            cached_token = token_cache.get(self.api_secret, self.api_key)
+            if cached_token:
+                self.token = cached_token
+                print_step("认证缓存", f"使用缓存Token: {cached_token[:8]}...")
+                return True
+        
         print_step("认证步骤", "正在执行API认证...")
         
         headers = {"Accept": "application/json"}
@@ -213,11 +298,11 @@ class InvolveAsiaAPI:
         }
         
         try:
-            response = requests.post(
+            response = self._get_session().post(
                 self.auth_url, 
                 headers=headers, 
                 data=data, 
-                timeout=self.request_timeout
+                timeout=(self.connect_timeout, self.request_timeout)
             )
             response.raise_for_status()
             
@@ -227,6 +312,9 @@ class InvolveAsiaAPI:
                 self.token = result["data"]["token"]
                 token_preview = self.token[:8] + "..." if len(self.token) > 8 else self.token
                 print_step("认证成功", f"获得Token: {token_preview}")
+                if token_cache:
+                    token_cache.set(self.api_secret, self.api_key, self.token,
+                                    extract_token_lifetime(result["data"]))
                 return True
             else:
                 print_step("认证失败", f"响应结构不符合预期: {result}")
@@ -239,70 +327,120 @@ class InvolveAsiaAPI:
             print_step("认证失败", f"JSON解析错误: {str(e)}")
             return False
     
+    def _refresh_token(self):
+        """Token失效（401）时作废缓存并重新认证"""
+        token_cache = get_token_cache()
+        if token_cache and self.token:
+            token_cache.invalidate(self.api_secret, self.api_key, self.token)
+        return self.authenticate(force_refresh=True)
+    
     def _make_request_with_timeout(self, url, headers, data, timeout):
-        """使用超时机制发送请求"""
-        class RequestResult:
-            def __init__(self):
-                self.response = None
-                self.exception = None
-                self.completed = False
-        
-        result = RequestResult()
-        
-        def make_request():
-            try:
-                result.response = requests.post(url, headers=headers, data=data, timeout=timeout)
-                result.completed = True
-            except Exception as e:
-                result.exception = e
-                result.completed = True
+        """
+        通过连接池Session发送请求
         
-        thread = threading.Thread(target=make_request)
-        thread.daemon = True
-        thread.start()
-        
-        # 等待请求完成或超时
-        thread.join(timeout + 5)  # 额外5秒缓冲
-        
-        if not result.completed:
-            print_step("请求超时", f"请求超时 ({timeout}s)，可能遇到网络问题")
-            # 显示资源状态
-            self.resource_monitor.print_resource_status("请求超时时")
-            raise requests.exceptions.Timeout(f"Request timed out after {timeout}s")
-        
-        if result.exception:
-            raise result.exception
-        
-        return result.response
+        连接超时与读取超时分别由 requests 控制，超时后连接直接释放，不再遗留后台线程
+        """
+        return self._get_session().post(url, headers=headers, data=data,
+                                        timeout=(self.connect_timeout, timeout))
     
-    def _handle_page_request(self, page, headers, data, api_label=""):
-        """处理单页请求，包含重试和跳过机制"""
-        max_retries = 5  # 用户要求的最大重试次数
+    def _refresh_shared_token(self, headers, used_authorization):
+        """
+        401时刷新Token并更新共享headers（并行模式下只有第一个线程真正重新认证）
+        """
+        with self._auth_lock:
+            if headers.get("Authorization") != used_authorization:
+                return True  # 其他线程已刷新
+            if self._refresh_token():
+                headers["Authorization"] = f"Bearer {self.token}"
+                return True
+            return False
+    
+    def _handle_page_request(self, page, headers, data, api_label="", max_retries=None):
+        """处理单页请求，包含重试和跳过机制（max_retries 为空时使用默认重试次数）"""
+        if max_retries is None:
+            max_retries = 5  # 用户要求的最大重试次数
         retry_count = 0
         page_success = False
+        token_refreshed = False
+        throttled = False
+        
+        # 遥测：记录本页最终的状态、延迟、字节数、重试次数和限流等待
+        telemetry = get_ingestion_telemetry()
+        page_start = time.monotonic()
+        probe = {'status': None, 'latency': 0.0, 'bytes': 0, 'rate_limit_wait': 0.0, 'in_flight': 0}
+        
+        def finish(result, success):
+            if telemetry is not None:
+                telemetry.record_page(api_label.strip(' []') or 'default', page, data.get('start_date'),
+                                      data.get('end_date'), success, probe['status'], probe['latency'],
+                                      time.monotonic() - page_start, probe['bytes'], retry_count,
+                                      probe['rate_limit_wait'], probe['in_flight'], self.parallel_pages)
+            return result, success
         
         while retry_count <= max_retries and not page_success:
             try:
-                if retry_count > 0:
-                    wait_time = min(60, 10 * retry_count)  # 增量等待时间，最多60秒
-                    print(f"   �� 第 {retry_count} 次重试，等待 {wait_time} 秒...")
+                # 429后的重试由共享限流器退避，不消耗重试预算
+                self.resilience.begin(retry_count if not throttled else 0)
+            except ResilienceError as e:
+                print_step("快速失败", f"{api_label}第{page}页: {str(e)}")
+                probe['status'] = type(e).__name__
+                return finish(None, False)
+            
+            try:
+                # 429的退避由共享限流器处理，不再叠加递增等待
+                if retry_count > 0 and not throttled:
+                    wait_time = self.resilience.backoff(retry_count)  # 指数退避 + 抖动
+                    print(f"   🔄 第 {retry_count} 次重试，等待 {wait_time:.1f} 秒...")
                     time.sleep(wait_time)
+                throttled = False
+                
+                # 从共享令牌桶领取令牌，与其他进程一起把请求速率控制在限额内
+                if self.rate_limiter:
+                    probe['rate_limit_wait'] += self.rate_limiter.acquire()
                 
                 # 使用增强的请求方法
-                response = self._make_request_with_timeout(
-                    self.conversions_url, 
-                    headers, 
-                    data, 
-                    self.request_timeout
-                )
+                used_authorization = headers.get("Authorization")
+                if telemetry is not None:
+                    probe['in_flight'] = telemetry.request_started()
+                request_start = time.monotonic()
+                try:
+                    response = self._make_request_with_timeout(
+                        self.conversions_url, 
+                        headers, 
+                        data, 
+                        self.request_timeout
+                    )
+                finally:
+                    probe['latency'] = time.monotonic() - request_start
+                    if telemetry is not None:
+                        telemetry.request_finished()
+                probe['status'] = response.status_code
+                probe['bytes'] = len(response.content)
+                
+                # 处理401错误(Token失效)：刷新一次Token后立即重试
+                if response.status_code == 401 and not token_refreshed:
+                    token_refreshed = True
+                    print(f"   🔑 第{page}页Token已失效，重新认证后重试...")
+                    # headers由get_conversions共享，后续页面同样使用新Token
+                    self._refresh_shared_token(headers, used_authorization)
+                    continue
                 
                 # 处理429错误(频率限制)
                 if response.status_code == 429:
                     retry_count += 1
-                    print(f"   ⚠️  遇到频率限制，等待{config.RATE_LIMIT_DELAY}秒后重试...")
-                    time.sleep(config.RATE_LIMIT_DELAY)
+                    if self.rate_limiter:
+                        # 通知共享同一Key的所有进程一起退避，下次领取令牌时等待
+                        backoff = self.rate_limiter.penalize(parse_retry_after(response.headers.get('Retry-After')))
+                        throttled = True
+                        print(f"   ⚠️  遇到频率限制，共享退避{backoff:.1f}秒后重试...")
+                    else:
+                        print(f"   ⚠️  遇到频率限制，等待{config.RATE_LIMIT_DELAY}秒后重试...")
+                        time.sleep(config.RATE_LIMIT_DELAY)
+                        probe['rate_limit_wait'] += config.RATE_LIMIT_DELAY
                     continue
                 
+                if is_transient_status(response.status_code):
+                    self.resilience.record_failure()
                 response.raise_for_status()
                 result = response.json()
                 
@@ -312,10 +450,13 @@ class InvolveAsiaAPI:
                     continue
                 
                 # 请求成功
+                self.resilience.record_success()
                 page_success = True
-                return result, True
+                return finish(result, True)
                 
             except requests.exceptions.Timeout as e:
+                probe['status'] = type(e).__name__
+                self.resilience.record_failure()
                 retry_count += 1
                 print_step("请求超时", f"第{page}页请求超时（第{retry_count}次重试）: {str(e)}")
                 if retry_count <= max_retries:
@@ -323,6 +464,9 @@ class InvolveAsiaAPI:
                     self.resource_monitor.print_resource_status(f"第{page}页超时重试{retry_count}")
                 
             except requests.exceptions.RequestException as e:
+                if not isinstance(e, requests.exceptions.HTTPError):
+                    probe['status'] = type(e).__name__
+                    self.resilience.record_failure()
                 retry_count += 1
                 print_step("网络错误", f"第{page}页请求错误（第{retry_count}次重试）: {str(e)}")
                 if retry_count <= max_retries:
@@ -344,7 +488,131 @@ class InvolveAsiaAPI:
                     self.resource_monitor.print_resource_status(f"第{page}页未知错误重试{retry_count}")
         
         # 重试次数用完，返回失败
-        return None, False
+        return finish(None, False)
+    
+    def _iter_pages_parallel(self, pages, headers, base_data, api_label=""):
+        """
+        使用有界线程池并行获取多个页面，按页码顺序产出
+        
+        同时提交的页面数不超过 2 * parallel_pages，提前停止时未开始的页面会被取消
+        
+        Yields:
+            tuple: (页码, 响应结果, 是否成功)
+        """
+        window = self.parallel_pages * 2
+        executor = ThreadPoolExecutor(max_workers=self.parallel_pages, thread_name_prefix="involve-page")
+        futures = {}
+        next_index = 0
+        try:
+            for page in pages:
+                while next_index < len(pages) and len(futures) < window:
+                    submit_page = pages[next_index]
+                    next_index += 1
+                    page_data = dict(base_data, page=str(submit_page))
+                    futures[submit_page] = executor.submit(
+                        self._handle_page_request, submit_page, headers, page_data, api_label)
+                result, success = futures.pop(page).result()
+                yield page, result, success
+        finally:
+            # 未开始的页面直接取消；仍在执行的页面受请求超时约束，不等待其结束
+            running = [future for future in futures.values() if not future.cancel()]
+            executor.shutdown(wait=not running)
+    
+    def recover_pages(self, failed_requests, currency=None, api_label=""):
+        """
+        逐页（低并发）、带抖动的指数退避重新获取失败页面
+        
+        page 为 None 的请求（整个日期分片失败）先获取第一页，再把其余页面加入待恢复列表
+        
+        Returns:
+            tuple: (恢复出的记录列表, 仍然失败的请求列表)
+        """
+        currency = currency or config.PREFERRED_CURRENCY
+        max_attempts = getattr(config, 'RECOVERY_MAX_ATTEMPTS', 3)
+        headers = {
+            "Accept": "application/json",
+            "Authorization": f"Bearer {self.token}"
+        }
+        pending = list(failed_requests)
+        records = []
+        remaining = []
+        
+        while pending:
+            failed_request = pending.pop(0)
+            page = failed_request.get('page') or 1
+            data = {
+                "page": str(page),
+                "limit": str(config.DEFAULT_PAGE_LIMIT),
+                "start_date": failed_request['start_date'],
+                "end_date": failed_request['end_date'],
+                "filters[preferred_currency]": currency
+            }
+            if self.resilience.is_open():
+                # 服务商仍在故障中，剩余页面直接保存到持久化队列，稍后 --resume 补拉
+                print_step("恢复暂停", f"{api_label}熔断器打开，{len(pending) + 1} 个页面留待稍后恢复")
+                remaining.append(failed_request)
+                remaining.extend(pending)
+                break
+            for attempt in range(1, max_attempts + 1):
+                time.sleep(recovery_backoff(attempt))
+                result, success = self._handle_page_request(page, headers, data, api_label, max_retries=0)
+                if success and result:
+                    data_obj = result["data"]
+                    records.extend(data_obj.get("data", []) if isinstance(data_obj, dict) else data_obj or [])
+                    if failed_request.get('page') is None and isinstance(data_obj, dict):
+                        limit = data_obj.get("limit", config.DEFAULT_PAGE_LIMIT)
+                        total_pages = (data_obj.get("count", 0) + limit - 1) // limit
+                        pending.extend(dict(failed_request, page=next_page) for next_page in range(2, total_pages + 1))
+                    print(f"   {api_label}🩹 恢复成功: {describe_request(failed_request)}")
+                    break
+            else:
+                remaining.append(failed_request)
+        
+        return records, remaining
+    
+    def _queue_untried_pages(self, pages, skipped_pages, start_date, end_date, api_label=""):
+        """因跳过页面过多而终止获取时，把尚未尝试的页面记为跳过并加入恢复队列，避免这些页面被静默丢弃"""
+        if not pages:
+            return
+        skipped_pages.extend(pages)
+        self.skipped_pages.extend(pages)
+        self.failed_requests.extend({'start_date': start_date, 'end_date': end_date, 'page': page} for page in pages)
+        print_step("页面排队", f"{api_label}第{pages[0]}-{pages[-1]}页尚未获取，共 {len(pages)} 页加入恢复队列")
+    
+    def _drain_recovery_queue(self, all_conversions, skipped_pages, start_date, end_date, currency, api_name):
+        """
+        获取结束时重新获取本次失败的页面，合并到 all_conversions 并更新 skipped_pages；
+        仍然失败的页面持久化到恢复队列
+        
+        Returns:
+            tuple: (恢复队列批次ID或None, 恢复的页数)
+        """
+        if not self.failed_requests or not getattr(config, 'RECOVERY_ENABLED', True):
+            return None, 0
+        api_label = f"[{api_name}] " if api_name else ""
+        print_step("恢复队列", f"{api_label}重新获取 {len(self.failed_requests)} 个失败页面")
+        
+        records, remaining = self.recover_pages(self.failed_requests, currency, api_label)
+        added = merge_unique_records(all_conversions, records)
+        
+        remaining_pages = {request['page'] for request in remaining}
+        if None in remaining_pages:
+            # 整个日期范围仍未恢复，跳过的页面保持不变
+            recovered_count = 0
+        else:
+            # page 为 None 的请求恢复时会展开出新的页面，以仍失败的请求为准
+            recovered_pages = set(skipped_pages) - remaining_pages
+            recovered_count = len(recovered_pages)
+            skipped_pages[:] = sorted(remaining_pages)
+            self.skipped_pages = [page for page in self.skipped_pages if page not in recovered_pages]
+        self.failed_requests = remaining
+        print_step("恢复完成", f"{api_label}恢复 {recovered_count} 页 (新增 {added} 条记录)，仍失败 {len(remaining)} 页")
+        
+        if not remaining:
+            return None, recovered_count
+        run_id = RecoveryQueue(self.api_secret, self.api_key).add_run(
+            api_name, start_date, end_date, currency, remaining)
+        return run_id, recovered_count
     
     def get_conversions(self, start_date, end_date, currency=None, api_name=None):
         """获取指定日期范围的所有conversion数据 - 增强版"""
@@ -370,6 +638,7 @@ class InvolveAsiaAPI:
         total_pages = 0
         pages_fetched = 0
         skipped_pages = []
+        self.failed_requests = []
         data_complete = False
         
         while not data_complete:
@@ -432,6 +701,41 @@ class InvolveAsiaAPI:
                         data_complete = True
                         break
                     
+                    # 并行模式：第一页确定总页数后，剩余页面交给有界线程池并行获取
+                    if self.parallel_pages > 1 and total_pages > current_page:
+                        max_pages = total_pages
+                        if config.MAX_RECORDS_LIMIT is not None:
+                            max_pages = min(max_pages, (config.MAX_RECORDS_LIMIT + limit - 1) // limit)
+                        remaining_pages = list(range(current_page + 1, max_pages + 1))
+                        print(f"   {api_label}🧵 并行获取剩余 {len(remaining_pages)} 页 (线程数: {self.parallel_pages})")
+                        
+                        for parallel_page, page_result, page_success in self._iter_pages_parallel(
+                                remaining_pages, headers, data, api_label):
+                            if page_success and page_result:
+                                parallel_obj = page_result["data"]
+                                page_data = parallel_obj.get("data", []) if isinstance(parallel_obj, dict) else []
+                                pages_fetched += 1
+                                all_conversions.extend(page_data)
+                                print(f"   {api_label}📊 第 {parallel_page} 页: 获取到 {len(page_data)} 条记录")
+                                if config.MAX_RECORDS_LIMIT is not None and len(all_conversions) >= config.MAX_RECORDS_LIMIT:
+                                    all_conversions = all_conversions[:config.MAX_RECORDS_LIMIT]
+                                    print(f"   {api_label}⏹️ 已达到记录数限制 ({config.MAX_RECORDS_LIMIT} 条)，停止获取")
+                                    break
+                            else:
+                                skipped_pages.append(parallel_page)
+                                self.skipped_pages.append(parallel_page)
+                                self.failed_requests.append(
+                                    {'start_date': start_date, 'end_date': end_date, 'page': parallel_page})
+                                print_step("页面跳过", f"❌ 第{parallel_page}页重试{self.max_retries}次后仍失败，跳过该页面")
+                                if len(skipped_pages) > getattr(config, 'MAX_SKIPPED_PAGES', 10):
+                                    print_step("获取终止", f"❌ 跳过页面过多({len(skipped_pages)}页)，终止数据获取")
+                                    untried = remaining_pages[remaining_pages.index(parallel_page) + 1:]
+                                    self._queue_untried_pages(untried, skipped_pages, start_date, end_date, api_label)
+                                    break
+                        
+                        data_complete = True
+                        break
+                    
                     page = next_page
                     
                 else:
@@ -452,6 +756,7 @@ class InvolveAsiaAPI:
                 # 页面获取失败，记录跳过的页面
                 skipped_pages.append(page)
                 self.skipped_pages.append(page)
+                self.failed_requests.append({'start_date': start_date, 'end_date': end_date, 'page': page})
                 
                 print_step("页面跳过", f"❌ 第{page}页重试{self.max_retries}次后仍失败，跳过该页面继续获取下一页")
                 
@@ -461,11 +766,24 @@ class InvolveAsiaAPI:
                 # 继续下一页
                 page += 1
                 
-                # 安全检查：如果跳过的页面太多，可能需要停止
-                if len(skipped_pages) > 10:  # 如果跳过超过10页，停止获取
+                # 安全检查：如果跳过的页面太多，停止获取，未尝试的页面同样进入恢复队列
+                if len(skipped_pages) > getattr(config, 'MAX_SKIPPED_PAGES', 10):
                     print_step("获取终止", f"❌ 跳过页面过多({len(skipped_pages)}页)，终止数据获取")
+                    if total_pages:
+                        untried = list(range(page, total_pages + 1))
+                        self._queue_untried_pages(untried, skipped_pages, start_date, end_date, api_label)
+                    else:
+                        # 还没有任何页面成功，总页数未知：整个日期范围作为一个请求排队（恢复时从第一页重新展开）
+                        self.failed_requests = [{'start_date': start_date, 'end_date': end_date, 'page': None}]
                     break
         
+        # 失败页面进入恢复队列，低并发补拉（已达到记录数限制时无需补拉）
+        recovery_run_id = None
+        if skipped_pages and (config.MAX_RECORDS_LIMIT is None or len(all_conversions) < config.MAX_RECORDS_LIMIT):
+            recovery_run_id, recovered_count = self._drain_recovery_queue(
+                all_conversions, skipped_pages, start_date, end_date, currency, api_name)
+            pages_fetched += recovered_count
+        
         # 显示最终资源状态
         self.resource_monitor.print_resource_status(f"{api_label}数据获取完成")
         
@@ -481,6 +799,7 @@ class InvolveAsiaAPI:
                     "total_pages": total_pages,
                     "pages_fetched": pages_fetched,
                     "skipped_pages": skipped_pages,
+                    "recovery_run_id": recovery_run_id,
                     "current_page_count": len(all_conversions),
                     "data": all_conversions
                 }
@@ -520,6 +839,11 @@ class InvolveAsiaAPI:
                 json.dump(data, f, indent=2, ensure_ascii=False)
             
             print_step("JSON保存成功", f"数据已保存到: {filepath}")
+            
+            # 有未恢复页面时记录数据集路径，--resume 补拉后合并到该文件
+            recovery_run_id = data.get('data', {}).get('recovery_run_id') if isinstance(data.get('data'), dict) else None
+            if recovery_run_id:
+                RecoveryQueue(self.api_secret, self.api_key).attach_dataset(recovery_run_id, filepath)
             return filepath
             
         except Exception as e:
@@ -551,5 +875,6 @@ class InvolveAsiaAPI:
         
         # 最终资源状态
         self.resource_monitor.print_resource_status("最终状态", show_details=True)
+        self.resource_monitor.print_resource_timeline("API数据获取")
         
         print(f"{'='*60}\n") 
\ No newline at end of file
@@ -11,18 +11,109 @@ import json
 import time
 import os
 import sys
-from datetime import datetime
-from typing import Optional, Dict, List, Tuple, Any
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from typing import Optional, Dict, List, Tuple, Any, AsyncIterator
+from urllib.parse import urlparse
 from utils.logger import print_step
+from modules.token_cache import get_token_cache, extract_token_lifetime
+from modules.adaptive_concurrency import AdaptiveConcurrencyController, parse_retry_after
+from modules.rate_limiter import get_rate_limiter
+from modules.resilience import ResilienceError, get_destination, is_transient_status
+from modules.request_hedging import HedgePolicy, hedged_call
+from modules.recovery_queue import RecoveryQueue, recovery_backoff, merge_unique_records, describe_request
+from modules.ingestion_telemetry import get_ingestion_telemetry
 import config
 
 # 重用现有的ResourceMonitor类
 from modules.involve_asia_api import ResourceMonitor
 
+# HTTP/2支持（需要安装 h2: pip install httpx[http2]）
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+# 按 (主机, 是否HTTP/2, 事件循环) 共享的长连接客户端
+_shared_clients: Dict[Tuple[str, bool, int], httpx.AsyncClient] = {}
+
+
+def _build_client_config(http2: bool) -> Dict[str, Any]:
+    """构造长连接HTTP客户端配置"""
+    return {
+        'timeout': httpx.Timeout(getattr(config, 'REQUEST_TIMEOUT', 45)),
+        'limits': httpx.Limits(
+            max_keepalive_connections=getattr(config, 'HTTP_MAX_KEEPALIVE_CONNECTIONS', 10),
+            max_connections=getattr(config, 'HTTP_MAX_CONNECTIONS', 20),
+            keepalive_expiry=getattr(config, 'HTTP_KEEPALIVE_EXPIRY', 30)
+        ),
+        'follow_redirects': True,
+        'http2': http2
+    }
+
+
+def _resolve_http2(http2: Optional[bool] = None) -> bool:
+    """确定是否启用HTTP/2，未安装h2时自动回退到HTTP/1.1"""
+    if http2 is None:
+        http2 = getattr(config, 'HTTP2_ENABLED', False)
+    return bool(http2) and HTTP2_AVAILABLE
+
+
+def get_shared_async_client(url: str, http2: Optional[bool] = None) -> httpx.AsyncClient:
+    """
+    获取指定主机的共享长连接客户端（需在事件循环内调用）
+    
+    同一事件循环内访问同一主机的所有 AsyncInvolveAsiaAPI 实例复用同一个连接池，
+    认证请求与所有分页请求都走已预热的连接。
+    """
+    http2 = _resolve_http2(http2)
+    loop = asyncio.get_running_loop()
+    key = (urlparse(url).netloc, http2, id(loop))
+    client = _shared_clients.get(key)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(**_build_client_config(http2))
+        _shared_clients[key] = client
+    return client
+
+
+async def close_shared_clients():
+    """关闭当前事件循环内创建的所有共享客户端"""
+    loop_id = id(asyncio.get_running_loop())
+    for key in [key for key in _shared_clients if key[2] == loop_id]:
+        client = _shared_clients.pop(key)
+        if not client.is_closed:
+            await client.aclose()
+
+def _split_date_range(start_date: str, end_date: str) -> List[str]:
+    """将日期范围拆分为逐天列表 (YYYY-MM-DD)，包含首尾两天"""
+    start = datetime.strptime(start_date[:10], '%Y-%m-%d')
+    end = datetime.strptime(end_date[:10], '%Y-%m-%d')
+    days = []
+    while start <= end:
+        days.append(start.strftime('%Y-%m-%d'))
+        start += timedelta(days=1)
+    return days
+
+
+def _split_day_into_hours(day: str, parts: int) -> List[Tuple[str, str]]:
+    """将一天均分为若干个小时分片，返回 [(开始时间, 结束时间)]"""
+    parts = max(1, min(24, parts))
+    hours_per_part = -(-24 // parts)
+    shards = []
+    for first_hour in range(0, 24, hours_per_part):
+        last_hour = min(23, first_hour + hours_per_part - 1)
+        shards.append((f"{day} {first_hour:02d}:00:00", f"{day} {last_hour:02d}:59:59"))
+    return shards
+
+
 class AsyncInvolveAsiaAPI:
     """Involve Asia API异步客户端"""
     
-    def __init__(self, api_secret=None, api_key=None):
+    def __init__(self, api_secret=None, api_key=None, max_concurrent_requests=None,
+                 global_semaphore: Optional[asyncio.Semaphore] = None,
+                 http_client: Optional[httpx.AsyncClient] = None,
+                 share_client: bool = False, http2: Optional[bool] = None):
         # 使用配置文件中的值或传入的值
         self.api_secret = api_secret or config.INVOLVE_ASIA_API_SECRET
         self.api_key = api_key or config.INVOLVE_ASIA_API_KEY
@@ -33,12 +124,19 @@ class AsyncInvolveAsiaAPI:
         
         # 认证token
         self.token = None
+        self._auth_lock = None
+        self._auth_lock_loop = None
         
         # 资源监控器
         self.resource_monitor = ResourceMonitor()
         
         # 跳过的页面记录
         self.skipped_pages = []
+        # 失败请求明细（日期范围 + 页码），供结束时的恢复队列重新获取
+        self.failed_requests = []
+        
+        # 最近一次逐页获取的统计（见 iter_conversion_pages）
+        self.page_stats = {'total_count': 0, 'total_pages': 0, 'pages_fetched': 0}
         
         # 请求配置 - 针对超时问题优化
         self.request_timeout = getattr(config, 'REQUEST_TIMEOUT', 45)  # 增加单个请求超时
@@ -46,22 +144,93 @@ class AsyncInvolveAsiaAPI:
         self.request_delay = getattr(config, 'REQUEST_DELAY', 0.2)  # 减少请求间隔，提高速度
         
         # 并发配置
-        self.max_concurrent_requests = getattr(config, 'MAX_CONCURRENT_REQUESTS', 5)
+        self.max_concurrent_requests = max_concurrent_requests or getattr(config, 'MAX_CONCURRENT_REQUESTS', 5)
         self.semaphore = None
+        # 多API模式下由所有客户端共享的全局信号量（单API模式为None）
+        self.global_semaphore = global_semaphore
+        # 自适应(AIMD)并发控制器：启用后取代固定信号量，显式传入的并发数作为其上限
+        self.concurrency_controller = None
+        if getattr(config, 'ADAPTIVE_CONCURRENCY_ENABLED', False):
+            self.concurrency_controller = AdaptiveConcurrencyController(
+                self.api_secret, self.api_key,
+                initial_limit=self.max_concurrent_requests,
+                max_limit=max_concurrent_requests
+            )
         
-        # HTTP客户端配置
-        self.client_config = {
-            'timeout': httpx.Timeout(self.request_timeout),
-            'limits': httpx.Limits(
-                max_keepalive_connections=10,
-                max_connections=20,
-                keepalive_expiry=30
-            ),
-            'follow_redirects': True
-        }
+        # 跨进程共享的令牌桶限流器（同一API Key的所有进程共用）
+        self.rate_limiter = get_rate_limiter(self.api_secret, self.api_key)
+        
+        # 按主机共享的熔断器与重试预算：服务商故障时快速失败，失败页面交给恢复队列
+        self.resilience = get_destination(self.conversions_url)
+        
+        # 请求对冲：慢请求超过近期延迟高分位数时补发一个相同请求，先返回者胜出
+        self.hedge_policy = HedgePolicy() if getattr(config, 'HEDGED_REQUESTS_ENABLED', False) else None
+        
+        # HTTP客户端配置 - 由API对象持有的长连接客户端，认证与所有分页请求复用
+        self.http2 = _resolve_http2(http2)
+        self.client_config = _build_client_config(self.http2)
+        self.share_client = share_client
+        self._client = http_client
+        self._owns_client = False  # 外部传入或共享的客户端不由本对象关闭
+        self._client_loop = None
+    
+    async def __aenter__(self):
+        await self._get_client()
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.aclose()
     
-    async def authenticate(self) -> bool:
-        """执行API认证"""
+    async def _get_client(self) -> httpx.AsyncClient:
+        """获取长连接HTTP客户端，首次调用时创建"""
+        loop = asyncio.get_running_loop()
+        if self._client is not None and not self._client.is_closed:
+            # 外部传入的客户端由调用方负责其事件循环
+            if not self._owns_client and not self.share_client:
+                return self._client
+            if self._client_loop is loop:
+                return self._client
+            # 事件循环已更换（例如多次asyncio.run），旧连接不可复用
+            self._client = None
+        
+        if self.share_client:
+            self._client = get_shared_async_client(self.conversions_url, self.http2)
+            self._owns_client = False
+        else:
+            self._client = httpx.AsyncClient(**self.client_config)
+            self._owns_client = True
+        self._client_loop = loop
+        return self._client
+    
+    async def aclose(self):
+        """关闭本对象持有的HTTP客户端"""
+        if self._client is not None and self._owns_client and not self._client.is_closed:
+            await self._client.aclose()
+        if self._owns_client or self.share_client:
+            self._client = None
+            self._client_loop = None
+    
+    async def _run_and_close(self, coro):
+        """在同步包装器中运行协程，结束后释放本事件循环内的连接"""
+        try:
+            return await coro
+        finally:
+            await self.aclose()
+    
+    async def authenticate(self, force_refresh: bool = False) -> bool:
+        """
+        执行API认证（优先复用缓存中未过期的Token）
+
+        Token缓存文件带文件锁，读写在线程中执行，不阻塞事件循环
+        """
+        token_cache = get_token_cache()
+        if token_cache and not force_refresh:
+            cached_token = await asyncio.to_thread(token_cache.get, self.api_secret, self.api_key)
+            if cached_token:
+                self.token = cached_token
+                print_step("认证缓存", f"使用缓存Token: {cached_token[:8]}...")
+                return True
+        
         print_step("异步认证", "正在执行API认证...")
         
         headers = {"Accept": "application/json"}
@@ -71,25 +240,28 @@ class AsyncInvolveAsiaAPI:
         }
         
         try:
-            async with httpx.AsyncClient(**self.client_config) as client:
-                response = await client.post(
-                    self.auth_url,
-                    headers=headers,
-                    data=data
-                )
-                response.raise_for_status()
-                
-                result = response.json()
+            client = await self._get_client()
+            response = await client.post(
+                self.auth_url,
+                headers=headers,
+                data=data
+            )
+            response.raise_for_status()
+            
+            result = response.json()
+            
+            if "data" in result and "token" in result["data"]:
+                self.token = result["data"]["token"]
+                token_preview = self.token[:8] + "..." if len(self.token) > 8 else self.token
+                print_step("认证成功", f"获得Token: {token_preview}")
+                if token_cache:
+                    await asyncio.to_thread(token_cache.set, self.api_secret, self.api_key, self.token,
+                                            extract_token_lifetime(result["data"]))
+                return True
+            else:
+                print_step("认证失败", f"响应结构不符合预期: {result}")
+                return False
                 
-                if "data" in result and "token" in result["data"]:
-                    self.token = result["data"]["token"]
-                    token_preview = self.token[:8] + "..." if len(self.token) > 8 else self.token
-                    print_step("认证成功", f"获得Token: {token_preview}")
-                    return True
-                else:
-                    print_step("认证失败", f"响应结构不符合预期: {result}")
-                    return False
-                    
         except httpx.RequestError as e:
             print_step("认证失败", f"请求错误: {str(e)}")
             return False
@@ -100,13 +272,50 @@ class AsyncInvolveAsiaAPI:
             print_step("认证失败", f"未知错误: {str(e)}")
             return False
     
+    async def _refresh_token(self, stale_token: Optional[str]) -> bool:
+        """
+        Token失效（401）时重新认证
+        
+        并发页面同时收到401时只有第一个会真正发起认证，其余直接复用新Token
+        """
+        loop = asyncio.get_running_loop()
+        if self._auth_lock is None or self._auth_lock_loop is not loop:
+            self._auth_lock = asyncio.Lock()
+            self._auth_lock_loop = loop
+        
+        async with self._auth_lock:
+            if self.token and self.token != stale_token:
+                return True
+            token_cache = get_token_cache()
+            if token_cache and stale_token:
+                await asyncio.to_thread(token_cache.invalidate, self.api_secret, self.api_key, stale_token)
+            return await self.authenticate(force_refresh=True)
+    
+    @asynccontextmanager
+    async def _acquire_request_slot(self):
+        """获取请求槽位：先占用本API的并发名额（固定信号量或自适应控制器），再占用全局并发名额"""
+        api_slot = self.concurrency_controller.slot() if self.concurrency_controller else self.semaphore
+        async with api_slot:
+            if self.global_semaphore is None:
+                yield
+            else:
+                async with self.global_semaphore:
+                    yield
+    
     async def _make_single_request(self, client: httpx.AsyncClient, page: int, 
                                  start_date: str, end_date: str, currency: str,
-                                 api_label: str = "") -> Tuple[Optional[Dict], bool, int]:
-        """发送单个页面请求"""
+                                 api_label: str = "",
+                                 max_retries: Optional[int] = None,
+                                 sent_event: Optional[asyncio.Event] = None) -> Tuple[Optional[Dict], bool, int]:
+        """
+        发送单个页面请求（max_retries 为空时使用默认重试次数）
+        
+        sent_event 在取得并发名额和限流令牌、真正发出请求时被 set()，供请求对冲计时
+        """
+        request_token = self.token
         headers = {
             "Accept": "application/json",
-            "Authorization": f"Bearer {self.token}"
+            "Authorization": f"Bearer {request_token}"
         }
         
         data = {
@@ -117,31 +326,101 @@ class AsyncInvolveAsiaAPI:
             "filters[preferred_currency]": currency
         }
         
-        max_retries = self.max_retries
+        max_retries = self.max_retries if max_retries is None else max_retries
         retry_count = 0
+        token_refreshed = False
+        throttled = False
+        controller = self.concurrency_controller
+        
+        # 遥测：记录本页最终的状态、延迟、字节数、重试次数和限流等待
+        telemetry = get_ingestion_telemetry()
+        page_start = time.monotonic()
+        probe = {'status': None, 'latency': 0.0, 'bytes': 0, 'rate_limit_wait': 0.0, 'in_flight': 0}
+        
+        def finish(result, success):
+            if telemetry is not None:
+                telemetry.record_page(api_label.strip(' []') or 'default', page, start_date, end_date, success,
+                                      probe['status'], probe['latency'], time.monotonic() - page_start,
+                                      probe['bytes'], retry_count, probe['rate_limit_wait'], probe['in_flight'],
+                                      controller.current_limit if controller else self.max_concurrent_requests)
+            return result, success, page
         
         while retry_count <= max_retries:
             try:
-                if retry_count > 0:
-                    wait_time = min(60, 10 * retry_count)
-                    print(f"   🔄 第{page}页第{retry_count}次重试，等待{wait_time}秒...")
+                # 429后的重试由控制器/共享限流器退避，不消耗重试预算
+                self.resilience.begin(retry_count if not throttled else 0)
+            except ResilienceError as e:
+                print_step("快速失败", f"{api_label}第{page}页: {str(e)}")
+                probe['status'] = type(e).__name__
+                return finish(None, False)
+            
+            try:
+                # 自适应模式下429的退避由控制器统一处理，不再叠加等待
+                if retry_count > 0 and not throttled:
+                    wait_time = self.resilience.backoff(retry_count)  # 指数退避 + 抖动
+                    print(f"   🔄 第{page}页第{retry_count}次重试，等待{wait_time:.1f}秒...")
                     await asyncio.sleep(wait_time)
+                throttled = False
                 
-                # 使用信号量控制并发数量
-                async with self.semaphore:
-                    response = await client.post(
-                        self.conversions_url,
-                        headers=headers,
-                        data=data
-                    )
+                # 使用信号量控制并发数量（本API + 全局）
+                async with self._acquire_request_slot():
+                    if self.rate_limiter:
+                        probe['rate_limit_wait'] += await self.rate_limiter.acquire_async()
+                    if sent_event is not None:
+                        sent_event.set()
+                    if telemetry is not None:
+                        probe['in_flight'] = telemetry.request_started()
+                    request_start = time.monotonic()
+                    try:
+                        response = await client.post(
+                            self.conversions_url,
+                            headers=headers,
+                            data=data
+                        )
+                    finally:
+                        latency = probe['latency'] = time.monotonic() - request_start
+                        if telemetry is not None:
+                            telemetry.request_finished()
+                    probe['status'] = response.status_code
+                    probe['bytes'] = len(response.content)
+                    
+                    # 处理401错误(Token失效)：刷新一次Token后立即重试
+                    if response.status_code == 401 and not token_refreshed:
+                        token_refreshed = True
+                        print(f"   🔑 第{page}页Token已失效，重新认证后重试...")
+                        if await self._refresh_token(request_token):
+                            request_token = self.token
+                            headers["Authorization"] = f"Bearer {request_token}"
+                        continue
                     
                     # 处理429错误(频率限制)
                     if response.status_code == 429:
                         retry_count += 1
-                        print(f"   ⚠️  第{page}页遇到频率限制，等待{config.RATE_LIMIT_DELAY}秒后重试...")
-                        await asyncio.sleep(config.RATE_LIMIT_DELAY)
+                        retry_after = parse_retry_after(response.headers.get('Retry-After'))
+                        if self.rate_limiter:
+                            # 通知共享同一Key的其他进程一起退避
+                            await self.rate_limiter.penalize_async(retry_after)
+                        if controller:
+                            # 乘性降低并发上限，仅让新请求短暂退避，不再整体休眠
+                            backoff = controller.on_throttle(retry_after)
+                            throttled = True
+                            print(f"   ⚠️  第{page}页遇到频率限制，并发上限降至{controller.current_limit}，"
+                                  f"退避{backoff:.1f}秒后重试...")
+                        elif self.rate_limiter:
+                            # 退避由共享令牌桶统一处理，下次领取令牌时等待
+                            throttled = True
+                            print(f"   ⚠️  第{page}页遇到频率限制，共享限流器退避后重试...")
+                        else:
+                            print(f"   ⚠️  第{page}页遇到频率限制，等待{config.RATE_LIMIT_DELAY}秒后重试...")
+                            await asyncio.sleep(config.RATE_LIMIT_DELAY)
+                            probe['rate_limit_wait'] += config.RATE_LIMIT_DELAY
                         continue
                     
+                    if is_transient_status(response.status_code):
+                        self.resilience.record_failure()
+                        if controller:
+                            controller.on_server_error()
+                    
                     response.raise_for_status()
                     result = response.json()
                     
@@ -151,15 +430,26 @@ class AsyncInvolveAsiaAPI:
                         continue
                     
                     # 请求成功
-                    return result, True, page
+                    self.resilience.record_success()
+                    if controller:
+                        controller.on_success(latency)
+                    if self.hedge_policy:
+                        self.hedge_policy.observe(latency)
+                    return finish(result, True)
                     
             except httpx.TimeoutException as e:
+                probe['status'] = type(e).__name__
+                self.resilience.record_failure()
+                if controller:
+                    controller.on_timeout()
                 retry_count += 1
                 print_step("请求超时", f"第{page}页请求超时（第{retry_count}次重试）: {str(e)}")
                 if retry_count <= max_retries:
                     self.resource_monitor.print_resource_status(f"第{page}页超时重试{retry_count}")
                 
             except httpx.RequestError as e:
+                probe['status'] = type(e).__name__
+                self.resilience.record_failure()
                 retry_count += 1
                 print_step("网络错误", f"第{page}页请求错误（第{retry_count}次重试）: {str(e)}")
                 if retry_count <= max_retries:
@@ -182,154 +472,553 @@ class AsyncInvolveAsiaAPI:
                 await asyncio.sleep(self.request_delay)
         
         # 重试次数用完，返回失败
-        return None, False, page
+        return finish(None, False)
+    
+    async def _fetch_page(self, client: httpx.AsyncClient, page: int, start_date: str, end_date: str,
+                          currency: str, api_label: str = "") -> Tuple[Optional[Dict], bool, int]:
+        """获取单个页面；启用请求对冲时，慢请求会补发一个只尝试一次的对冲请求"""
+        if self.hedge_policy is None:
+            return await self._make_single_request(client, page, start_date, end_date, currency, api_label)
+        return await hedged_call(
+            self.hedge_policy,
+            lambda sent: self._make_single_request(client, page, start_date, end_date, currency, api_label,
+                                                   sent_event=sent),
+            lambda sent: self._make_single_request(client, page, start_date, end_date, currency, api_label,
+                                                   max_retries=0, sent_event=sent),
+        )
+    
+    def _print_run_summaries(self, api_label: str = ""):
+        """打印本轮获取的并发控制、共享限流和请求对冲摘要"""
+        if self.concurrency_controller:
+            # 保存学习到的并发上限，下次运行直接从该值起步
+            self.concurrency_controller.save()
+            print_step("自适应并发", f"{api_label}{self.concurrency_controller.summary()}")
+        if self.rate_limiter and self.rate_limiter.stats['waited']:
+            print_step("共享限流", f"{api_label}{self.rate_limiter.summary()}")
+        if self.hedge_policy and self.hedge_policy.stats['hedged']:
+            print_step("请求对冲", f"{api_label}{self.hedge_policy.summary()}")
+    
+    def _record_failed_page(self, page: Optional[int], start_date: str, end_date: str, sharded: bool = False):
+        """记录失败页面（分片模式下页码只在分片内唯一，skipped_pages 记为 "分片#页码"）"""
+        failed_request = {'start_date': start_date, 'end_date': end_date, 'page': page}
+        self.failed_requests.append(failed_request)
+        self.skipped_pages.append(describe_request(failed_request) if sharded else page)
     
     async def _fetch_pages_concurrently(self, pages: List[int], start_date: str, 
                                       end_date: str, currency: str, api_label: str = "") -> List[Tuple]:
         """并发获取多个页面"""
         print_step("并发请求", f"{api_label}开始并发获取 {len(pages)} 页数据...")
         
-        # 创建信号量控制并发数量
-        self.semaphore = asyncio.Semaphore(self.max_concurrent_requests)
+        # 创建信号量控制并发数量（已存在时沿用，保证并行分片共享同一并发预算）
+        if self.semaphore is None:
+            self.semaphore = asyncio.Semaphore(self.max_concurrent_requests)
+        
+        client = await self._get_client()
+        
+        # 创建所有页面的请求任务
+        tasks = [
+            self._fetch_page(client, page, start_date, end_date, currency, api_label)
+            for page in pages
+        ]
+        
+        # 并发执行所有请求
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        
+        # 处理结果
+        successful_results = []
+        failed_pages = []
+        
+        for i, result in enumerate(results):
+            if isinstance(result, Exception):
+                failed_pages.append(pages[i])
+                print_step("页面异常", f"第{pages[i]}页发生异常: {str(result)}")
+            elif result[1]:  # 成功
+                successful_results.append(result)
+            else:  # 失败
+                failed_pages.append(result[2])
+        
+        if failed_pages:
+            for page in failed_pages:
+                self._record_failed_page(page, start_date, end_date)
+            print_step("页面跳过", f"跳过失败页面: {failed_pages}")
+        
+        print_step("并发完成", f"{api_label}并发请求完成，成功: {len(successful_results)}, 失败: {len(failed_pages)}")
+        return successful_results
+    
+    @staticmethod
+    def _parse_page_metadata(result: Dict) -> Tuple[int, int, int]:
+        """
+        从第一页响应中解析分页元数据
+        
+        Returns:
+            tuple: (每页条数, 总记录数, 总页数)；旧格式响应无法确定总数时总页数默认为10
+        """
+        data_obj = result["data"]
+        if not isinstance(data_obj, dict):
+            return config.DEFAULT_PAGE_LIMIT, 0, 10
+        limit = data_obj.get("limit", config.DEFAULT_PAGE_LIMIT)
+        total_count = data_obj.get("count", 0)
+        total_pages = (total_count + limit - 1) // limit if total_count > 0 else 0
+        return limit, total_count, total_pages
+    
+    @staticmethod
+    def _extract_page_records(result: Dict) -> List[Dict]:
+        """从单页响应中提取转换记录（兼容新旧两种响应格式）"""
+        data_obj = result["data"]
+        if isinstance(data_obj, dict):
+            return data_obj.get("data", [])
+        # 旧格式兼容
+        return data_obj if isinstance(data_obj, list) else []
+    
+    def _get_page_window_size(self) -> int:
+        """同时在途（含已完成待按序产出）的页面数上限，用于限制内存"""
+        if self.concurrency_controller:
+            # 自适应模式下由控制器限制在途请求数，窗口只用于限制待处理任务数
+            return max(getattr(config, 'ASYNC_BATCH_SIZE', 15), self.concurrency_controller.max_limit * 2)
+        return min(self.max_concurrent_requests * 2, 10)  # 最多10页
+    
+    async def _iter_page_window(self, pages: List[int], start_date: str, end_date: str,
+                                currency: str, api_label: str = "",
+                                ordered: bool = True,
+                                sharded: bool = False) -> AsyncIterator[Tuple[int, Dict]]:
+        """
+        滑动窗口并发获取页面：任一页面完成即补充下一页，不再等待整批完成
+        
+        Yields:
+            tuple: (页码, 响应结果)，失败的页面记入 skipped_pages 后跳过
+        """
+        if self.semaphore is None:
+            self.semaphore = asyncio.Semaphore(self.max_concurrent_requests)
+        client = await self._get_client()
+        window = self._get_page_window_size()
+        
+        page_queue = list(pages)
+        next_index = 0
+        pending: Dict[asyncio.Task, int] = {}
+        completed: Dict[int, Optional[Dict]] = {}  # 按序模式下已完成但尚未产出的页面
+        emit_index = 0  # 按序模式下下一个应产出页面在page_queue中的位置
+        
+        try:
+            while next_index < len(page_queue) or pending or completed:
+                # 补充任务直到窗口填满（按序模式下缓冲的页面也占用窗口）
+                while next_index < len(page_queue) and len(pending) + len(completed) < window:
+                    page = page_queue[next_index]
+                    next_index += 1
+                    task = asyncio.ensure_future(
+                        self._fetch_page(client, page, start_date, end_date, currency, api_label))
+                    pending[task] = page
+                
+                if pending:
+                    done, _ = await asyncio.wait(pending.keys(), return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        page = pending.pop(task)
+                        try:
+                            result, success, _ = task.result()
+                        except Exception as e:
+                            print_step("页面异常", f"第{page}页发生异常: {str(e)}")
+                            result, success = None, False
+                        if not success or not result:
+                            self._record_failed_page(page, start_date, end_date, sharded)
+                            print_step("页面跳过", f"{api_label}跳过失败页面: {page}")
+                            result = None
+                        if ordered:
+                            completed[page] = result
+                        elif result is not None:
+                            yield page, result
+                
+                # 按序产出连续完成的页面
+                while ordered and emit_index < len(page_queue) and page_queue[emit_index] in completed:
+                    page = page_queue[emit_index]
+                    emit_index += 1
+                    result = completed.pop(page)
+                    if result is not None:
+                        yield page, result
+        finally:
+            # 消费方提前停止时取消仍在运行的页面请求
+            for task in pending:
+                task.cancel()
+    
+    async def iter_conversion_pages(self, start_date: str, end_date: str,
+                                    currency: Optional[str] = None, api_name: Optional[str] = None,
+                                    ordered: bool = True) -> AsyncIterator[Dict[str, Any]]:
+        """
+        逐页异步产出conversion数据，不在内存中累积整个日期范围
+        
+        Args:
+            start_date: 开始日期 (YYYY-MM-DD)
+            end_date: 结束日期 (YYYY-MM-DD)
+            currency: 货币类型，默认使用配置文件中的值
+            api_name: API名称，用于日志标识
+            ordered: True按页码顺序产出，False按完成顺序产出
+        
+        Yields:
+            dict: {'page': 页码, 'data': 本页记录列表, 'total_count': 总记录数, 'total_pages': 总页数}
+        
+        运行统计（总记录数、总页数、已获取页数）记录在 self.page_stats 中
+        """
+        self.page_stats = {'total_count': 0, 'total_pages': 0, 'pages_fetched': 0}
+        if not self.token:
+            print_step("数据获取失败", "没有有效的认证token")
+            return
+        if self.hedge_policy:
+            self.hedge_policy.start_run()
+        
+        currency = currency or config.PREFERRED_CURRENCY
+        api_label = f"[{api_name}] " if api_name else ""
+        delegated = False  # 已转交分片模式时由分片迭代器负责收尾
         
-        async with httpx.AsyncClient(**self.client_config) as client:
-            # 创建所有页面的请求任务
-            tasks = [
-                self._make_single_request(client, page, start_date, end_date, currency, api_label)
-                for page in pages
-            ]
+        try:
+            # 步骤1: 获取第一页以确定总页数
+            print_step("获取元数据", f"{api_label}获取第一页以确定总页数...")
+            
+            first_page_results = await self._fetch_pages_concurrently(
+                [1], start_date, end_date, currency, api_label
+            )
             
-            # 并发执行所有请求
-            results = await asyncio.gather(*tasks, return_exceptions=True)
+            if not first_page_results:
+                # 总页数未知：把第一页的失败记录换成整个日期范围，恢复时从第一页展开全部页面
+                first_page = {'start_date': start_date, 'end_date': end_date, 'page': 1}
+                self.failed_requests[:] = [request for request in self.failed_requests if request != first_page]
+                self.skipped_pages[:] = [page for page in self.skipped_pages if page != 1]
+                self._record_failed_page(None, start_date, end_date, sharded=True)
+                print_step("数据获取失败", f"{api_label}无法获取第一页数据，整个日期范围进入恢复队列")
+                return
             
-            # 处理结果
-            successful_results = []
-            failed_pages = []
+            first_result, _, _ = first_page_results[0]
+            limit, total_count, total_pages = self._parse_page_metadata(first_result)
+            max_pages = getattr(config, 'MAX_PAGES_PER_QUERY', 1000)
+            
+            if isinstance(first_result["data"], dict):
+                print_step("元数据获取", f"{api_label}总记录数: {total_count}, 总页数: {total_pages}")
+                
+                # 检查记录数限制
+                if config.MAX_RECORDS_LIMIT is not None and total_count > config.MAX_RECORDS_LIMIT:
+                    actual_pages = (config.MAX_RECORDS_LIMIT + limit - 1) // limit
+                    total_pages = min(total_pages, actual_pages)
+                    print_step("记录限制", f"{api_label}应用记录数限制，调整页数到: {total_pages}")
+            
+            # 超过单次查询页数上限时改用日期分片，避免超出部分被截断
+            if total_pages > max_pages:
+                if getattr(config, 'SHARDED_FETCH_ENABLED', True):
+                    print_step("分片获取", f"{api_label}总页数 {total_pages} 超过单次查询上限 {max_pages}，切换为日期分片模式")
+                    delegated = True
+                    async for page in self.iter_sharded_conversion_pages(start_date, end_date, currency, api_name,
+                                                                         first_result=first_result):
+                        yield page
+                    return
+                print_step("页数上限", f"{api_label}总页数 {total_pages} 超过单次查询上限 {max_pages}，"
+                                      f"未启用分片模式，继续逐页获取全部页面（深分页可能变慢）")
+            
+            self.page_stats.update({'total_count': total_count, 'total_pages': total_pages, 'pages_fetched': 1})
+            yield {'page': 1, 'data': self._extract_page_records(first_result),
+                   'total_count': total_count, 'total_pages': total_pages}
+            
+            # 步骤2: 如果有更多页面，滑动窗口并发获取
+            if total_pages <= 1:
+                return
+            
+            remaining_pages = list(range(2, total_pages + 1))
+            
+            # 检查记录数限制
+            if config.MAX_RECORDS_LIMIT is not None:
+                max_pages = (config.MAX_RECORDS_LIMIT + limit - 1) // limit
+                remaining_pages = [p for p in remaining_pages if p <= max_pages]
             
-            for i, result in enumerate(results):
-                if isinstance(result, Exception):
-                    failed_pages.append(pages[i])
-                    print_step("页面异常", f"第{pages[i]}页发生异常: {str(result)}")
-                elif result[1]:  # 成功
-                    successful_results.append(result)
-                else:  # 失败
-                    failed_pages.append(result[2])
+            if not remaining_pages:
+                return
             
-            if failed_pages:
-                self.skipped_pages.extend(failed_pages)
-                print_step("页面跳过", f"跳过失败页面: {failed_pages}")
+            print_step("并发策略", f"{api_label}将并发获取剩余 {len(remaining_pages)} 页数据 "
+                                 f"(窗口: {self._get_page_window_size()} 页, {'按序' if ordered else '按完成顺序'}产出)")
             
-            print_step("并发完成", f"{api_label}并发请求完成，成功: {len(successful_results)}, 失败: {len(failed_pages)}")
-            return successful_results
+            async for page, result in self._iter_page_window(
+                    remaining_pages, start_date, end_date, currency, api_label, ordered):
+                page_data = self._extract_page_records(result)
+                self.page_stats['pages_fetched'] += 1
+                print(f"   {api_label}📊 第 {page} 页: 获取到 {len(page_data)} 条记录")
+                yield {'page': page, 'data': page_data,
+                       'total_count': total_count, 'total_pages': total_pages}
+        finally:
+            if not delegated:
+                self._print_run_summaries(api_label)
     
-    async def get_conversions_async(self, start_date: str, end_date: str, 
-                                  currency: Optional[str] = None, api_name: Optional[str] = None) -> Optional[Dict]:
-        """异步获取指定日期范围的所有conversion数据"""
+    async def _produce_shard(self, shard_start: str, shard_end: str, currency: str, api_label: str,
+                             queue: asyncio.Queue, split: bool = True, first_result: Optional[Dict] = None):
+        """
+        获取单个日期分片的所有页面并放入队列
+        
+        按天分片的第一页总数超过 SHARD_TARGET_PAGES 时，按页数拆分为若干小时分片并行获取；
+        已获取过该分片第一页时通过 first_result 传入，不再重复请求
+        """
+        label = shard_start if shard_start == shard_end else f"{shard_start}~{shard_end}"
+        client = await self._get_client()
+        success = first_result is not None
+        if not success:
+            first_result, success, _ = await self._fetch_page(
+                client, 1, shard_start, shard_end, currency, api_label)
+        if not success or not first_result:
+            self._record_failed_page(None, shard_start, shard_end, sharded=True)
+            print_step("分片跳过", f"{api_label}分片 {label} 第一页获取失败")
+            return
+        limit, total_count, total_pages = self._parse_page_metadata(first_result)
+        
+        target_pages = getattr(config, 'SHARD_TARGET_PAGES', 100)
+        if split and total_pages > target_pages:
+            hour_shards = _split_day_into_hours(shard_start, min(24, -(-total_pages // target_pages)))
+            # 先探测一个小时分片：若其总数不小于全天，说明接口忽略了时间部分，继续按天获取
+            probe, probe_ok, _ = await self._make_single_request(
+                client, 1, hour_shards[0][0], hour_shards[0][1], currency, api_label)
+            if probe_ok and probe and self._parse_page_metadata(probe)[1] < total_count:
+                print_step("分片拆分", f"{api_label}{label} 共 {total_pages} 页，拆分为 {len(hour_shards)} 个小时分片")
+                # 探测到的第一个小时分片的第一页直接复用
+                await asyncio.gather(*(self._produce_shard(hour_start, hour_end, currency, api_label, queue, split=False,
+                                                           first_result=probe if index == 0 else None)
+                                       for index, (hour_start, hour_end) in enumerate(hour_shards)))
+                return
+        
+        max_pages = getattr(config, 'MAX_PAGES_PER_QUERY', 1000)
+        if total_pages > max_pages:
+            print_step("页数上限", f"{api_label}分片 {label} 共 {total_pages} 页，超过单次查询上限 {max_pages}，继续获取全部页面")
+        
+        self.page_stats['total_count'] += total_count
+        self.page_stats['total_pages'] += total_pages
+        self.page_stats['shards'] += 1
+        await queue.put((label, 1, self._extract_page_records(first_result)))
+        
+        remaining_pages = list(range(2, total_pages + 1))
+        async for page, result in self._iter_page_window(remaining_pages, shard_start, shard_end, currency,
+                                                         api_label, ordered=False, sharded=True):
+            await queue.put((label, page, self._extract_page_records(result)))
+    
+    async def iter_sharded_conversion_pages(self, start_date: str, end_date: str,
+                                            currency: Optional[str] = None,
+                                            api_name: Optional[str] = None,
+                                            first_result: Optional[Dict] = None) -> AsyncIterator[Dict[str, Any]]:
+        """
+        按日期分片并行获取conversion数据，按完成顺序逐页产出
+        
+        日期范围按天拆分（数据量大的天再按小时拆分），各分片并行获取，
+        页面请求共享本API的并发预算（自适应控制器/信号量及多API全局信号量），
+        产出前按 conversion_id 去重，避免分片边界重叠造成重复记录
+        
+        first_result 为整个日期范围已获取的第一页（由 iter_conversion_pages 切换到分片模式时传入）：
+        单天范围时直接作为该天分片的第一页；多天范围时其记录先行产出，之后分片中的重复记录被去重
+        
+        Yields:
+            dict: {'page': 分片内页码, 'shard': 分片标识, 'data': 去重后的记录列表,
+                   'total_count': 已知总记录数, 'total_pages': 已知总页数}
+        """
+        self.page_stats = {'total_count': 0, 'total_pages': 0, 'pages_fetched': 0,
+                           'shards': 0, 'duplicates': 0}
         if not self.token:
             print_step("数据获取失败", "没有有效的认证token")
-            return None
+            return
+        if self.hedge_policy:
+            self.hedge_policy.start_run()
         
         currency = currency or config.PREFERRED_CURRENCY
         api_label = f"[{api_name}] " if api_name else ""
-        print_step("异步数据获取", f"{api_label}开始异步获取转换数据 ({start_date} 到 {end_date})")
+        days = _split_date_range(start_date, end_date)
+        print_step("分片获取", f"{api_label}{start_date} ~ {end_date} 拆分为 {len(days)} 个按天分片")
         
-        # 显示初始资源状态
-        self.resource_monitor.print_resource_status(f"{api_label}异步数据获取开始")
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self._get_page_window_size())
+        shard_slots = asyncio.Semaphore(getattr(config, 'SHARD_CONCURRENCY', 4))
         
-        all_conversions = []
-        total_count = 0
-        total_pages = 0
-        pages_fetched = 0
+        single_day = first_result is not None and start_date == end_date == days[0]
         
-        # 步骤1: 获取第一页以确定总页数
-        print_step("获取元数据", f"{api_label}获取第一页以确定总页数...")
+        async def run_day(day: str):
+            async with shard_slots:
+                try:
+                    await self._produce_shard(day, day, currency, api_label, queue,
+                                              first_result=first_result if single_day else None)
+                except Exception as e:
+                    self._record_failed_page(None, day, day, sharded=True)
+                    print_step("分片异常", f"{api_label}分片 {day} 获取失败: {str(e)}")
         
-        first_page_results = await self._fetch_pages_concurrently(
-            [1], start_date, end_date, currency, api_label
-        )
+        async def run_all():
+            await asyncio.gather(*(run_day(day) for day in days))
+            await queue.put(None)
+        
+        producer = asyncio.ensure_future(run_all())
+        seen_ids = set()
+        try:
+            if first_result is not None and not single_day:
+                records = self._extract_page_records(first_result)
+                seen_ids.update(record.get('conversion_id') for record in records
+                                if record.get('conversion_id') is not None)
+                self.page_stats['pages_fetched'] += 1
+                yield {'page': 1, 'shard': f"{start_date}~{end_date}", 'data': records,
+                       'total_count': self.page_stats['total_count'],
+                       'total_pages': self.page_stats['total_pages']}
+            while True:
+                item = await queue.get()
+                if item is None:
+                    break
+                label, page, records = item
+                unique_records = []
+                for record in records:
+                    conversion_id = record.get('conversion_id')
+                    if conversion_id is not None:
+                        if conversion_id in seen_ids:
+                            self.page_stats['duplicates'] += 1
+                            continue
+                        seen_ids.add(conversion_id)
+                    unique_records.append(record)
+                self.page_stats['pages_fetched'] += 1
+                yield {'page': page, 'shard': label, 'data': unique_records,
+                       'total_count': self.page_stats['total_count'],
+                       'total_pages': self.page_stats['total_pages']}
+            
+            print_step("分片完成", f"{api_label}{self.page_stats['shards']} 个分片, "
+                                 f"{self.page_stats['pages_fetched']} 页, "
+                                 f"去重 {self.page_stats['duplicates']} 条")
+        finally:
+            # 消费方提前停止时取消所有分片
+            producer.cancel()
+            try:
+                await producer
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._print_run_summaries(api_label)
+    
+    async def recover_pages_async(self, failed_requests: List[Dict[str, Any]], currency: Optional[str] = None,
+                                  api_label: str = "") -> Tuple[List[Dict], List[Dict[str, Any]]]:
+        """
+        以较低并发、带抖动的指数退避重新获取失败页面
+        
+        page 为 None 的请求（整个分片失败）先获取第一页，再把其余页面加入恢复队列
+        
+        Returns:
+            tuple: (恢复出的记录列表, 仍然失败的请求列表)
+        """
+        currency = currency or config.PREFERRED_CURRENCY
+        max_attempts = getattr(config, 'RECOVERY_MAX_ATTEMPTS', 3)
+        client = await self._get_client()
+        work: asyncio.Queue = asyncio.Queue()
+        for failed_request in failed_requests:
+            work.put_nowait(failed_request)
+        records: List[Dict] = []
+        remaining: List[Dict[str, Any]] = []
         
-        if not first_page_results:
-            print_step("数据获取失败", f"{api_label}无法获取第一页数据")
+        async def recover_one(failed_request: Dict[str, Any]):
+            page = failed_request.get('page') or 1
+            for attempt in range(1, max_attempts + 1):
+                if self.resilience.is_open():
+                    # 服务商仍在故障中，直接保存到持久化队列，稍后 --resume 补拉
+                    break
+                await asyncio.sleep(recovery_backoff(attempt))
+                result, success, _ = await self._make_single_request(
+                    client, page, failed_request['start_date'], failed_request['end_date'],
+                    currency, api_label, max_retries=0)
+                if success and result:
+                    records.extend(self._extract_page_records(result))
+                    if failed_request.get('page') is None:
+                        _, _, total_pages = self._parse_page_metadata(result)
+                        for next_page in range(2, total_pages + 1):
+                            work.put_nowait(dict(failed_request, page=next_page))
+                    print(f"   {api_label}🩹 恢复成功: {describe_request(failed_request)}")
+                    return
+            remaining.append(failed_request)
+        
+        async def worker():
+            while True:
+                failed_request = await work.get()
+                try:
+                    await recover_one(failed_request)
+                finally:
+                    work.task_done()
+        
+        workers = [asyncio.ensure_future(worker())
+                   for _ in range(max(1, getattr(config, 'RECOVERY_CONCURRENCY', 2)))]
+        try:
+            await work.join()
+        finally:
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+        return records, remaining
+    
+    def recover_pages(self, failed_requests: List[Dict[str, Any]], currency: Optional[str] = None,
+                      api_label: str = "") -> Tuple[List[Dict], List[Dict[str, Any]]]:
+        """recover_pages_async 的同步包装器（供 --resume 使用）"""
+        return asyncio.run(self._run_and_close(self.recover_pages_async(failed_requests, currency, api_label)))
+    
+    async def _drain_recovery_queue(self, all_conversions: List[Dict], start_date: str, end_date: str,
+                                    currency: Optional[str], api_name: Optional[str]) -> Optional[str]:
+        """
+        获取结束时重新获取本次失败的页面，合并到 all_conversions；
+        仍然失败的页面持久化到恢复队列，返回批次ID（无需持久化时返回None）
+        """
+        if not self.failed_requests or not getattr(config, 'RECOVERY_ENABLED', True):
             return None
+        api_label = f"[{api_name}] " if api_name else ""
+        currency = currency or config.PREFERRED_CURRENCY
+        print_step("恢复队列", f"{api_label}重新获取 {len(self.failed_requests)} 个失败页面 "
+                              f"(并发 {getattr(config, 'RECOVERY_CONCURRENCY', 2)})")
         
-        first_result, _, _ = first_page_results[0]
-        data_obj = first_result["data"]
+        records, remaining = await self.recover_pages_async(self.failed_requests, currency, api_label)
+        added = merge_unique_records(all_conversions, records)
         
-        if isinstance(data_obj, dict):
-            first_page_data = data_obj.get("data", [])
-            limit = data_obj.get("limit", config.DEFAULT_PAGE_LIMIT)
-            total_count = data_obj.get("count", 0)
-            
-            # 计算总页数
-            if total_count > 0:
-                total_pages = (total_count + limit - 1) // limit
-            
-            all_conversions.extend(first_page_data)
-            pages_fetched = 1
-            
-            print_step("元数据获取", f"{api_label}总记录数: {total_count}, 总页数: {total_pages}")
-            
-            # 检查记录数限制
-            if config.MAX_RECORDS_LIMIT is not None and total_count > config.MAX_RECORDS_LIMIT:
-                actual_pages = (config.MAX_RECORDS_LIMIT + limit - 1) // limit
-                total_pages = min(total_pages, actual_pages)
-                print_step("记录限制", f"{api_label}应用记录数限制，调整页数到: {total_pages}")
+        remaining_labels = {describe_request(request) for request in remaining}
+        recovered = [request for request in self.failed_requests if describe_request(request) not in remaining_labels]
+        recovered_keys = {describe_request(request) for request in recovered} | {request['page'] for request in recovered}
+        self.skipped_pages = [page for page in self.skipped_pages if page not in recovered_keys]
+        self.failed_requests = remaining
+        self.page_stats['pages_fetched'] = self.page_stats.get('pages_fetched', 0) + len(recovered)
+        print_step("恢复完成", f"{api_label}恢复 {len(recovered)} 页 (新增 {added} 条记录)，仍失败 {len(remaining)} 页")
+        
+        if not remaining:
+            return None
+        return RecoveryQueue(self.api_secret, self.api_key).add_run(
+            api_name, start_date, end_date, currency, remaining)
+    
+    async def get_conversions_async(self, start_date: str, end_date: str, 
+                                  currency: Optional[str] = None, api_name: Optional[str] = None,
+                                  sharded: Optional[bool] = None) -> Optional[Dict]:
+        """
+        异步获取指定日期范围的所有conversion数据（基于逐页迭代器汇总到内存）
+        
+        Args:
+            sharded: 是否强制使用日期分片模式；None时按第一页的总页数决定
+                     （超过 MAX_PAGES_PER_QUERY 且启用 SHARDED_FETCH_ENABLED 时切换为分片模式）
+        """
+        if not self.token:
+            print_step("数据获取失败", "没有有效的认证token")
+            return None
+        
+        api_label = f"[{api_name}] " if api_name else ""
+        print_step("异步数据获取", f"{api_label}开始异步获取转换数据 ({start_date} 到 {end_date})")
+        
+        # 显示初始资源状态
+        self.resource_monitor.print_resource_status(f"{api_label}异步数据获取开始")
+        
+        self.failed_requests = []
+        all_conversions = []
+        if sharded:
+            pages = self.iter_sharded_conversion_pages(start_date, end_date, currency, api_name)
         else:
-            # 旧格式兼容处理
-            first_page_data = first_result["data"] if isinstance(first_result["data"], list) else []
-            all_conversions.extend(first_page_data)
-            pages_fetched = 1
-            total_pages = 10  # 默认假设有更多页面
-        
-        # 步骤2: 如果有更多页面，并发获取
-        if total_pages > 1:
-            remaining_pages = list(range(2, min(total_pages + 1, 1001)))  # 最多获取1000页避免无限请求
-            
-            # 检查记录数限制
-            if config.MAX_RECORDS_LIMIT is not None:
-                max_pages = (config.MAX_RECORDS_LIMIT + limit - 1) // limit
-                remaining_pages = [p for p in remaining_pages if p <= max_pages]
-            
-            if remaining_pages:
-                print_step("并发策略", f"{api_label}将并发获取剩余 {len(remaining_pages)} 页数据")
-                
-                # 分批并发处理，避免一次性发送太多请求
-                batch_size = min(self.max_concurrent_requests * 2, 10)  # 每批最多10页
+            pages = self.iter_conversion_pages(start_date, end_date, currency, api_name)
+        try:
+            async for page in pages:
+                all_conversions.extend(page['data'])
                 
-                for i in range(0, len(remaining_pages), batch_size):
-                    batch_pages = remaining_pages[i:i + batch_size]
-                    print_step("批次处理", f"{api_label}处理第 {i//batch_size + 1} 批，页面: {batch_pages}")
-                    
-                    batch_results = await self._fetch_pages_concurrently(
-                        batch_pages, start_date, end_date, currency, api_label
-                    )
-                    
-                    # 处理批次结果
-                    for result, success, page in batch_results:
-                        if success and result:
-                            data_obj = result["data"]
-                            
-                            if isinstance(data_obj, dict):
-                                page_data = data_obj.get("data", [])
-                                all_conversions.extend(page_data)
-                                pages_fetched += 1
-                                
-                                print(f"   {api_label}📊 第 {page} 页: 获取到 {len(page_data)} 条记录")
-                            else:
-                                # 旧格式兼容
-                                page_data = result["data"] if isinstance(result["data"], list) else []
-                                all_conversions.extend(page_data)
-                                pages_fetched += 1
-                    
-                    # 检查记录数限制
-                    if config.MAX_RECORDS_LIMIT is not None and len(all_conversions) >= config.MAX_RECORDS_LIMIT:
-                        all_conversions = all_conversions[:config.MAX_RECORDS_LIMIT]
-                        print_step("记录限制", f"{api_label}已达到记录数限制 ({config.MAX_RECORDS_LIMIT} 条)，停止获取")
-                        break
-                    
-                    # 批次间添加短暂延迟
-                    if i + batch_size < len(remaining_pages):
-                        await asyncio.sleep(self.request_delay)
+                # 检查记录数限制
+                if config.MAX_RECORDS_LIMIT is not None and len(all_conversions) >= config.MAX_RECORDS_LIMIT:
+                    all_conversions = all_conversions[:config.MAX_RECORDS_LIMIT]
+                    print_step("记录限制", f"{api_label}已达到记录数限制 ({config.MAX_RECORDS_LIMIT} 条)，停止获取")
+                    break
+        finally:
+            await pages.aclose()
+        
+        # 失败页面进入恢复队列，低并发补拉（已达到记录数限制时无需补拉）
+        recovery_run_id = None
+        if config.MAX_RECORDS_LIMIT is None or len(all_conversions) < config.MAX_RECORDS_LIMIT:
+            recovery_run_id = await self._drain_recovery_queue(
+                all_conversions, start_date, end_date, currency, api_name)
+        
+        stats = self.page_stats
+        total_count = stats['total_count']
+        total_pages = stats['total_pages']
+        pages_fetched = stats['pages_fetched']
         
         # 显示最终资源状态
         self.resource_monitor.print_resource_status(f"{api_label}异步数据获取完成")
@@ -349,7 +1038,9 @@ class AsyncInvolveAsiaAPI:
                     "current_page_count": len(all_conversions),
                     "data": all_conversions,
                     "async_mode": True,
-                    "concurrent_requests": self.max_concurrent_requests
+                    "recovery_run_id": recovery_run_id,
+                    "concurrent_requests": (self.concurrency_controller.current_limit
+                                            if self.concurrency_controller else self.max_concurrent_requests)
                 }
             }
             
@@ -363,10 +1054,42 @@ class AsyncInvolveAsiaAPI:
             print_step("数据获取失败", f"{api_label}没有获取到任何数据")
             return None
     
-    def get_conversions(self, start_date: str, end_date: str, 
+    async def stream_conversions_async(self, start_date: str, end_date: str, sinks: List[Any],
+                                       currency: Optional[str] = None,
+                                       api_name: Optional[str] = None) -> Dict[str, Any]:
+        """
+        逐页获取conversion数据并写入 sinks（modules.page_sinks.PageSink），不在内存中累积整个日期范围
+
+        失败页面在结束时进入恢复队列，恢复出的记录作为最后一页写入；结束后关闭所有Sink
+
+        Returns:
+            dict: {'pages': 页数, 'records': 记录数, 'skipped_pages': 仍缺失的页面, 'recovery_run_id': 恢复批次ID}
+        """
+        from modules.page_sinks import stream_conversion_pages
+
+        self.failed_requests = []
+        currency = currency or config.PREFERRED_CURRENCY
+        try:
+            stats = await stream_conversion_pages(
+                self.iter_conversion_pages(start_date, end_date, currency, api_name, ordered=False), *sinks)
+            recovered = []
+            stats['recovery_run_id'] = await self._drain_recovery_queue(
+                recovered, start_date, end_date, currency, api_name)
+            if recovered:
+                page = {'page': None, 'data': recovered}
+                for sink in sinks:
+                    await sink.write_page(page)
+                stats['records'] += len(recovered)
+        finally:
+            for sink in sinks:
+                await sink.close()
+        stats['skipped_pages'] = self.skipped_pages
+        return stats
+
+    def get_conversions(self, start_date: str, end_date: str,
                        currency: Optional[str] = None, api_name: Optional[str] = None) -> Optional[Dict]:
         """同步包装器，运行异步获取函数"""
-        return asyncio.run(self.get_conversions_async(start_date, end_date, currency, api_name))
+        return asyncio.run(self._run_and_close(self.get_conversions_async(start_date, end_date, currency, api_name)))
     
     async def get_conversions_default_range_async(self, currency: Optional[str] = None) -> Optional[Dict]:
         """使用默认日期范围异步获取数据"""
@@ -375,7 +1098,7 @@ class AsyncInvolveAsiaAPI:
     
     def get_conversions_default_range(self, currency: Optional[str] = None) -> Optional[Dict]:
         """使用默认日期范围获取数据的同步包装器"""
-        return asyncio.run(self.get_conversions_default_range_async(currency))
+        return asyncio.run(self._run_and_close(self.get_conversions_default_range_async(currency)))
     
     def save_to_json(self, data: Dict, filename: Optional[str] = None) -> Optional[str]:
         """保存数据到JSON文件"""
@@ -396,6 +1119,11 @@ class AsyncInvolveAsiaAPI:
                 json.dump(data, f, indent=2, ensure_ascii=False)
             
             print_step("JSON保存成功", f"数据已保存到: {filepath}")
+            
+            # 有未恢复页面时记录数据集路径，--resume 补拉后合并到该文件
+            recovery_run_id = data.get('data', {}).get('recovery_run_id') if isinstance(data.get('data'), dict) else None
+            if recovery_run_id:
+                RecoveryQueue(self.api_secret, self.api_key).attach_dataset(recovery_run_id, filepath)
             return filepath
             
         except Exception as e:
@@ -420,7 +1148,11 @@ class AsyncInvolveAsiaAPI:
         print(f"⏱️  总运行时间: {runtime['runtime_formatted']}")
         
         # 异步配置信息
-        print(f"🚀 异步配置: 最大并发请求数 {self.max_concurrent_requests}")
+        print(f"🚀 异步配置: 最大并发请求数 {self.max_concurrent_requests}, HTTP/2: {'启用' if self.http2 else '未启用'}")
+        if self.concurrency_controller:
+            print(f"📈 自适应并发: {self.concurrency_controller.summary()}")
+        if self.hedge_policy:
+            print(f"🪃 请求对冲: {self.hedge_policy.summary()}")
         
         # 跳过页面信息
         if self.skipped_pages:
@@ -430,6 +1162,7 @@ class AsyncInvolveAsiaAPI:
         
         # 最终资源状态
         self.resource_monitor.print_resource_status("最终状态", show_details=True)
+        self.resource_monitor.print_resource_timeline("API数据获取")
         
         print(f"{'='*60}\n")
 
@@ -453,14 +1186,71 @@ def get_conversions_async(start_date: str, end_date: str,
     """
     api = AsyncInvolveAsiaAPI(api_secret, api_key)
     
-    # 异步认证和获取数据
+    # 异步认证和获取数据（认证与分页请求共用同一个长连接客户端）
     async def fetch_data():
-        if await api.authenticate():
-            return await api.get_conversions_async(start_date, end_date, currency, api_name)
-        return None
+        async with api:
+            if await api.authenticate():
+                return await api.get_conversions_async(start_date, end_date, currency, api_name)
+            return None
     
     return asyncio.run(fetch_data())
 
+async def iter_multi_api_conversions(api_list: List[Dict[str, str]], start_date: str, end_date: str,
+                                     currency: Optional[str] = None,
+                                     global_concurrency: Optional[int] = None,
+                                     per_api_concurrency: Optional[int] = None
+                                     ) -> AsyncIterator[Tuple[Dict[str, str], Optional[Dict], Optional[str]]]:
+    """
+    在同一个事件循环内并发获取多个API的conversion数据，按完成顺序逐个产出结果
+    
+    Args:
+        api_list: API配置列表 [{'name': 'IAByteC', 'secret': '...', 'key': '...'}, ...]
+        start_date: 开始日期 (YYYY-MM-DD)
+        end_date: 结束日期 (YYYY-MM-DD)
+        currency: 货币类型，默认使用配置文件中的值
+        global_concurrency: 所有API共享的最大并发请求数，默认使用 config.MULTI_API_GLOBAL_CONCURRENCY
+        per_api_concurrency: 单个API的最大并发请求数，默认使用 config.MULTI_API_PER_API_CONCURRENCY
+    
+    Yields:
+        tuple: (api_config, api_data, error)，成功时error为None，失败时api_data为None
+    """
+    global_concurrency = global_concurrency or getattr(config, 'MULTI_API_GLOBAL_CONCURRENCY', None) \
+        or config.MAX_CONCURRENT_REQUESTS
+    # 未配置单API上限时由客户端自行决定（固定MAX_CONCURRENT_REQUESTS或自适应控制器）
+    per_api_concurrency = per_api_concurrency or getattr(config, 'MULTI_API_PER_API_CONCURRENCY', None)
+    global_semaphore = asyncio.Semaphore(global_concurrency)
+    
+    print_step("多API并发", f"并发获取 {len(api_list)} 个API数据 "
+                         f"(全局并发上限: {global_concurrency}, 单API并发上限: {per_api_concurrency or '默认'})")
+    
+    async def fetch_one(api_config: Dict[str, str]):
+        api_name = api_config['name']
+        client = AsyncInvolveAsiaAPI(
+            api_secret=api_config['secret'],
+            api_key=api_config['key'],
+            max_concurrent_requests=per_api_concurrency,
+            global_semaphore=global_semaphore,
+            share_client=True  # 同一主机的所有API共用预热的连接池
+        )
+        try:
+            if not await client.authenticate():
+                return api_config, None, f"API认证失败: {api_name}"
+            api_data = await client.get_conversions_async(start_date, end_date, currency, api_name=api_name)
+            return api_config, api_data, None
+        except Exception as e:
+            return api_config, None, f"API异常: {api_name} - {str(e)}"
+    
+    tasks = [asyncio.ensure_future(fetch_one(api_config)) for api_config in api_list]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        # 消费方提前退出时取消仍在运行的API任务
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+        await close_shared_clients()
+
 # 性能测试函数
 def compare_sync_vs_async_performance(start_date: str, end_date: str, 
                                     test_pages: int = 5) -> Dict[str, Any]:
@@ -488,9 +1278,10 @@ def compare_sync_vs_async_performance(start_date: str, end_date: str,
         async_api = AsyncInvolveAsiaAPI()
         
         async def test_async():
-            if await async_api.authenticate():
-                return await async_api.get_conversions_async(start_date, end_date)
-            return None
+            async with async_api:
+                if await async_api.authenticate():
+                    return await async_api.get_conversions_async(start_date, end_date)
+                return None
         
         async_result = asyncio.run(test_async())
         async_time = time.time() - async_start
@@ -537,5 +1328,8 @@ def compare_sync_vs_async_performance(start_date: str, end_date: str,
 __all__ = [
     'AsyncInvolveAsiaAPI',
     'get_conversions_async', 
+    'iter_multi_api_conversions',
+    'get_shared_async_client',
+    'close_shared_clients',
     'compare_sync_vs_async_performance'
 ] 
\ No newline at end of file
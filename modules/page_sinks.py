@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+分页数据Sink模块
+配合 AsyncInvolveAsiaAPI.stream_conversions_async / iter_conversion_pages 使用，逐页写出conversion数据，
+峰值内存只与单页大小相关，不再随日期范围增长
+
+用法示例（main.py --api-only --stream-jsonl 即使用此方式）:
+    async with api:
+        await api.authenticate()
+        stats = await api.stream_conversions_async(start_date, end_date, [JSONLinesPageSink()])
+"""
+
+import asyncio
+import json
+import os
+from abc import ABC, abstractmethod
+from typing import Any, AsyncIterator, Dict, Optional
+
+from utils.logger import print_step
+import config
+
+
+class PageSink(ABC):
+    """Sink基类：逐页接收数据"""
+
+    @abstractmethod
+    async def write_page(self, page: Dict[str, Any]):
+        """写入一页数据，page结构见 iter_conversion_pages"""
+
+    async def close(self):
+        """写入结束，刷新剩余数据并释放资源"""
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+
+class JSONLinesPageSink(PageSink):
+    """逐条写入JSON Lines文件（每行一条conversion），文件操作在线程中执行，不阻塞事件循环"""
+
+    def __init__(self, filepath: Optional[str] = None):
+        if not filepath:
+            filepath = os.path.join(config.OUTPUT_DIR, config.get_json_filename().replace('.json', '.jsonl'))
+        self.filepath = filepath
+        self._file = None
+        self.records_written = 0
+
+    def _write(self, text: str):
+        if self._file is None:
+            os.makedirs(os.path.dirname(self.filepath) or '.', exist_ok=True)
+            self._file = open(self.filepath, 'w', encoding='utf-8')
+        self._file.write(text)
+
+    def _close(self):
+        if self._file is None:
+            # 没有任何数据时也生成空文件
+            self._write('')
+        self._file.close()
+
+    async def write_page(self, page: Dict[str, Any]):
+        records = page['data']
+        text = ''.join(json.dumps(record, ensure_ascii=False) + '\n' for record in records)
+        await asyncio.to_thread(self._write, text)
+        self.records_written += len(records)
+
+    async def close(self):
+        if self._file is not None and self._file.closed:
+            return
+        await asyncio.to_thread(self._close)
+        print_step("JSONL保存成功", f"已写入 {self.records_written} 条记录到: {self.filepath}")
+
+
+async def stream_conversion_pages(pages: AsyncIterator[Dict[str, Any]], *sinks: PageSink) -> Dict[str, int]:
+    """
+    将逐页数据依次写入所有Sink，写完即丢弃该页（不关闭Sink）
+
+    Returns:
+        dict: {'pages': 页数, 'records': 记录数}
+    """
+    stats = {'pages': 0, 'records': 0}
+    async for page in pages:
+        for sink in sinks:
+            await sink.write_page(page)
+        stats['pages'] += 1
+        stats['records'] += len(page['data'])
+    return stats
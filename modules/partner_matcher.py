@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Partner匹配模块
+将 PARTNER_SOURCES_MAPPING 中所有Partner的 sources 列表和 pattern 编译为一个组合正则，
+一次 match 即可得到归属的Partner；不同的Source只匹配一次（结果缓存），
+并提供对 pandas Series 的批量匹配接口，归属计算的开销只与不同Source的数量相关
+
+匹配规则与原 config.match_source_to_partner 一致：按 PARTNER_SOURCES_MAPPING 的顺序，
+每个Partner先检查 sources 列表（完全相等），再检查 pattern（re.match），首个命中的Partner胜出；
+都未命中时返回Source本身
+"""
+
+import re
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+import config
+
+_BACKREFERENCE = re.compile(r'\\[1-9]|\(\?P=')
+
+
+class PartnerMatcher:
+    """组合正则 + 结果缓存的Source -> Partner匹配器"""
+
+    def __init__(self, mapping: Dict[str, Dict[str, Any]], cache_size: Optional[int] = None):
+        self.mapping = mapping
+        self.cache_size = cache_size or getattr(config, 'PARTNER_MATCH_CACHE_SIZE', 65536)
+        self._rules: List[Tuple[str, List[str], str]] = [
+            (partner, list(partner_config.get('sources', [])), partner_config.get('pattern', ''))
+            for partner, partner_config in mapping.items()
+        ]
+        self._group_partners: Dict[str, str] = {}
+        self._combined = self._compile()
+        self._cache: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0}
+
+    def _compile(self) -> Optional[re.Pattern]:
+        """
+        编译组合正则：每个Partner一个命名分组，分组内依次为 sources 的完全匹配和 pattern；
+        同一位置上正则按分支顺序尝试，因此首个命中的分组就是按顺序首个命中的Partner。
+        pattern 无法组合时（如含反向引用、全局内联标志）返回None，退回逐条匹配
+        """
+        branches = []
+        for index, (partner, sources, pattern) in enumerate(self._rules):
+            if pattern and _BACKREFERENCE.search(pattern):
+                # 组合后分组编号会变化，反向引用将指向错误的分组
+                return None
+            alternatives = [f"{re.escape(source)}\\Z" for source in sources]
+            if pattern:
+                alternatives.append(f"(?:{pattern})")
+            if not alternatives:
+                continue
+            group = f"p{index}"
+            self._group_partners[group] = partner
+            branches.append(f"(?P<{group}>{'|'.join(alternatives)})")
+        if not branches:
+            return None
+        try:
+            return re.compile('|'.join(branches))
+        except re.error:
+            return None
+
+    def _match_sequential(self, source_name: Any) -> Any:
+        """逐个Partner匹配（原有实现）"""
+        for partner, sources, pattern in self._rules:
+            if source_name in sources:
+                return partner
+            if pattern and re.match(pattern, source_name):
+                return partner
+        return source_name
+
+    def match(self, source_name: str) -> str:
+        """将Source映射到对应的Partner"""
+        if not isinstance(source_name, str):
+            # 非字符串（如None）不缓存，保持原有的逐条匹配行为
+            return self._match_sequential(source_name)
+
+        partner = self._cache.get(source_name)
+        if partner is not None:
+            self.stats['hits'] += 1
+            return partner
+        self.stats['misses'] += 1
+        if self._combined is not None:
+            match = self._combined.match(source_name)
+            partner = self._group_partners[match.lastgroup] if match else source_name
+        else:
+            partner = self._match_sequential(source_name)
+        with self._lock:
+            if len(self._cache) >= self.cache_size:
+                self._cache.clear()
+            self._cache[source_name] = partner
+        return partner
+
+    def match_series(self, sources, missing: Optional[str] = None):
+        """
+        批量匹配 pandas Series：只对不同的Source做匹配，再按编码映射回每一行
+
+        Args:
+            sources: Source 列
+            missing: 缺失值（NaN/None）对应的Partner，默认保留为缺失
+
+        Returns:
+            pandas.Series: 与 sources 同索引的Partner列
+        """
+        import numpy as np
+        import pandas as pd
+
+        codes, uniques = pd.factorize(sources)
+        # 编码 -1（缺失）映射到末尾的 missing
+        labels = np.array([self.match(source) for source in uniques] + [missing], dtype=object)
+        return pd.Series(labels[codes], index=sources.index, name=sources.name, dtype=object)
+
+    def clear_cache(self):
+        with self._lock:
+            self._cache.clear()
+
+
+_matcher: Optional[PartnerMatcher] = None
+_matcher_lock = threading.Lock()
+
+
+def get_partner_matcher() -> PartnerMatcher:
+    """获取进程内共享的匹配器；config.PARTNER_SOURCES_MAPPING 被重新赋值时自动重建"""
+    global _matcher
+    mapping = config.PARTNER_SOURCES_MAPPING
+    matcher = _matcher
+    if matcher is None or matcher.mapping is not mapping:
+        with _matcher_lock:
+            if _matcher is None or _matcher.mapping is not mapping:
+                _matcher = PartnerMatcher(mapping)
+            matcher = _matcher
+    return matcher
+
+
+def reset_partner_matcher():
+    """修改 PARTNER_SOURCES_MAPPING 的内容后调用，下次匹配时重新编译"""
+    global _matcher
+    with _matcher_lock:
+        _matcher = None
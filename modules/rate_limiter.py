@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+跨进程令牌桶限流模块
+web_server任务、DMP Agent、api_agent 和 main.py 可能同时使用同一个Involve Asia Key，
+各进程在发送分页请求前从同一个令牌桶（位于 STATE_DIR 的文件锁状态文件）领取令牌，
+使总请求速率稳定在服务商限额附近，而不是各自突发后一起触发429再整体休眠
+"""
+
+import asyncio
+import hashlib
+import random
+import time
+from typing import Dict, Optional, Tuple
+
+from modules.state_store import JSONStateFile
+from utils.logger import print_step
+import config
+
+
+class TokenBucketRateLimiter:
+    """按API Key共享的令牌桶（预约式：领取时扣减令牌，不足时返回需要等待的秒数）"""
+
+    def __init__(self, api_secret: str, api_key: str, rate: Optional[float] = None,
+                 burst: Optional[float] = None):
+        self.rate = float(rate or getattr(config, 'RATE_LIMIT_REQUESTS_PER_SECOND', 10.0))
+        self.burst = float(burst or getattr(config, 'RATE_LIMIT_BURST', self.rate))
+        self.state = JSONStateFile(getattr(config, 'RATE_LIMIT_STATE_FILE', 'rate_limiter.json'))
+        self.state_key = hashlib.sha256(f"{api_key}:{api_secret}".encode('utf-8')).hexdigest()
+
+        # 本进程统计
+        self.stats = {'acquired': 0, 'waited': 0, 'wait_seconds': 0.0, 'penalties': 0}
+
+    def _refill(self, entry: Dict, now: float) -> float:
+        """按流逝时间补充令牌，返回当前令牌数"""
+        tokens = entry.get('tokens', self.burst)
+        updated = entry.get('updated', now)
+        return min(self.burst, tokens + max(0.0, now - updated) * self.rate)
+
+    def reserve(self, tokens: float = 1.0) -> float:
+        """
+        预约令牌并返回需要等待的秒数
+
+        令牌不足时允许透支（令牌数为负），等待时间即透支部分补满所需时间，
+        这样多个进程的请求按预约顺序均匀排开，不需要反复轮询状态文件
+        """
+        def mutate(data):
+            now = time.time()
+            entry = data.get(self.state_key, {})
+            available = self._refill(entry, now) - tokens
+            data[self.state_key] = {
+                'tokens': available,
+                'updated': now,
+                'blocked_until': entry.get('blocked_until', 0.0),
+            }
+            wait = -available / self.rate if available < 0 else 0.0
+            return max(wait, entry.get('blocked_until', 0.0) - now)
+
+        try:
+            wait = self.state.update(mutate)
+        except OSError as e:
+            # 状态文件不可用时不阻塞请求，退化为不限流
+            print_step("限流状态", f"读取共享限流状态失败: {str(e)}")
+            return 0.0
+
+        self.stats['acquired'] += 1
+        if wait > 0:
+            self.stats['waited'] += 1
+            self.stats['wait_seconds'] += wait
+        return wait
+
+    def acquire(self, tokens: float = 1.0) -> float:
+        """同步领取令牌（阻塞直到可以发送请求），返回等待的秒数"""
+        wait = self.reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    async def acquire_async(self, tokens: float = 1.0) -> float:
+        """
+        异步领取令牌，返回等待的秒数
+
+        状态文件的文件锁可能被其他进程持有，预约在线程中执行，不阻塞事件循环
+        """
+        wait = await asyncio.to_thread(self.reserve, tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+    def penalize(self, retry_after: Optional[float] = None) -> float:
+        """
+        收到429：清空令牌并让所有共享该Key的进程一起退避
+
+        Returns:
+            float: 退避秒数
+        """
+        backoff = retry_after if retry_after and retry_after > 0 else getattr(config, 'ADAPTIVE_THROTTLE_BACKOFF', 5.0)
+        backoff *= random.uniform(0.8, 1.2)
+
+        def mutate(data):
+            now = time.time()
+            entry = data.get(self.state_key, {})
+            data[self.state_key] = {
+                'tokens': min(0.0, self._refill(entry, now)),
+                'updated': now,
+                'blocked_until': max(entry.get('blocked_until', 0.0), now + backoff),
+            }
+
+        try:
+            self.state.update(mutate)
+        except OSError as e:
+            print_step("限流状态", f"写入共享限流状态失败: {str(e)}")
+        self.stats['penalties'] += 1
+        return backoff
+
+    async def penalize_async(self, retry_after: Optional[float] = None) -> float:
+        """penalize 的异步版本（在线程中写状态文件），返回退避秒数"""
+        return await asyncio.to_thread(self.penalize, retry_after)
+
+    def summary(self) -> str:
+        return (f"限流 {self.rate:g} 次/秒 (突发 {self.burst:g}), 领取 {self.stats['acquired']} 次, "
+                f"等待 {self.stats['waited']} 次共 {self.stats['wait_seconds']:.1f} 秒, "
+                f"429退避 {self.stats['penalties']} 次")
+
+
+_rate_limiters: Dict[Tuple[str, str], TokenBucketRateLimiter] = {}
+
+
+def get_rate_limiter(api_secret: str, api_key: str) -> Optional[TokenBucketRateLimiter]:
+    """获取指定API Key的共享限流器，配置禁用时返回None"""
+    if not getattr(config, 'RATE_LIMITER_ENABLED', True):
+        return None
+    key = (api_secret, api_key)
+    if key not in _rate_limiters:
+        _rate_limiters[key] = TokenBucketRateLimiter(api_secret, api_key)
+    return _rate_limiters[key]
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+失败页面恢复队列模块
+获取结束时以较低并发、带抖动的退避重新获取失败页面；仍然失败的页面按运行批次持久化到
+STATE_DIR，之后运行 `python main.py --resume` 只补拉这些页面并合并回已保存的数据集，
+不需要为了补几页数据重新拉取整个日期范围
+
+失败请求的结构: {'start_date': ..., 'end_date': ..., 'page': 页码}
+page 为 None 表示整个日期分片失败，恢复时从第一页开始重新获取该分片
+"""
+
+import hashlib
+import json
+import os
+import random
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+from modules.state_store import JSONStateFile
+from utils.logger import print_step
+import config
+
+
+def recovery_backoff(attempt: int) -> float:
+    """第 attempt 次恢复尝试前的等待秒数（指数退避 + 随机抖动）"""
+    base = getattr(config, 'RECOVERY_BACKOFF_BASE', 2.0)
+    cap = getattr(config, 'RECOVERY_BACKOFF_MAX', 30.0)
+    return min(cap, base * (2 ** max(0, attempt - 1))) * random.uniform(0.5, 1.5)
+
+
+def merge_unique_records(records: List[Dict], new_records: List[Dict]) -> int:
+    """将 new_records 按 conversion_id 去重后追加到 records，返回新增条数"""
+    seen_ids = {record.get('conversion_id') for record in records if record.get('conversion_id') is not None}
+    added = 0
+    for record in new_records:
+        conversion_id = record.get('conversion_id')
+        if conversion_id is not None:
+            if conversion_id in seen_ids:
+                continue
+            seen_ids.add(conversion_id)
+        records.append(record)
+        added += 1
+    return added
+
+
+def describe_request(failed_request: Dict[str, Any]) -> str:
+    """失败请求的简短描述，用于日志和 skipped_pages"""
+    date_range = failed_request['start_date']
+    if failed_request['end_date'] != failed_request['start_date']:
+        date_range = f"{failed_request['start_date']}~{failed_request['end_date']}"
+    page = failed_request.get('page')
+    return f"{date_range}#{page if page is not None else '*'}"
+
+
+class RecoveryQueue:
+    """按API Key持久化的失败页面队列"""
+
+    def __init__(self, api_secret: str, api_key: str):
+        self.state = JSONStateFile(getattr(config, 'RECOVERY_QUEUE_FILE', 'recovery_queue.json'))
+        self.state_key = hashlib.sha256(f"{api_key}:{api_secret}".encode('utf-8')).hexdigest()
+
+    def add_run(self, api_name: Optional[str], start_date: str, end_date: str, currency: str,
+                failed_requests: List[Dict[str, Any]], dataset: Optional[str] = None) -> str:
+        """登记一次运行中未能恢复的页面，返回运行批次ID"""
+        run_id = f"{time.strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:6]}"
+
+        def mutate(data):
+            data.setdefault(self.state_key, {})[run_id] = {
+                'api_name': api_name,
+                'start_date': start_date,
+                'end_date': end_date,
+                'currency': currency,
+                'dataset': dataset,
+                'created_at': time.time(),
+                'requests': failed_requests,
+            }
+
+        self.state.update(mutate)
+        print_step("恢复队列", f"{len(failed_requests)} 个失败页面已保存 (批次 {run_id})，"
+                              f"可运行 --resume 补拉")
+        return run_id
+
+    def attach_dataset(self, run_id: str, dataset: str, record_fields: Optional[Dict[str, Any]] = None):
+        """
+        记录该批次对应的已保存数据集文件，--resume 时合并到该文件
+
+        Args:
+            record_fields: 合并前写入每条恢复记录的字段（例如多API数据集的 api_source / api_platform）
+        """
+        def mutate(data):
+            run = data.get(self.state_key, {}).get(run_id)
+            if run is not None:
+                run['dataset'] = dataset
+                if record_fields:
+                    run['record_fields'] = record_fields
+
+        self.state.update(mutate)
+
+    def pending_runs(self) -> Dict[str, Dict[str, Any]]:
+        """当前API Key待恢复的所有批次"""
+        return self.state.read().get(self.state_key, {})
+
+    def update_run(self, run_id: str, remaining_requests: List[Dict[str, Any]]):
+        """更新批次剩余的失败页面，全部恢复后移除该批次"""
+        def mutate(data):
+            runs = data.get(self.state_key, {})
+            if run_id not in runs:
+                return
+            if remaining_requests:
+                runs[run_id]['requests'] = remaining_requests
+            else:
+                runs.pop(run_id)
+            if not runs:
+                data.pop(self.state_key, None)
+
+        self.state.update(mutate)
+
+
+def attach_multi_api_runs(api_list: List[Dict[str, str]], merged_data: Dict[str, Any], dataset_path: str):
+    """
+    将多API合并数据集中各API未恢复页面的批次（data.recovery_runs）关联到该文件，
+    合并时带有API来源标记的，补拉的记录同样写入 api_source / api_platform
+
+    Args:
+        api_list: [{'name': ..., 'secret': ..., 'key': ...}, ...]
+    """
+    data_obj = merged_data.get('data', {})
+    has_api_fields = data_obj.get('merge_info', {}).get('has_api_source_fields')
+    for api_config in api_list:
+        run_id = data_obj.get('recovery_runs', {}).get(api_config['name'])
+        if not run_id:
+            continue
+        record_fields = None
+        if has_api_fields:
+            record_fields = {
+                'api_source': api_config['name'],
+                'api_platform': config.get_platform_from_api_secret(api_config['secret']),
+            }
+        RecoveryQueue(api_config['secret'], api_config['key']).attach_dataset(run_id, dataset_path, record_fields)
+
+
+def merge_into_dataset(dataset_path: str, records: List[Dict],
+                       recovered: List[Dict[str, Any]]) -> int:
+    """
+    将恢复的记录合并到已保存的JSON数据集（结构与API返回一致），返回新增条数
+    """
+    with open(dataset_path, 'r', encoding='utf-8') as f:
+        dataset = json.load(f)
+
+    data_obj = dataset.setdefault('data', {})
+    # 多API合并的数据集把记录保存在 conversions 中
+    existing = data_obj['conversions'] if 'conversions' in data_obj else data_obj.setdefault('data', [])
+    added = merge_unique_records(existing, records)
+
+    recovered_labels = {describe_request(request) for request in recovered}
+    recovered_pages = {request['page'] for request in recovered}
+    data_obj['skipped_pages'] = [page for page in data_obj.get('skipped_pages', [])
+                                 if str(page) not in recovered_labels and page not in recovered_pages]
+    data_obj['current_page_count'] = len(existing)
+    if 'merge_info' in data_obj:
+        data_obj['total_count'] = data_obj['merge_info']['total_records'] = len(existing)
+    data_obj['pages_fetched'] = data_obj.get('pages_fetched', 0) + len(recovered)
+
+    tmp_path = f"{dataset_path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(dataset, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, dataset_path)
+    return added
+
+
+def resume_recovery(api, api_name: Optional[str] = None) -> Dict[str, Any]:
+    """
+    补拉持久化队列中的失败页面并合并到对应的数据集（api需已认证）
+
+    api 可以是 InvolveAsiaAPI 或 AsyncInvolveAsiaAPI，二者都提供同步的 recover_pages 方法
+
+    Returns:
+        dict: {'runs': 批次数, 'recovered_pages': 恢复页数, 'added_records': 新增记录数,
+               'remaining_pages': 仍失败页数, 'datasets': 写入的数据集文件列表}
+    """
+    queue = RecoveryQueue(api.api_secret, api.api_key)
+    runs = queue.pending_runs()
+    summary = {'runs': len(runs), 'recovered_pages': 0, 'added_records': 0,
+               'remaining_pages': 0, 'datasets': []}
+    if not runs:
+        print_step("恢复队列", "没有待恢复的页面")
+        return summary
+
+    for run_id, run in sorted(runs.items()):
+        label = run.get('api_name') or api_name
+        api_label = f"[{label}] " if label else ""
+        print_step("恢复批次", f"{api_label}{run_id}: {run['start_date']} ~ {run['end_date']}, "
+                              f"{len(run['requests'])} 个失败页面")
+        records, remaining = api.recover_pages(run['requests'], run.get('currency'), api_label)
+        for record in records:
+            record.update(run.get('record_fields') or {})
+        remaining_labels = {describe_request(request) for request in remaining}
+        recovered = [request for request in run['requests'] if describe_request(request) not in remaining_labels]
+
+        dataset = run.get('dataset')
+        if records:
+            if dataset and os.path.exists(dataset):
+                added = merge_into_dataset(dataset, records, recovered)
+            else:
+                # 原始数据集未保存时单独保存恢复出的记录
+                added = len(records)
+                dataset = api.save_to_json({
+                    "status": "success",
+                    "message": "Recovered",
+                    "data": {"count": added, "current_page_count": added,
+                             "recovered_from": run_id, "data": records}
+                }, f"recovered_{run_id}.json")
+            summary['added_records'] += added
+            if dataset:
+                summary['datasets'].append(dataset)
+            print_step("恢复合并", f"{api_label}新增 {added} 条记录 -> {dataset}")
+
+        summary['recovered_pages'] += len(recovered)
+        summary['remaining_pages'] += len(remaining)
+        queue.update_run(run_id, remaining)
+
+    return summary
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+请求对冲(hedging)模块
+单个分页请求的延迟超过近期延迟的高分位数时，再发送一个相同的请求，
+先返回的结果被采用、另一个被取消；每次运行的对冲请求数受预算限制，
+在压低尾延迟的同时不会显著增加服务商的负载
+"""
+
+import asyncio
+import math
+from collections import deque
+from typing import Awaitable, Callable, Optional, Tuple
+
+import config
+
+
+class HedgePolicy:
+    """滚动分位数阈值 + 每次运行的对冲预算"""
+
+    def __init__(self, percentile: Optional[float] = None, window: Optional[int] = None,
+                 min_samples: Optional[int] = None, min_delay: Optional[float] = None,
+                 budget_ratio: Optional[float] = None, budget_min: Optional[int] = None):
+        self.percentile = percentile or getattr(config, 'HEDGE_LATENCY_PERCENTILE', 95)
+        self.latencies = deque(maxlen=window or getattr(config, 'HEDGE_WINDOW_SIZE', 200))
+        self.min_samples = min_samples or getattr(config, 'HEDGE_MIN_SAMPLES', 20)
+        self.min_delay = min_delay if min_delay is not None else getattr(config, 'HEDGE_MIN_DELAY', 1.0)
+        self.budget_ratio = budget_ratio if budget_ratio is not None else getattr(config, 'HEDGE_BUDGET_RATIO', 0.05)
+        self.budget_min = budget_min if budget_min is not None else getattr(config, 'HEDGE_BUDGET_MIN', 2)
+        self.stats = {'requests': 0, 'hedged': 0, 'hedge_wins': 0, 'budget_exhausted': 0}
+
+    def start_run(self):
+        """开始新一轮获取：重置预算计数（保留延迟窗口，阈值可以沿用）"""
+        self.stats = {'requests': 0, 'hedged': 0, 'hedge_wins': 0, 'budget_exhausted': 0}
+
+    def observe(self, latency: float):
+        """记录一次成功请求的延迟"""
+        self.latencies.append(latency)
+
+    def threshold(self) -> Optional[float]:
+        """当前对冲阈值（秒）；样本不足时返回None，不进行对冲"""
+        if len(self.latencies) < self.min_samples:
+            return None
+        ordered = sorted(self.latencies)
+        index = min(len(ordered) - 1, max(0, math.ceil(len(ordered) * self.percentile / 100) - 1))
+        return max(self.min_delay, ordered[index])
+
+    def try_acquire(self) -> bool:
+        """领取一次对冲名额：预算为本轮请求数的 budget_ratio，至少 budget_min 个"""
+        budget = max(self.budget_min, int(self.stats['requests'] * self.budget_ratio))
+        if self.stats['hedged'] >= budget:
+            self.stats['budget_exhausted'] += 1
+            return False
+        self.stats['hedged'] += 1
+        return True
+
+    def summary(self) -> str:
+        threshold = self.threshold()
+        return (f"对冲 {self.stats['hedged']}/{self.stats['requests']} 个请求, "
+                f"对冲请求先返回 {self.stats['hedge_wins']} 次, 预算用尽 {self.stats['budget_exhausted']} 次, "
+                f"当前阈值 {f'{threshold:.2f}s' if threshold else '样本不足'}")
+
+
+async def hedged_call(policy: HedgePolicy,
+                      primary: Callable[[asyncio.Event], Awaitable[Tuple]],
+                      hedge: Callable[[asyncio.Event], Awaitable[Tuple]]) -> Tuple:
+    """
+    执行可对冲的请求
+
+    primary/hedge 接收一个 asyncio.Event，在真正发出HTTP请求时 set()，返回 (结果, 是否成功, 页码)；
+    对冲计时从主请求发出时开始，排队等待并发名额或限流令牌的时间不计入
+    """
+    policy.stats['requests'] += 1
+    threshold = policy.threshold()
+    sent = asyncio.Event()
+    primary_task = asyncio.ensure_future(primary(sent))
+    if threshold is None:
+        return await primary_task
+
+    tasks = {primary_task}
+    try:
+        sent_waiter = asyncio.ensure_future(sent.wait())
+        try:
+            await asyncio.wait({primary_task, sent_waiter}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            sent_waiter.cancel()
+        if not primary_task.done():
+            await asyncio.wait({primary_task}, timeout=threshold)
+        if primary_task.done() or not policy.try_acquire():
+            return await primary_task
+
+        hedge_task = asyncio.ensure_future(hedge(asyncio.Event()))
+        tasks.add(hedge_task)
+        fallback = None
+        while tasks:
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                tasks.discard(task)
+                if task.exception() is not None:
+                    continue
+                result = task.result()
+                if result[1]:
+                    if task is hedge_task:
+                        policy.stats['hedge_wins'] += 1
+                    return result
+                if task is primary_task or fallback is None:
+                    fallback = result
+        if fallback is not None:
+            return fallback
+        return await primary_task
+    finally:
+        # 已有结果（或调用方被取消）时取消仍在进行的请求
+        for task in tasks:
+            if not task.done():
+                task.cancel()
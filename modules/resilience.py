@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+"""
+出站调用弹性模块
+为每个外部目标（Involve Asia、SMTP、飞书、TikTok 等，按主机区分）维护：
+- 熔断器：连续失败达到阈值后打开，冷却期内直接失败；冷却后半开放行少量探测请求，成功则关闭
+- 重试预算：每个请求存入一定比例的令牌，每次重试消耗一个令牌，预算用尽后不再重试
+- 带抖动的指数退避
+
+服务商故障期间，各处的重试循环不再各自累积数分钟的固定等待，而是快速失败
+（失败页面由恢复队列在之后补拉）
+"""
+
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple, Type
+from urllib.parse import urlparse
+
+from utils.logger import print_step
+import config
+
+try:
+    from urllib3.exceptions import ConnectTimeoutError
+except ImportError:
+    ConnectTimeoutError = None
+
+STATE_CLOSED = 'closed'
+STATE_OPEN = 'open'
+STATE_HALF_OPEN = 'half_open'
+
+
+class ResilienceError(Exception):
+    """弹性策略拒绝了本次调用"""
+
+
+class CircuitOpenError(ResilienceError):
+    """熔断器打开，目标暂时不可用"""
+
+
+class RetryBudgetExhausted(ResilienceError):
+    """重试预算用尽"""
+
+
+def is_transient_status(status_code: int) -> bool:
+    """是否为值得重试、并计入熔断的HTTP状态码（5xx 和 408）"""
+    return status_code >= 500 or status_code == 408
+
+
+def is_connect_error(error: BaseException) -> bool:
+    """
+    是否为建立连接阶段的失败（DNS解析失败、连接被拒绝、连接超时），此时请求尚未发出，
+    非幂等的调用（上传、创建资源）也可以安全重试
+    """
+    if ConnectTimeoutError is None:
+        return False
+    # requests 把 urllib3 的异常包装在 MaxRetryError.reason 中
+    reason = getattr(error.args[0], 'reason', None) if error.args else None
+    return isinstance(error, ConnectTimeoutError) or isinstance(reason, ConnectTimeoutError)
+
+
+class CircuitBreaker:
+    """连续失败计数的三态熔断器（线程安全）"""
+
+    def __init__(self, name: str, failure_threshold: Optional[int] = None,
+                 recovery_timeout: Optional[float] = None, half_open_max_calls: Optional[int] = None):
+        self.name = name
+        self.failure_threshold = failure_threshold or getattr(config, 'CIRCUIT_BREAKER_FAILURE_THRESHOLD', 5)
+        self.recovery_timeout = recovery_timeout or getattr(config, 'CIRCUIT_BREAKER_RECOVERY_TIMEOUT', 30.0)
+        self.half_open_max_calls = half_open_max_calls or getattr(config, 'CIRCUIT_BREAKER_HALF_OPEN_CALLS', 1)
+        self.state = STATE_CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.half_open_calls = 0
+        self.half_open_since = 0.0
+        self.stats = {'opened': 0, 'rejected': 0}
+        self._lock = threading.Lock()
+
+    def allow_request(self) -> bool:
+        with self._lock:
+            if self.state == STATE_OPEN:
+                if time.monotonic() - self.opened_at < self.recovery_timeout:
+                    self.stats['rejected'] += 1
+                    return False
+                self.state = STATE_HALF_OPEN
+                self.half_open_calls = 0
+                self.half_open_since = time.monotonic()
+                print_step("熔断半开", f"{self.name} 冷却结束，放行探测请求")
+            if self.state == STATE_HALF_OPEN:
+                # 探测请求被取消等原因未上报结果时，冷却期后重新放行探测
+                if time.monotonic() - self.half_open_since >= self.recovery_timeout:
+                    self.half_open_calls = 0
+                    self.half_open_since = time.monotonic()
+                if self.half_open_calls >= self.half_open_max_calls:
+                    self.stats['rejected'] += 1
+                    return False
+                self.half_open_calls += 1
+            return True
+
+    def release_probe(self):
+        """归还半开状态下未实际使用的探测名额"""
+        with self._lock:
+            if self.state == STATE_HALF_OPEN:
+                self.half_open_calls = max(0, self.half_open_calls - 1)
+
+    def retry_after(self) -> float:
+        """距离熔断器进入半开状态的秒数"""
+        with self._lock:
+            if self.state != STATE_OPEN:
+                return 0.0
+            return max(0.0, self.recovery_timeout - (time.monotonic() - self.opened_at))
+
+    def record_success(self):
+        with self._lock:
+            if self.state != STATE_CLOSED:
+                print_step("熔断恢复", f"{self.name} 探测请求成功，熔断器关闭")
+            self.state = STATE_CLOSED
+            self.consecutive_failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.consecutive_failures += 1
+            if self.state == STATE_HALF_OPEN or (
+                    self.state == STATE_CLOSED and self.consecutive_failures >= self.failure_threshold):
+                self.state = STATE_OPEN
+                self.opened_at = time.monotonic()
+                self.stats['opened'] += 1
+                print_step("熔断打开", f"{self.name} 连续失败 {self.consecutive_failures} 次，"
+                                      f"{self.recovery_timeout:g} 秒内的请求将直接失败")
+
+
+class RetryBudget:
+    """令牌式重试预算：每个首次请求存入 ratio 个令牌，每次重试消耗1个"""
+
+    def __init__(self, ratio: Optional[float] = None, min_tokens: Optional[float] = None,
+                 max_tokens: Optional[float] = None):
+        self.ratio = ratio if ratio is not None else getattr(config, 'RETRY_BUDGET_RATIO', 0.2)
+        self.min_tokens = min_tokens if min_tokens is not None else getattr(config, 'RETRY_BUDGET_MIN_TOKENS', 10)
+        self.max_tokens = max_tokens or getattr(config, 'RETRY_BUDGET_MAX_TOKENS', 100)
+        self.tokens = float(self.min_tokens)
+        self.stats = {'retries': 0, 'denied': 0}
+        self._lock = threading.Lock()
+
+    def deposit(self):
+        with self._lock:
+            self.tokens = min(self.max_tokens, self.tokens + self.ratio)
+
+    def try_spend(self) -> bool:
+        with self._lock:
+            if self.tokens < 1:
+                self.stats['denied'] += 1
+                return False
+            self.tokens -= 1
+            self.stats['retries'] += 1
+            return True
+
+
+class Destination:
+    """单个外部目标的熔断器 + 重试预算"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.breaker = CircuitBreaker(name)
+        self.budget = RetryBudget()
+
+    def begin(self, attempt: int):
+        """
+        第 attempt 次尝试（0为首次）前调用，被拒绝时抛出 ResilienceError
+
+        首次尝试向重试预算存入令牌，之后的尝试需要消耗令牌
+        """
+        if not self.breaker.allow_request():
+            raise CircuitOpenError(f"{self.name} 熔断中，{self.breaker.retry_after():.0f} 秒后重新探测")
+        if attempt == 0:
+            self.budget.deposit()
+        elif not self.budget.try_spend():
+            # 未真正发出请求，归还半开状态下的探测名额
+            self.breaker.release_probe()
+            raise RetryBudgetExhausted(f"{self.name} 重试预算已用尽")
+
+    def is_open(self) -> bool:
+        """熔断器是否打开且仍在冷却期内"""
+        return self.breaker.retry_after() > 0
+
+    def record_success(self):
+        self.breaker.record_success()
+
+    def record_failure(self):
+        self.breaker.record_failure()
+
+    @staticmethod
+    def backoff(attempt: int, base: Optional[float] = None, factor: float = 2.0,
+                cap: Optional[float] = None) -> float:
+        """第 attempt 次重试前的等待秒数（指数退避 + 随机抖动）"""
+        base = base if base is not None else getattr(config, 'RETRY_BACKOFF_BASE', 1.0)
+        cap = cap if cap is not None else getattr(config, 'RETRY_BACKOFF_MAX', 30.0)
+        return min(cap, base * factor ** max(0, attempt - 1)) * random.uniform(0.5, 1.5)
+
+    def summary(self) -> str:
+        return (f"{self.name}: 熔断器 {self.breaker.state}, 打开 {self.breaker.stats['opened']} 次, "
+                f"拒绝 {self.breaker.stats['rejected']} 次, 重试 {self.budget.stats['retries']} 次, "
+                f"预算拒绝 {self.budget.stats['denied']} 次")
+
+
+_destinations: Dict[str, Destination] = {}
+_destinations_lock = threading.Lock()
+
+
+def get_destination(name_or_url: str) -> Destination:
+    """获取进程内共享的目标策略；传入URL时按主机名区分目标"""
+    name = urlparse(name_or_url).netloc or name_or_url
+    with _destinations_lock:
+        if name not in _destinations:
+            _destinations[name] = Destination(name)
+        return _destinations[name]
+
+
+def call_with_retry(destination: Destination, func: Callable[[], Any],
+                    max_retries: Optional[int] = None,
+                    retry_exceptions: Tuple[Type[BaseException], ...] = (OSError,),
+                    should_retry: Optional[Callable[[Any], bool]] = None,
+                    retry_error: Optional[Callable[[BaseException], bool]] = None,
+                    base_delay: Optional[float] = None,
+                    label: str = "") -> Any:
+    """
+    在熔断器和重试预算约束下调用 func
+
+    Args:
+        func: 无参调用，返回结果（例如 requests 的 Response）
+        retry_exceptions: 视为临时故障、需要重试的异常类型（requests 的异常均为 OSError 子类）
+        should_retry: 根据返回结果判断是否为临时故障（例如5xx），重试用尽时返回最后一次结果
+        retry_error: 进一步判断捕获的异常是否可以重试（例如非幂等调用只重试 is_connect_error）
+        label: 日志标识
+
+    Raises:
+        ResilienceError: 熔断器打开或重试预算用尽
+    """
+    max_retries = getattr(config, 'RETRY_MAX_ATTEMPTS', 3) if max_retries is None else max_retries
+    label = label or destination.name
+    attempt = 0
+    while True:
+        destination.begin(attempt)
+        try:
+            result = func()
+        except retry_exceptions as e:
+            destination.record_failure()
+            if attempt >= max_retries or (retry_error is not None and not retry_error(e)):
+                raise
+            print_step("请求重试", f"{label} 第 {attempt + 1} 次请求失败: {str(e)}")
+        else:
+            if should_retry is None or not should_retry(result):
+                destination.record_success()
+                return result
+            destination.record_failure()
+            if attempt >= max_retries:
+                return result
+            print_step("请求重试", f"{label} 第 {attempt + 1} 次请求返回临时错误")
+        attempt += 1
+        time.sleep(destination.backoff(attempt, base_delay))
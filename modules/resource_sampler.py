@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+后台资源采样模块
+由一个后台线程按固定间隔采样当前进程的 RSS、CPU、打开的文件描述符数和线程数，
+写入环形缓冲区；ResourceMonitor 等调用方直接读取最新快照，不再在请求/重试路径上
+调用可能阻塞的 psutil 接口（如 cpu_percent(interval=1)）。
+工作流结束时可输出一份紧凑的资源时间线。
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+import psutil
+
+from utils.logger import print_step
+import config
+
+
+class ResourceSampler:
+    """后台资源采样器（环形缓冲区保存最近的采样结果）"""
+
+    def __init__(self, interval: Optional[float] = None, history: Optional[int] = None):
+        self.interval = max(0.1, float(interval or getattr(config, 'RESOURCE_SAMPLE_INTERVAL', 1.0)))
+        self.samples = deque(maxlen=int(history or getattr(config, 'RESOURCE_SAMPLE_HISTORY', 3600)))
+        self.process = psutil.Process(os.getpid())
+        self.start_time = time.time()
+
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+        # cpu_percent(None) 返回距上一次调用的CPU占用，首次调用仅用于建立基准
+        self.process.cpu_percent(None)
+        psutil.cpu_percent(None)
+        self._cpu_measured_at = time.time()
+        self._last_cpu = (0.0, 0.0)
+
+    def _take_sample(self) -> Dict[str, Any]:
+        """采集一次快照（仅在采样线程或首次读取时调用）"""
+        sample = {'timestamp': time.time()}
+        try:
+            with self.process.oneshot():
+                memory_info = self.process.memory_info()
+                sample['rss_mb'] = memory_info.rss / 1024 / 1024
+                sample['vms_mb'] = memory_info.vms / 1024 / 1024
+                sample['memory_percent'] = self.process.memory_percent()
+                sample['threads'] = self.process.num_threads()
+                sample['fds'] = self.process.num_fds() if hasattr(self.process, 'num_fds') else None
+            # 距上次测量过近时CPU占用误差很大，沿用上一次的结果
+            if sample['timestamp'] - self._cpu_measured_at >= 0.1:
+                self._last_cpu = (self.process.cpu_percent(None), psutil.cpu_percent(None))
+                self._cpu_measured_at = sample['timestamp']
+            sample['process_cpu'], sample['system_cpu'] = self._last_cpu
+            connections = self.process.net_connections(kind='inet') if hasattr(self.process, 'net_connections') \
+                else self.process.connections(kind='inet')
+            sample['connections'] = len(connections)
+            sample['established'] = sum(1 for c in connections if c.status == psutil.CONN_ESTABLISHED)
+        except (psutil.Error, OSError) as e:
+            sample['error'] = str(e)
+        return sample
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            sample = self._take_sample()
+            with self._lock:
+                self.samples.append(sample)
+            self._stop_event.wait(self.interval)
+
+    def start(self):
+        """启动采样线程（重复调用无副作用）"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return self
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, name="resource-sampler", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval + 1)
+            self._thread = None
+
+    def latest(self) -> Dict[str, Any]:
+        """最新快照；采样线程尚未产出数据时同步采集一次（非阻塞）"""
+        with self._lock:
+            if self.samples:
+                return dict(self.samples[-1])
+        sample = self._take_sample()
+        with self._lock:
+            self.samples.append(sample)
+        return dict(sample)
+
+    def timeline(self, since: Optional[float] = None) -> List[Dict[str, Any]]:
+        """缓冲区内的采样（可按起始时间过滤）"""
+        with self._lock:
+            samples = list(self.samples)
+        if since is not None:
+            samples = [sample for sample in samples if sample['timestamp'] >= since]
+        return [sample for sample in samples if 'error' not in sample]
+
+    def format_timeline(self, since: Optional[float] = None, max_points: Optional[int] = None) -> List[str]:
+        """
+        生成紧凑的资源时间线：按时间均分为若干段，每段输出 RSS/CPU 峰值和 fd/线程数
+
+        Returns:
+            list: 每行一段的文本
+        """
+        samples = self.timeline(since)
+        if not samples:
+            return []
+        max_points = max_points or getattr(config, 'RESOURCE_TIMELINE_POINTS', 12)
+        bucket_size = max(1, -(-len(samples) // max_points))
+        origin = samples[0]['timestamp']
+
+        lines = []
+        for index in range(0, len(samples), bucket_size):
+            bucket = samples[index:index + bucket_size]
+            fds = [sample['fds'] for sample in bucket if sample.get('fds') is not None]
+            lines.append(
+                f"{'+%.0fs' % (bucket[0]['timestamp'] - origin):>7}  "
+                f"RSS {max(sample['rss_mb'] for sample in bucket):7.1f}MB  "
+                f"CPU {max(sample['process_cpu'] for sample in bucket):5.1f}%  "
+                f"fd {max(fds) if fds else '-':>4}  "
+                f"线程 {max(sample['threads'] for sample in bucket):>3}  "
+                f"连接 {max(sample['established'] for sample in bucket):>3}"
+            )
+        return lines
+
+    def print_timeline(self, prefix: str = "", since: Optional[float] = None):
+        """打印资源时间线摘要"""
+        samples = self.timeline(since)
+        if not samples:
+            return
+        duration = samples[-1]['timestamp'] - samples[0]['timestamp']
+        peak_rss = max(sample['rss_mb'] for sample in samples)
+        peak_cpu = max(sample['process_cpu'] for sample in samples)
+        print_step("资源时间线", f"{prefix} {len(samples)} 个采样 / {duration:.0f} 秒 "
+                               f"(间隔 {self.interval:g}s), RSS峰值 {peak_rss:.1f}MB, CPU峰值 {peak_cpu:.1f}%")
+        for line in self.format_timeline(since):
+            print(f"   {line}")
+
+
+_sampler: Optional[ResourceSampler] = None
+_sampler_lock = threading.Lock()
+
+
+def get_resource_sampler() -> Optional[ResourceSampler]:
+    """获取进程内共享的资源采样器（首次调用时启动），资源监控禁用时返回None"""
+    global _sampler
+    if not getattr(config, 'RESOURCE_MONITOR_ENABLED', True):
+        return None
+    with _sampler_lock:
+        if _sampler is None:
+            _sampler = ResourceSampler().start()
+    return _sampler
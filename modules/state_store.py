@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+本地状态文件模块
+提供跨进程安全的JSON状态文件读写（文件锁 + 原子替换）
+用于Token缓存等需要在多次运行、多个进程之间共享的小型状态
+"""
+
+import json
+import os
+import tempfile
+from contextlib import contextmanager
+from typing import Any, Callable, Dict
+
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:  # Windows 等不支持 fcntl 的平台退化为进程内读写
+    FCNTL_AVAILABLE = False
+
+import config
+
+
+def get_state_dir() -> str:
+    """获取状态文件目录（可通过环境变量 BYTEC_STATE_DIR 指向持久化卷）"""
+    state_dir = getattr(config, 'STATE_DIR', config.TEMP_DIR)
+    os.makedirs(state_dir, exist_ok=True)
+    return state_dir
+
+
+class JSONStateFile:
+    """跨进程共享的JSON状态文件"""
+
+    def __init__(self, filename: str, state_dir: str = None):
+        self.path = filename if os.path.isabs(filename) else os.path.join(state_dir or get_state_dir(), filename)
+        self.lock_path = f"{self.path}.lock"
+
+    @contextmanager
+    def _locked(self, exclusive: bool):
+        """持有状态文件的文件锁（读共享锁 / 写排他锁）"""
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        if not FCNTL_AVAILABLE:
+            yield
+            return
+        with open(self.lock_path, 'a') as lock_file:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    def _read_unlocked(self) -> Dict[str, Any]:
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else {}
+        except (FileNotFoundError, json.JSONDecodeError, OSError):
+            return {}
+
+    def _write_unlocked(self, data: Dict[str, Any]):
+        # 先写临时文件再原子替换，避免其他进程读到写了一半的文件
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(self.path) or '.', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def read(self) -> Dict[str, Any]:
+        """读取完整状态，文件不存在或损坏时返回空字典"""
+        with self._locked(exclusive=False):
+            return self._read_unlocked()
+
+    def update(self, mutator: Callable[[Dict[str, Any]], Any]) -> Any:
+        """
+        在排他锁内执行 读取-修改-写回
+
+        Args:
+            mutator: 接收状态字典并原地修改的函数，其返回值原样返回给调用方
+        """
+        with self._locked(exclusive=True):
+            data = self._read_unlocked()
+            result = mutator(data)
+            self._write_unlocked(data)
+            return result
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Involve Asia 认证Token缓存模块
+按 api_secret/api_key 缓存Bearer Token及其过期时间，跨进程、跨定时任务复用，
+避免每次运行和每个临时客户端都重新调用 /authenticate
+"""
+
+import hashlib
+import time
+from typing import Optional
+
+from modules.state_store import JSONStateFile
+import config
+
+
+class TokenCache:
+    """基于本地状态文件的Token缓存"""
+
+    def __init__(self, filename: str = None, ttl: int = None, refresh_margin: int = None):
+        self.store = JSONStateFile(filename or getattr(config, 'TOKEN_CACHE_FILE', 'involve_asia_tokens.json'))
+        self.ttl = ttl or getattr(config, 'TOKEN_CACHE_TTL', 3600)
+        # 距离过期不足该秒数的Token视为失效，避免在长时间任务中途过期
+        self.refresh_margin = refresh_margin if refresh_margin is not None else getattr(config, 'TOKEN_REFRESH_MARGIN', 300)
+
+    @staticmethod
+    def _cache_key(api_secret: str, api_key: str) -> str:
+        """缓存键：不在磁盘上保存明文secret"""
+        return hashlib.sha256(f"{api_key}:{api_secret}".encode('utf-8')).hexdigest()
+
+    def get(self, api_secret: str, api_key: str) -> Optional[str]:
+        """获取仍在有效期内的Token，没有则返回None"""
+        entry = self.store.read().get(self._cache_key(api_secret, api_key))
+        if not entry:
+            return None
+        if entry.get('expires_at', 0) - self.refresh_margin <= time.time():
+            return None
+        return entry.get('token')
+
+    def set(self, api_secret: str, api_key: str, token: str, expires_in: Optional[int] = None):
+        """保存Token，expires_in为空时使用默认TTL"""
+        now = time.time()
+        key = self._cache_key(api_secret, api_key)
+        lifetime = expires_in if expires_in and expires_in > 0 else self.ttl
+
+        def mutate(data):
+            # 顺便清理已过期的条目
+            for stale_key in [k for k, v in data.items() if v.get('expires_at', 0) <= now]:
+                data.pop(stale_key, None)
+            data[key] = {'token': token, 'created_at': now, 'expires_at': now + lifetime}
+
+        self.store.update(mutate)
+
+    def invalidate(self, api_secret: str, api_key: str, token: Optional[str] = None):
+        """
+        使缓存的Token失效（例如收到401时）
+
+        Args:
+            token: 仅当缓存中的Token与之相同时才删除，避免删掉其他进程刚刷新的Token
+        """
+        key = self._cache_key(api_secret, api_key)
+
+        def mutate(data):
+            entry = data.get(key)
+            if entry and (token is None or entry.get('token') == token):
+                data.pop(key, None)
+
+        self.store.update(mutate)
+
+
+def extract_token_lifetime(auth_data: dict) -> Optional[int]:
+    """从认证响应中提取Token有效期（秒），响应未提供时返回None"""
+    for field in ('expires_in', 'expire_in', 'ttl'):
+        value = auth_data.get(field)
+        try:
+            if value is not None:
+                return int(value)
+        except (TypeError, ValueError):
+            continue
+    return None
+
+
+_token_cache = None
+
+
+def get_token_cache() -> Optional[TokenCache]:
+    """获取全局Token缓存，配置禁用时返回None"""
+    global _token_cache
+    if not getattr(config, 'TOKEN_CACHE_ENABLED', True):
+        return None
+    if _token_cache is None:
+        _token_cache = TokenCache()
+    return _token_cache
@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+"""
+数据获取性能基准测试
+启动本地 Involve Asia 模拟服务器，分别用同步客户端、异步客户端和 agents/api_agent 客户端
+获取同一日期范围的数据，记录 pages/s、单次HTTP请求延迟 p50/p99（不含限流、并发槽位和重试退避等待，三个客户端口径一致）和峰值内存(RSS)
+
+每个客户端在独立子进程中运行，峰值RSS互不影响；状态文件（Token缓存、自适应并发等）
+写入临时目录，不影响正式运行
+
+使用示例:
+  python scripts/benchmark_ingestion.py
+  python scripts/benchmark_ingestion.py --clients async --start-date 2025-06-01 --end-date 2025-06-07
+  python scripts/benchmark_ingestion.py --latency-dist lognormal --throttle-rate 0.02 --error-rate 0.01
+  python scripts/benchmark_ingestion.py --output benchmark.json --baseline benchmark_baseline.json --tolerance 0.2
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+sys.path.insert(0, str(Path(__file__).parent))
+
+from mock_involve_asia_server import MockInvolveAsiaServer, add_mock_arguments, mock_config_from_args
+
+CLIENTS = ('sync', 'async', 'agent')
+
+
+def _percentile(values, percent):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(percent / 100.0 * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def _peak_rss_mb():
+    """进程生命周期内的峰值RSS(MB)"""
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux单位为KB，macOS为字节
+        return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+    except ImportError:
+        import psutil
+        return psutil.Process().memory_info().peak_wset / (1024 * 1024)
+
+
+# ----------------------------------------------------------------------
+# 子进程：运行单个客户端
+# ----------------------------------------------------------------------
+def _configure_worker(args):
+    """子进程内把客户端指向模拟服务器并关闭与性能无关的输出"""
+    import config
+    config.INVOLVE_ASIA_BASE_URL = args.base_url
+    config.INVOLVE_ASIA_AUTH_URL = f"{args.base_url}/authenticate"
+    config.INVOLVE_ASIA_CONVERSIONS_URL = f"{args.base_url}/conversions/range"
+    config.MAX_RECORDS_LIMIT = None
+    config.RESOURCE_MONITOR_ENABLED = False
+    config.REQUEST_DELAY = args.request_delay
+    config.RATE_LIMIT_DELAY = args.retry_after
+    config.RATE_LIMITER_ENABLED = args.rate_limit > 0
+    if args.rate_limit > 0:
+        config.RATE_LIMIT_REQUESTS_PER_SECOND = args.rate_limit
+        config.RATE_LIMIT_BURST = args.rate_limit
+    if args.concurrency:
+        config.MAX_CONCURRENT_REQUESTS = args.concurrency
+    config.SYNC_PARALLEL_PAGES = args.sync_parallel
+    config.HEDGED_REQUESTS_ENABLED = args.hedge
+    return config
+
+
+def _timed(latencies, func):
+    """包装单次HTTP请求方法，记录请求耗时（不含重试退避、限流和并发槽位等待）"""
+    def wrapper(*a, **kw):
+        start = time.perf_counter()
+        try:
+            return func(*a, **kw)
+        finally:
+            latencies.append(time.perf_counter() - start)
+    return wrapper
+
+
+def _telemetry_latencies(telemetry):
+    """遥测中成功页面的HTTP请求耗时（最后一次请求，不含排队/限流等待），与 _timed 口径一致"""
+    return [page['latency'] for page in telemetry.pages if page['success']] if telemetry else []
+
+
+def _telemetry_path():
+    """遥测写入子进程的临时状态目录，不污染输出目录"""
+    return os.path.join(os.environ.get('BYTEC_STATE_DIR') or tempfile.gettempdir(), 'benchmark_telemetry.ndjson')
+
+
+def run_worker(args):
+    config = _configure_worker(args)
+    latencies = []
+    devnull = open(os.devnull, 'w')
+    real_stdout = sys.stdout
+    sys.stdout = devnull  # 客户端日志较多，避免终端输出影响测量
+    try:
+        import logging
+        logging.disable(logging.CRITICAL)
+        # 同步/异步客户端的每页HTTP耗时取自获取遥测；agent客户端没有遥测，直接包装其HTTP请求方法
+        from modules.ingestion_telemetry import start_ingestion_telemetry, finish_ingestion_telemetry
+        telemetry = None
+        start = time.perf_counter()
+        if args.worker == 'sync':
+            from modules.involve_asia_api import InvolveAsiaAPI
+            telemetry = start_ingestion_telemetry('benchmark-sync', _telemetry_path())
+            with InvolveAsiaAPI('bench-secret', 'bench-key') as api:
+                api.authenticate()
+                result = api.get_conversions(args.start_date, args.end_date)
+        elif args.worker == 'async':
+            import asyncio
+            from modules.involve_asia_api_async import AsyncInvolveAsiaAPI
+            telemetry = start_ingestion_telemetry('benchmark-async', _telemetry_path())
+
+            async def fetch():
+                async with AsyncInvolveAsiaAPI('bench-secret', 'bench-key') as api:
+                    await api.authenticate()
+                    return await api.get_conversions_async(args.start_date, args.end_date)
+
+            result = asyncio.run(fetch())
+        else:
+            from agents.api_agent.involve_asia_client import InvolveAsiaAPI as AgentInvolveAsiaAPI
+            from agents.api_agent.api_data_fetcher import EnhancedAPIDataFetcher
+            with AgentInvolveAsiaAPI('bench-secret', 'bench-key') as api:
+                api._make_request_with_timeout = _timed(latencies, api._make_request_with_timeout)
+                api.authenticate()
+                result = api.get_conversions(args.start_date, args.end_date)
+            # agent路径还包括入库前的数据转换
+            EnhancedAPIDataFetcher().process_raw_conversions(result['data']['data'] if result else [], 'IAByteC')
+        elapsed = time.perf_counter() - start
+        finish_ingestion_telemetry(print_summary=False)
+        if telemetry is not None:
+            latencies = _telemetry_latencies(telemetry)
+        records = len(result['data']['data']) if result else 0
+        skipped = result['data']['skipped_pages'] if result else []
+        pages = result['data'].get('pages_fetched', 0) if result else 0
+    finally:
+        sys.stdout = real_stdout
+        devnull.close()
+
+    print(json.dumps({
+        'client': args.worker,
+        'records': records,
+        'pages': pages,
+        'skipped_pages': len(skipped),
+        'elapsed_seconds': round(elapsed, 3),
+        'pages_per_second': round(pages / elapsed, 2) if elapsed > 0 else 0.0,
+        'records_per_second': round(records / elapsed, 1) if elapsed > 0 else 0.0,
+        'latency_p50_ms': round(_percentile(latencies, 50) * 1000, 1),
+        'latency_p99_ms': round(_percentile(latencies, 99) * 1000, 1),
+        'peak_rss_mb': round(_peak_rss_mb(), 1),
+    }))
+
+
+# ----------------------------------------------------------------------
+# 主进程：启动模拟服务器并依次运行各客户端
+# ----------------------------------------------------------------------
+def _worker_command(args, client, base_url):
+    return [
+        sys.executable, os.path.abspath(__file__), '--worker', client, '--base-url', base_url,
+        '--start-date', args.start_date, '--end-date', args.end_date,
+        '--rate-limit', str(args.rate_limit), '--concurrency', str(args.concurrency or 0),
+        '--sync-parallel', str(args.sync_parallel), '--request-delay', str(args.request_delay),
+        '--retry-after', str(args.retry_after),
+    ] + (['--hedge'] if args.hedge else [])
+
+
+def run_client(args, client, base_url):
+    with tempfile.TemporaryDirectory(prefix='bench_state_') as state_dir:
+        env = dict(os.environ, BYTEC_STATE_DIR=state_dir, PYTHONUNBUFFERED='1')
+        completed = subprocess.run(_worker_command(args, client, base_url), cwd=str(project_root),
+                                   env=env, capture_output=True, text=True, timeout=args.timeout)
+    lines = [line for line in completed.stdout.strip().splitlines() if line.startswith('{')]
+    if completed.returncode != 0 or not lines:
+        return {'client': client, 'error': (completed.stderr or completed.stdout).strip()[-2000:]}
+    return json.loads(lines[-1])
+
+
+def compare_with_baseline(results, baseline_path, tolerance):
+    """pages/s 比基线下降超过 tolerance 比例时返回回归列表"""
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = {item['client']: item for item in json.load(f).get('results', [])}
+    regressions = []
+    for result in results:
+        base = baseline.get(result['client'])
+        if not base or 'error' in result or not base.get('pages_per_second'):
+            continue
+        floor = base['pages_per_second'] * (1 - tolerance)
+        if result['pages_per_second'] < floor:
+            regressions.append(f"{result['client']}: {result['pages_per_second']} pages/s < "
+                               f"基线 {base['pages_per_second']} 的 {1 - tolerance:.0%}")
+    return regressions
+
+
+def print_results(results):
+    header = f"{'客户端':<8}{'页数':>7}{'记录数':>9}{'耗时(s)':>10}{'pages/s':>10}{'p50(ms)':>10}{'p99(ms)':>10}{'RSS(MB)':>10}{'跳过':>6}"
+    print(header)
+    print('-' * len(header))
+    for result in results:
+        if 'error' in result:
+            print(f"{result['client']:<8} ❌ {result['error'].splitlines()[-1] if result['error'] else '运行失败'}")
+            continue
+        print(f"{result['client']:<8}{result['pages']:>7}{result['records']:>9}{result['elapsed_seconds']:>10}"
+              f"{result['pages_per_second']:>10}{result['latency_p50_ms']:>10}{result['latency_p99_ms']:>10}"
+              f"{result['peak_rss_mb']:>10}{result['skipped_pages']:>6}")
+
+
+def create_parser():
+    parser = argparse.ArgumentParser(
+        description='Involve Asia 数据获取性能基准测试（基于本地模拟服务器）',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument('--clients', default=','.join(CLIENTS), help=f"要测试的客户端，逗号分隔: {', '.join(CLIENTS)}")
+    parser.add_argument('--start-date', default='2025-06-01', help='开始日期 (YYYY-MM-DD)')
+    parser.add_argument('--end-date', default='2025-06-01', help='结束日期 (YYYY-MM-DD)')
+    parser.add_argument('--repeat', type=int, default=1, help='每个客户端重复次数（取pages/s最高的一次）')
+    parser.add_argument('--rate-limit', type=float, default=0, help='共享限流器速率(次/秒)，0表示关闭')
+    parser.add_argument('--concurrency', type=int, default=None, help='异步客户端的最大并发请求数')
+    parser.add_argument('--sync-parallel', type=int, default=4, help='同步客户端的并行页数')
+    parser.add_argument('--hedge', action='store_true', help='异步客户端启用请求对冲')
+    parser.add_argument('--request-delay', type=float, default=0.0, help='同步客户端逐页请求间隔(秒)')
+    parser.add_argument('--timeout', type=int, default=600, help='单个客户端运行超时(秒)')
+    parser.add_argument('--base-url', default=None, help='使用已启动的模拟服务器（例如 http://127.0.0.1:8765/api）')
+    parser.add_argument('--output', default=None, help='结果保存为JSON文件')
+    parser.add_argument('--baseline', default=None, help='基线结果JSON，pages/s下降超过 --tolerance 时以非零状态退出')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='相对基线允许的pages/s下降比例')
+    parser.add_argument('--worker', choices=CLIENTS, help=argparse.SUPPRESS)
+    add_mock_arguments(parser)
+    return parser
+
+
+def main():
+    args = create_parser().parse_args()
+    if args.worker:
+        run_worker(args)
+        return
+
+    clients = [client.strip() for client in args.clients.split(',') if client.strip()]
+    unknown = [client for client in clients if client not in CLIENTS]
+    if unknown:
+        print(f"❌ 未知客户端: {', '.join(unknown)}")
+        sys.exit(2)
+
+    server = None
+    base_url = args.base_url
+    if not base_url:
+        server = MockInvolveAsiaServer(mock_config_from_args(args)).start()
+        base_url = server.base_url
+    print(f"🧪 模拟服务器: {base_url}")
+    print(f"📅 日期范围: {args.start_date} ~ {args.end_date}, 客户端: {', '.join(clients)}")
+
+    results = []
+    try:
+        for client in clients:
+            runs = [run_client(args, client, base_url) for _ in range(max(1, args.repeat))]
+            successful = [run for run in runs if 'error' not in run]
+            results.append(max(successful, key=lambda run: run['pages_per_second']) if successful else runs[-1])
+    finally:
+        if server:
+            server.stop()
+
+    print()
+    print_results(results)
+    if server:
+        print(f"\n📊 服务器请求统计: {server.stats}")
+
+    report = {'generated_at': time.strftime('%Y-%m-%d %H:%M:%S'), 'mock_config': vars(mock_config_from_args(args)),
+              'start_date': args.start_date, 'end_date': args.end_date, 'results': results}
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"📁 结果已保存: {args.output}")
+
+    exit_code = 1 if any('error' in result for result in results) else 0
+    if args.baseline:
+        regressions = compare_with_baseline(results, args.baseline, args.tolerance)
+        for regression in regressions:
+            print(f"⚠️  性能回归: {regression}")
+        if regressions:
+            exit_code = 1
+    sys.exit(exit_code)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+"""
+本地 Involve Asia 模拟服务器
+提供 /authenticate 和 /conversions/range 两个接口，用于离线/CI环境下测量数据获取性能
+
+可配置：每天的记录数、每页条数、延迟分布、429/5xx注入比例、单条记录的额外负载大小
+
+使用示例:
+  python scripts/mock_involve_asia_server.py --port 8765 --records-per-day 5000 --latency-ms 80
+  python scripts/mock_involve_asia_server.py --latency-dist lognormal --throttle-rate 0.02 --error-rate 0.01
+
+客户端只需把 INVOLVE_ASIA_AUTH_URL / INVOLVE_ASIA_CONVERSIONS_URL 指向
+http://127.0.0.1:<port>/api/authenticate 和 http://127.0.0.1:<port>/api/conversions/range
+"""
+
+import argparse
+import json
+import math
+import random
+import sys
+import threading
+import time
+from dataclasses import dataclass, asdict
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+MOCK_TOKEN_PREFIX = "mock-token-"
+
+
+@dataclass
+class MockServerConfig:
+    """模拟服务器配置"""
+    records_per_day: int = 2000  # 每天的conversion数（小时分片按比例折算）
+    page_limit: int = 100  # 请求未指定limit时的每页条数
+    latency_ms: float = 50.0  # 平均响应延迟(毫秒)
+    latency_dist: str = "fixed"  # fixed / uniform / lognormal
+    latency_sigma: float = 0.5  # lognormal分布的sigma，越大尾延迟越长
+    throttle_rate: float = 0.0  # 返回429的概率
+    retry_after: float = 1.0  # 429响应的Retry-After(秒)
+    error_rate: float = 0.0  # 返回5xx的概率
+    payload_bytes: int = 0  # 每条记录额外填充的字节数
+    seed: int = 42  # 随机种子，保证注入结果可复现
+
+
+class MockStats:
+    """请求计数（线程安全）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts = {'authenticate': 0, 'pages': 0, 'throttled': 0, 'errors': 0, 'unauthorized': 0}
+
+    def incr(self, key: str):
+        with self._lock:
+            self.counts[key] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.counts)
+
+
+def _parse_range_bound(value: str, end: bool) -> datetime:
+    """解析 YYYY-MM-DD 或 YYYY-MM-DD HH:MM:SS，纯日期的结束边界取当天末尾"""
+    value = value.strip()
+    if len(value) > 10:
+        return datetime.strptime(value[:19], '%Y-%m-%d %H:%M:%S')
+    parsed = datetime.strptime(value, '%Y-%m-%d')
+    return parsed + timedelta(days=1) - timedelta(seconds=1) if end else parsed
+
+
+class MockInvolveAsiaHandler(BaseHTTPRequestHandler):
+    """处理模拟API请求（server 属性上挂有 mock_config / mock_stats / mock_random）"""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):  # noqa: A002 - 覆盖父类签名
+        pass
+
+    def _send_json(self, status: int, payload: dict, headers: dict = None):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_form(self) -> dict:
+        length = int(self.headers.get('Content-Length') or 0)
+        raw = self.rfile.read(length).decode('utf-8') if length else ''
+        return {key: values[0] for key, values in parse_qs(raw).items()}
+
+    def _sleep_latency(self):
+        cfg = self.server.mock_config
+        with self.server.mock_lock:
+            rng = self.server.mock_random
+            if cfg.latency_dist == 'uniform':
+                latency = rng.uniform(0, 2 * cfg.latency_ms)
+            elif cfg.latency_dist == 'lognormal':
+                # 均值保持为 latency_ms
+                mu = math.log(max(cfg.latency_ms, 0.001)) - cfg.latency_sigma ** 2 / 2
+                latency = rng.lognormvariate(mu, cfg.latency_sigma)
+            else:
+                latency = cfg.latency_ms
+        if latency > 0:
+            time.sleep(latency / 1000.0)
+
+    def _roll(self, probability: float) -> bool:
+        if probability <= 0:
+            return False
+        with self.server.mock_lock:
+            return self.server.mock_random.random() < probability
+
+    def do_GET(self):
+        if self.path.rstrip('/').endswith('/stats'):
+            self._send_json(200, {'config': asdict(self.server.mock_config),
+                                  'stats': self.server.mock_stats.snapshot()})
+        else:
+            self._send_json(404, {'status': 'error', 'message': 'Not Found'})
+
+    def do_POST(self):
+        form = self._read_form()
+        path = self.path.rstrip('/')
+        if path.endswith('/authenticate'):
+            self.server.mock_stats.incr('authenticate')
+            self._send_json(200, {'status': 'success', 'message': 'Success',
+                                  'data': {'token': f"{MOCK_TOKEN_PREFIX}{form.get('key', 'general')}",
+                                           'expires_in': 3600}})
+        elif path.endswith('/conversions/range'):
+            self._handle_conversions(form)
+        else:
+            self._send_json(404, {'status': 'error', 'message': 'Not Found'})
+
+    def _handle_conversions(self, form: dict):
+        cfg = self.server.mock_config
+        stats = self.server.mock_stats
+        if not (self.headers.get('Authorization') or '').startswith(f"Bearer {MOCK_TOKEN_PREFIX}"):
+            stats.incr('unauthorized')
+            self._send_json(401, {'status': 'error', 'message': 'Unauthorized'})
+            return
+
+        self._sleep_latency()
+        if self._roll(cfg.throttle_rate):
+            stats.incr('throttled')
+            self._send_json(429, {'status': 'error', 'message': 'Too Many Requests'},
+                            {'Retry-After': f"{cfg.retry_after:g}"})
+            return
+        if self._roll(cfg.error_rate):
+            stats.incr('errors')
+            self._send_json(503, {'status': 'error', 'message': 'Service Unavailable'})
+            return
+
+        try:
+            start = _parse_range_bound(form['start_date'], end=False)
+            end = _parse_range_bound(form['end_date'], end=True)
+            page = max(1, int(form.get('page', 1)))
+            limit = max(1, int(form.get('limit', cfg.page_limit)))
+        except (KeyError, ValueError) as e:
+            self._send_json(422, {'status': 'error', 'message': f"Invalid parameters: {e}"})
+            return
+
+        stats.incr('pages')
+        records = self._build_page(start, end, page, limit, form.get('filters[preferred_currency]', 'USD'))
+        total_count = records['count']
+        self._send_json(200, {
+            'status': 'success',
+            'message': 'Success',
+            'data': {
+                'page': page,
+                'limit': limit,
+                'count': total_count,
+                'nextPage': page + 1 if page * limit < total_count else None,
+                'data': records['data'],
+            }
+        })
+
+    def _build_page(self, start: datetime, end: datetime, page: int, limit: int, currency: str) -> dict:
+        """按秒均匀分布生成记录，conversion_id 由时间确定，不同分片之间可以正确去重"""
+        cfg = self.server.mock_config
+        seconds_per_record = 86400.0 / max(cfg.records_per_day, 1)
+        epoch = datetime(2020, 1, 1)
+        first_index = math.ceil((start - epoch).total_seconds() / seconds_per_record)
+        last_index = math.floor((end - epoch).total_seconds() / seconds_per_record)
+        total_count = max(0, last_index - first_index + 1)
+
+        padding = 'x' * cfg.payload_bytes if cfg.payload_bytes else None
+        data = []
+        for index in range(first_index + (page - 1) * limit, min(first_index + page * limit, last_index + 1)):
+            conversion_time = epoch + timedelta(seconds=index * seconds_per_record)
+            record = {
+                'conversion_id': 100000000 + index,
+                'offer_id': 4260 + index % 7,
+                'offer_name': 'Shopee ID (Media Buyers) - CPS',
+                'aff_sub1': f"MOCK_SOURCE_{index % 13}",
+                'aff_sub2': None,
+                'adv_sub1': f"{index} | MOCK",
+                'datetime_conversion': conversion_time.strftime('%Y-%m-%d %H:%M:%S'),
+                'conversion_status': 'pending' if index % 5 else 'approved',
+                'currency': currency,
+                'sale_amount': f"{(index % 1000) / 10:.2f}",
+                'payout': f"{(index % 100) / 100:.2f}",
+                'base_payout': '0.00',
+                'bonus_payout': '0.00',
+                'merchant_id': 103106,
+            }
+            if padding:
+                record['padding'] = padding
+            data.append(record)
+        return {'count': total_count, 'data': data}
+
+
+class MockInvolveAsiaServer:
+    """可在进程内启动/停止的模拟服务器"""
+
+    def __init__(self, mock_config: MockServerConfig = None, host: str = '127.0.0.1', port: int = 0):
+        self.mock_config = mock_config or MockServerConfig()
+        self.httpd = ThreadingHTTPServer((host, port), MockInvolveAsiaHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.mock_config = self.mock_config
+        self.httpd.mock_stats = MockStats()
+        self.httpd.mock_random = random.Random(self.mock_config.seed)
+        self.httpd.mock_lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/api"
+
+    @property
+    def stats(self) -> dict:
+        return self.httpd.mock_stats.snapshot()
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+
+def add_mock_arguments(parser: argparse.ArgumentParser):
+    """添加模拟服务器参数（基准测试脚本复用）"""
+    defaults = MockServerConfig()
+    parser.add_argument('--records-per-day', type=int, default=defaults.records_per_day, help='每天的conversion数')
+    parser.add_argument('--page-limit', type=int, default=defaults.page_limit, help='默认每页条数')
+    parser.add_argument('--latency-ms', type=float, default=defaults.latency_ms, help='平均响应延迟(毫秒)')
+    parser.add_argument('--latency-dist', choices=['fixed', 'uniform', 'lognormal'],
+                        default=defaults.latency_dist, help='延迟分布')
+    parser.add_argument('--latency-sigma', type=float, default=defaults.latency_sigma, help='lognormal分布sigma')
+    parser.add_argument('--throttle-rate', type=float, default=defaults.throttle_rate, help='429注入概率')
+    parser.add_argument('--retry-after', type=float, default=defaults.retry_after, help='429的Retry-After秒数')
+    parser.add_argument('--error-rate', type=float, default=defaults.error_rate, help='5xx注入概率')
+    parser.add_argument('--payload-bytes', type=int, default=defaults.payload_bytes, help='每条记录额外负载字节数')
+    parser.add_argument('--seed', type=int, default=defaults.seed, help='随机种子')
+
+
+def mock_config_from_args(args) -> MockServerConfig:
+    return MockServerConfig(
+        records_per_day=args.records_per_day, page_limit=args.page_limit,
+        latency_ms=args.latency_ms, latency_dist=args.latency_dist, latency_sigma=args.latency_sigma,
+        throttle_rate=args.throttle_rate, retry_after=args.retry_after, error_rate=args.error_rate,
+        payload_bytes=args.payload_bytes, seed=args.seed,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description='本地 Involve Asia 模拟服务器')
+    parser.add_argument('--host', default='127.0.0.1', help='监听地址')
+    parser.add_argument('--port', type=int, default=8765, help='监听端口')
+    add_mock_arguments(parser)
+    args = parser.parse_args()
+
+    server = MockInvolveAsiaServer(mock_config_from_args(args), args.host, args.port)
+    print(f"🧪 模拟 Involve Asia 服务器已启动: {server.base_url}")
+    print(f"   配置: {asdict(server.mock_config)}")
+    sys.stdout.flush()
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+        print(f"\n📊 请求统计: {server.stats}")
+
+
+if __name__ == '__main__':
+    main()
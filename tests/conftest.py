@@ -0,0 +1,32 @@
+"""
+测试公共配置：项目根目录和 scripts/ 加入Python路径（与 scripts/benchmark_ingestion.py 的做法一致）
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+sys.path.insert(0, str(project_root / "scripts"))
+
+import config  # noqa: E402
+from mock_involve_asia_server import MockInvolveAsiaServer, MockServerConfig  # noqa: E402
+
+RECORDS_PER_DAY = 1000
+
+
+@pytest.fixture
+def server(monkeypatch, tmp_path):
+    mock = MockInvolveAsiaServer(MockServerConfig(records_per_day=RECORDS_PER_DAY, latency_ms=0)).start()
+    monkeypatch.setattr(config, 'STATE_DIR', str(tmp_path))
+    monkeypatch.setattr(config, 'INVOLVE_ASIA_AUTH_URL', f"{mock.base_url}/authenticate")
+    monkeypatch.setattr(config, 'INVOLVE_ASIA_CONVERSIONS_URL', f"{mock.base_url}/conversions/range")
+    monkeypatch.setattr(config, 'DEFAULT_PAGE_LIMIT', 100)
+    monkeypatch.setattr(config, 'MAX_RECORDS_LIMIT', None)
+    monkeypatch.setattr(config, 'RATE_LIMITER_ENABLED', False)
+    monkeypatch.setattr(config, 'RESOURCE_MONITOR_ENABLED', False)
+    monkeypatch.setattr(config, 'HEDGED_REQUESTS_ENABLED', False)
+    yield mock
+    mock.stop()
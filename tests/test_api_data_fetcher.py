@@ -0,0 +1,44 @@
+"""
+DMP入庫前的轉化數據轉換測試
+"""
+
+import pytest
+
+import config
+from agents.api_agent.api_data_fetcher import EnhancedAPIDataFetcher
+
+
+def raw_conversion(conversion_id, source='source-a'):
+    return {'conversion_id': conversion_id, 'aff_sub1': source, 'usd_payout': '1.5',
+            'datetime_conversion': '2025-06-01 10:00:00'}
+
+
+@pytest.fixture
+def fetcher():
+    return EnhancedAPIDataFetcher()
+
+
+def test_non_dict_records_are_skipped(fetcher):
+    raw = [raw_conversion('1'), None, 'garbage', raw_conversion('2')]
+
+    processed = fetcher.process_raw_conversions(raw, 'IAByteC')
+
+    assert [record['conversion_id'] for record in processed] == ['1', '2']
+    assert processed[0]['usd_payout'] == 1.5
+
+
+def test_batch_failure_falls_back_to_per_record(fetcher, monkeypatch):
+    original = config.match_source_to_partner
+
+    def match(source):
+        if source == 'bad-source':
+            raise ValueError('broken mapping')
+        return original(source)
+
+    monkeypatch.setattr(config, 'match_source_to_partner', match)
+    raw = [raw_conversion('1'), raw_conversion('2', source='bad-source'), raw_conversion('3')]
+
+    processed = fetcher.process_raw_conversions(raw, 'IAByteC')
+
+    assert [record['conversion_id'] for record in processed] == ['1', '3']
+    assert processed[1]['datetime_conversion'].year == 2025
@@ -0,0 +1,89 @@
+"""
+异步客户端日期分片测试（本地模拟服务器）
+"""
+
+import asyncio
+
+import pytest
+
+import config
+from modules.involve_asia_api_async import AsyncInvolveAsiaAPI
+
+from conftest import RECORDS_PER_DAY
+
+
+def fetch(start_date, end_date):
+    async def run():
+        async with AsyncInvolveAsiaAPI('test-secret', 'test-key') as api:
+            await api.authenticate()
+            result = await api.get_conversions_async(start_date, end_date)
+            return result, dict(api.page_stats)
+
+    return asyncio.run(run())
+
+
+def test_small_multi_day_range_is_not_sharded(server):
+    """页数未超过上限时，多天范围也按单次查询获取（不做分片）"""
+    result, stats = fetch('2025-06-01', '2025-06-10')
+
+    assert len(result['data']['data']) == 10 * RECORDS_PER_DAY
+    assert 'shards' not in stats
+    assert server.stats['pages'] == 10 * RECORDS_PER_DAY // 100
+
+
+def test_large_range_is_sharded_from_first_page(server, monkeypatch):
+    """第一页报告的总页数超过 MAX_PAGES_PER_QUERY 时切换为分片，且不遗漏或重复记录"""
+    monkeypatch.setattr(config, 'MAX_PAGES_PER_QUERY', 20)
+    result, stats = fetch('2025-06-01', '2025-06-03')
+
+    records = result['data']['data']
+    assert len(records) == 3 * RECORDS_PER_DAY
+    assert len({record['conversion_id'] for record in records}) == len(records)
+    assert stats['shards'] == 3
+
+
+def test_single_day_shard_reuses_first_page(server, monkeypatch):
+    """单天范围切换为分片时复用已获取的第一页，不重复请求"""
+    monkeypatch.setattr(config, 'MAX_PAGES_PER_QUERY', 5)
+    monkeypatch.setattr(config, 'SHARD_TARGET_PAGES', 100)
+    result, _ = fetch('2025-06-01', '2025-06-01')
+
+    assert len(result['data']['data']) == RECORDS_PER_DAY
+    assert server.stats['pages'] == RECORDS_PER_DAY // 100
+
+
+def test_hour_split_reuses_probe_page(server, monkeypatch):
+    """按小时拆分时，探测请求获取的第一个小时分片第一页直接复用"""
+    monkeypatch.setattr(config, 'MAX_PAGES_PER_QUERY', 5)
+    monkeypatch.setattr(config, 'SHARD_TARGET_PAGES', 3)
+    result, stats = fetch('2025-06-01', '2025-06-01')
+
+    records = result['data']['data']
+    assert len(records) == RECORDS_PER_DAY
+    assert len({record['conversion_id'] for record in records}) == len(records)
+    # 整天第一页 + 4个小时分片各3页（第一个小时分片的第一页即探测请求）
+    assert stats['shards'] == 4
+    assert server.stats['pages'] == 1 + 4 * 3
+
+
+def test_first_page_failure_recovers_whole_range(server, monkeypatch):
+    """第一页失败时整个日期范围进入恢复队列，恢复时展开全部页面而不是只补第一页"""
+    monkeypatch.setattr('modules.involve_asia_api_async.recovery_backoff', lambda attempt: 0)
+    original_fetch_page = AsyncInvolveAsiaAPI._fetch_page
+    failures = []
+
+    async def fetch_page(self, client, page, *args, **kwargs):
+        if page == 1 and not failures:
+            failures.append(page)
+            return None, False, page
+        return await original_fetch_page(self, client, page, *args, **kwargs)
+
+    monkeypatch.setattr(AsyncInvolveAsiaAPI, '_fetch_page', fetch_page)
+    result, _ = fetch('2025-06-01', '2025-06-02')
+
+    records = result['data']['data']
+    assert failures == [1]
+    assert len(records) == 2 * RECORDS_PER_DAY
+    assert len({record['conversion_id'] for record in records}) == len(records)
+    assert result['data']['skipped_pages'] == []
+    assert result['data']['recovery_run_id'] is None
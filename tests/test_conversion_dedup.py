@@ -0,0 +1,122 @@
+"""
+写入时去重测试（SQLite内存数据库）
+"""
+
+import asyncio
+
+import pytest
+
+pytest.importorskip("aiosqlite")
+
+from sqlalchemy import Column, Index, Integer, String
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import declarative_base
+
+from app.services import conversion_dedup
+from app.services.conversion_dedup import ConversionDeduplicator, insert_conversion
+
+Base = declarative_base()
+
+
+class IndexedConversion(Base):
+    __tablename__ = "indexed_conversions"
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    partner_id = Column(Integer, nullable=False)
+    conversion_id = Column(String(100), nullable=False)
+    status = Column(String(20))
+    __table_args__ = (Index("idx_indexed_conversion", "partner_id", "conversion_id", unique=True),)
+
+
+class LegacyConversion(Base):
+    """旧表：没有唯一索引"""
+    __tablename__ = "legacy_conversions"
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    partner_id = Column(Integer, nullable=False)
+    conversion_id = Column(String(100), nullable=False)
+    status = Column(String(20))
+
+
+@pytest.fixture(autouse=True)
+def fresh_state(monkeypatch):
+    monkeypatch.setattr(conversion_dedup, "_deduplicator", ConversionDeduplicator(lru_size=100))
+    monkeypatch.setattr(conversion_dedup, "_on_conflict_unsupported", set())
+
+
+def run_with_session(scenario):
+    async def main():
+        engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        try:
+            async with AsyncSession(engine, expire_on_commit=False) as db:
+                return await scenario(db)
+        finally:
+            await engine.dispose()
+
+    return asyncio.run(main())
+
+
+def values(conversion_id, status="pending", partner_id=1):
+    return {"partner_id": partner_id, "conversion_id": conversion_id, "status": status}
+
+
+def test_duplicate_detected_by_on_conflict():
+    async def scenario(db):
+        first = await insert_conversion(db, IndexedConversion, values("c1"), ["partner_id", "conversion_id"], 1)
+        conversion_dedup.get_conversion_deduplicator()._recent.clear()
+        second = await insert_conversion(db, IndexedConversion, values("c1"), ["partner_id", "conversion_id"], 1)
+        return first, second
+
+    first, second = run_with_session(scenario)
+    assert first is not None
+    assert second is None
+    assert conversion_dedup._on_conflict_unsupported == set()
+    assert conversion_dedup.get_conversion_deduplicator().stats["db_duplicates"] == 1
+
+
+def test_duplicate_detected_in_memory():
+    async def scenario(db):
+        await insert_conversion(db, IndexedConversion, values("c1"), ["partner_id", "conversion_id"], 1)
+        return await insert_conversion(db, IndexedConversion, values("c1"), ["partner_id", "conversion_id"], 1)
+
+    assert run_with_session(scenario) is None
+    assert conversion_dedup.get_conversion_deduplicator().stats["memory_duplicates"] == 1
+
+
+def test_upsert_overwrites_existing_record():
+    async def scenario(db):
+        first = await insert_conversion(db, IndexedConversion, values("c1"), ["partner_id", "conversion_id"], 1,
+                                        upsert=True)
+        second = await insert_conversion(db, IndexedConversion, values("c1", status="approved"),
+                                         ["partner_id", "conversion_id"], 1, upsert=True)
+        record = await db.get(IndexedConversion, first)
+        await db.refresh(record)
+        return first, second, record.status
+
+    first, second, status = run_with_session(scenario)
+    assert first == second
+    assert status == "approved"
+
+
+def test_missing_unique_index_falls_back_to_precheck():
+    async def scenario(db):
+        first = await insert_conversion(db, LegacyConversion, values("c1"), ["partner_id", "conversion_id"], 1)
+        conversion_dedup.get_conversion_deduplicator()._recent.clear()
+        second = await insert_conversion(db, LegacyConversion, values("c1"), ["partner_id", "conversion_id"], 1)
+        return first, second
+
+    first, second = run_with_session(scenario)
+    assert first is not None
+    assert second is None
+    assert conversion_dedup._on_conflict_unsupported == {"legacy_conversions"}
+
+
+def test_other_database_errors_are_raised_without_marking_table():
+    async def scenario(db):
+        await insert_conversion(db, IndexedConversion, values("c1", partner_id=None),
+                                ["partner_id", "conversion_id"], 1)
+
+    with pytest.raises(IntegrityError):
+        run_with_session(scenario)
+    assert conversion_dedup._on_conflict_unsupported == set()
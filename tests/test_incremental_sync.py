@@ -0,0 +1,82 @@
+"""
+增量同步状态合并测试
+"""
+
+import asyncio
+from datetime import datetime
+
+import pytest
+
+import config
+from modules.incremental_sync import IncrementalSyncer
+
+
+@pytest.fixture(autouse=True)
+def state_dir(monkeypatch, tmp_path):
+    monkeypatch.setattr(config, 'STATE_DIR', str(tmp_path))
+
+
+def record(conversion_id, status='pending', updated='10:00:00'):
+    today = datetime.now().strftime('%Y-%m-%d')
+    return {'conversion_id': conversion_id, 'conversion_status': status,
+            'datetime_conversion': f"{today} 09:00:00", 'datetime_conversion_updated': f"{today} {updated}"}
+
+
+def run_sync(syncer, records):
+    """模拟一次同步：读取状态、计算delta，返回待提交的条目和水位线"""
+    state = syncer.state.read()
+    updates = {}
+    _, _, watermark = syncer.diff_records(records, state.get('records', {}), state.get('watermark'), updates)
+    return updates, watermark
+
+
+def test_concurrent_commits_keep_each_others_fingerprints():
+    first = IncrementalSyncer('secret', 'key', api_name='A')
+    second = IncrementalSyncer('secret', 'key', api_name='A')
+
+    # 两次同步都在对方提交之前读取状态
+    first_updates, first_watermark = run_sync(first, [record('1', updated='11:00:00')])
+    second_updates, second_watermark = run_sync(second, [record('2', updated='10:00:00')])
+    first.commit(first_updates, first_watermark, '2025-06-01', complete=True)
+    second.commit(second_updates, second_watermark, '2025-06-01', complete=True)
+
+    state = first.state.read()
+    assert set(state['records']) == {'1', '2'}
+    # 水位线只前进不后退
+    assert state['watermark'] == first_watermark
+
+
+def test_unchanged_records_are_not_reported_again():
+    syncer = IncrementalSyncer('secret', 'key')
+    updates, watermark = run_sync(syncer, [record('1')])
+    syncer.commit(updates, watermark, '2025-06-01', complete=True)
+
+    state = syncer.state.read()
+    delta, counts, _ = syncer.diff_records([record('1'), record('2')], state['records'], state['watermark'])
+
+    assert [item['conversion_id'] for item in delta] == ['2']
+    assert counts == {'new': 1, 'changed': 0, 'unchanged': 1}
+
+
+class FailingAsyncAPI:
+    """第一页就失败的异步客户端：不产出任何页面，失败页面留在 skipped_pages / failed_requests"""
+
+    def __init__(self):
+        self.page_stats = {}
+
+    async def iter_conversion_pages(self, start_date, end_date, currency=None, api_name=None):
+        self.page_stats = {'total_count': 0, 'total_pages': 0, 'pages_fetched': 0}
+        failed_request = {'start_date': start_date, 'end_date': end_date, 'page': None}
+        self.failed_requests.append(failed_request)
+        self.skipped_pages.append(f"{start_date}~{end_date}#*")
+        return
+        yield
+
+
+def test_failed_first_page_does_not_advance_last_synced_end():
+    syncer = IncrementalSyncer('secret', 'key', api_name='A')
+
+    result = asyncio.run(syncer.sync_async(FailingAsyncAPI(), '2025-06-01', '2025-06-10'))
+
+    assert result['complete'] is False
+    assert 'last_synced_end' not in syncer.state.read()
@@ -0,0 +1,117 @@
+"""
+Involve Asia 同步客户端分页测试
+用假的 _handle_page_request 模拟服务商分页响应和页面失败，不访问网络
+"""
+
+import pytest
+
+import config
+from modules import involve_asia_api
+from modules.involve_asia_api import InvolveAsiaAPI
+from agents.api_agent import involve_asia_client
+
+COUNT = 15000
+LIMIT = 100
+TOTAL_PAGES = COUNT // LIMIT
+
+
+@pytest.fixture(autouse=True)
+def isolated_config(monkeypatch, tmp_path):
+    monkeypatch.setattr(config, 'STATE_DIR', str(tmp_path))
+    monkeypatch.setattr(config, 'DEFAULT_PAGE_LIMIT', LIMIT)
+    monkeypatch.setattr(config, 'MAX_RECORDS_LIMIT', None)
+    monkeypatch.setattr(config, 'REQUEST_DELAY', 0)
+    monkeypatch.setattr(involve_asia_api, 'recovery_backoff', lambda attempt: 0)
+    monkeypatch.setattr(involve_asia_client, 'recovery_backoff', lambda attempt: 0)
+
+
+def make_fetcher(failing_pages, recovery_succeeds=True):
+    """
+    返回假的 _handle_page_request：failing_pages 中的页面在首轮获取时失败，
+    恢复阶段（max_retries=0）的请求在 recovery_succeeds 为False时全部失败
+    """
+    def fetch(page, headers, data, api_label="", max_retries=None):
+        recovering = max_retries == 0
+        if (recovering and not recovery_succeeds) or (page in failing_pages and not recovering):
+            return None, False
+        first = (page - 1) * LIMIT
+        records = [{'conversion_id': str(first + i)} for i in range(min(LIMIT, COUNT - first))]
+        next_page = page + 1 if page < TOTAL_PAGES else None
+        return {'data': {'page': page, 'limit': LIMIT, 'count': COUNT, 'nextPage': next_page, 'data': records}}, True
+
+    return fetch
+
+
+def make_api(api_class, parallel_pages, fetcher):
+    api = api_class(api_secret='secret', api_key='key', parallel_pages=parallel_pages)
+    api.token = 'token'
+    api.request_delay = 0
+    api._handle_page_request = fetcher
+    return api
+
+
+@pytest.mark.parametrize('api_class', [InvolveAsiaAPI, involve_asia_client.InvolveAsiaAPI])
+@pytest.mark.parametrize('parallel_pages', [1, 4])
+def test_abort_on_skipped_pages_recovers_untried_pages(api_class, parallel_pages):
+    """跳过页面过多终止获取后，未尝试的页面同样被恢复，记录数与 count 一致"""
+    api = make_api(api_class, parallel_pages, make_fetcher(set(range(2, 14))))
+
+    result = api.get_conversions('2025-06-01', '2025-06-01')
+
+    records = result['data']['data']
+    assert len(records) == COUNT
+    assert len({record['conversion_id'] for record in records}) == COUNT
+    assert result['data']['skipped_pages'] == []
+    assert result['data']['recovery_run_id'] is None
+
+
+@pytest.mark.parametrize('api_class', [InvolveAsiaAPI, involve_asia_client.InvolveAsiaAPI])
+@pytest.mark.parametrize('parallel_pages', [1, 4])
+def test_abort_on_skipped_pages_queues_every_missing_page(api_class, parallel_pages):
+    """恢复也失败时，每个缺失的页面都进入持久化的恢复队列"""
+    api = make_api(api_class, parallel_pages, make_fetcher(set(range(2, 14)), recovery_succeeds=False))
+
+    result = api.get_conversions('2025-06-01', '2025-06-01')
+
+    missing = set(range(2, TOTAL_PAGES + 1))
+    records = result['data']['data']
+    assert len(records) == LIMIT
+    assert set(result['data']['skipped_pages']) == missing
+    assert {request['page'] for request in api.failed_requests} == missing
+    assert result['data']['recovery_run_id'] is not None
+
+
+def test_abort_before_any_success_queues_whole_range():
+    """一页都没有成功时总页数未知，整个日期范围作为一个请求排队并在恢复时展开"""
+    fetcher = make_fetcher(set(range(1, 12)))
+    api = make_api(InvolveAsiaAPI, 1, fetcher)
+
+    result = api.get_conversions('2025-06-01', '2025-06-01')
+
+    assert len(result['data']['data']) == COUNT
+    assert result['data']['skipped_pages'] == []
+
+
+@pytest.mark.parametrize('api_class', [InvolveAsiaAPI, involve_asia_client.InvolveAsiaAPI])
+@pytest.mark.parametrize('parallel_pages', [1, 4])
+def test_pages_beyond_max_pages_per_query_are_fetched(monkeypatch, api_class, parallel_pages):
+    """MAX_PAGES_PER_QUERY 不截断同步客户端的获取"""
+    monkeypatch.setattr(config, 'MAX_PAGES_PER_QUERY', 20)
+    api = make_api(api_class, parallel_pages, make_fetcher(set()))
+
+    result = api.get_conversions('2025-06-01', '2025-06-01')
+
+    assert len(result['data']['data']) == COUNT
+    assert result['data']['pages_fetched'] == TOTAL_PAGES
+
+
+@pytest.mark.parametrize('api_class', [InvolveAsiaAPI, involve_asia_client.InvolveAsiaAPI])
+def test_recover_whole_range_follows_all_pages(monkeypatch, api_class):
+    """恢复整个日期范围时展开全部页面，不受 MAX_PAGES_PER_QUERY 限制"""
+    monkeypatch.setattr(config, 'MAX_PAGES_PER_QUERY', 20)
+    api = make_api(api_class, 1, make_fetcher(set()))
+
+    records, remaining = api.recover_pages([{'start_date': '2025-06-01', 'end_date': '2025-06-01', 'page': None}])
+
+    assert len(records) == COUNT
+    assert remaining == []
@@ -0,0 +1,51 @@
+"""
+逐页写入Sink测试（本地模拟服务器）
+"""
+
+import asyncio
+import json
+
+import pytest
+
+from modules.involve_asia_api_async import AsyncInvolveAsiaAPI
+from modules.page_sinks import JSONLinesPageSink, PageSink
+
+from conftest import RECORDS_PER_DAY
+
+
+def test_page_sink_requires_write_page():
+    class IncompleteSink(PageSink):
+        pass
+
+    with pytest.raises(TypeError):
+        IncompleteSink()
+
+
+def test_stream_conversions_writes_every_record(server, tmp_path):
+    filepath = tmp_path / "conversions.jsonl"
+
+    async def run():
+        async with AsyncInvolveAsiaAPI('test-secret', 'test-key') as api:
+            await api.authenticate()
+            return await api.stream_conversions_async('2025-06-01', '2025-06-03',
+                                                      [JSONLinesPageSink(str(filepath))])
+
+    stats = asyncio.run(run())
+
+    lines = filepath.read_text(encoding='utf-8').splitlines()
+    assert stats['records'] == len(lines) == 3 * RECORDS_PER_DAY
+    assert len({json.loads(line)['conversion_id'] for line in lines}) == len(lines)
+    assert stats['skipped_pages'] == []
+    assert stats['recovery_run_id'] is None
+
+
+def test_empty_stream_still_creates_file(tmp_path):
+    filepath = tmp_path / "empty.jsonl"
+
+    async def run():
+        async with JSONLinesPageSink(str(filepath)) as sink:
+            return sink
+
+    sink = asyncio.run(run())
+    assert filepath.read_text(encoding='utf-8') == ''
+    assert sink.records_written == 0
@@ -0,0 +1,50 @@
+"""
+Postback write-behind 测试：入队与已写入分开报告，应用关闭时写完缓冲区
+"""
+
+import asyncio
+
+from app.api import postback
+from app.config import settings
+from agents.postback_agent import main as postback_main
+
+
+class FakeWriteBuffer:
+    def __init__(self):
+        self.rows = []
+
+    async def enqueue(self, row):
+        self.rows.append(row)
+
+
+def test_write_behind_reports_queued_not_stored(monkeypatch):
+    buffer = FakeWriteBuffer()
+    monkeypatch.setattr(settings, "postback_write_behind", True)
+    monkeypatch.setattr(postback, "get_conversion_write_buffer", lambda: buffer)
+
+    status = asyncio.run(postback.store_conversion_to_db(None, {"conversion_id": "c1"}, {}, partner_id=1))
+
+    assert status == "queued"
+    assert len(buffer.rows) == 1
+
+
+def test_postback_agent_lifespan_flushes_write_buffer(monkeypatch):
+    calls = []
+
+    async def fake_shutdown():
+        calls.append("shutdown")
+
+    monkeypatch.setattr(postback_main, "shutdown_conversion_write_buffer", fake_shutdown)
+
+    async def run():
+        async with postback_main.lifespan(postback_main.app):
+            assert calls == []
+
+    asyncio.run(run())
+    assert calls == ["shutdown"]
+
+
+def test_response_message_follows_storage_status():
+    assert postback.describe_storage("Event", "stored") == "Event received and stored successfully"
+    assert "queued" in postback.describe_storage("Event", "queued")
+    assert "stored successfully" not in postback.describe_storage("Event", "failed")
@@ -0,0 +1,80 @@
+"""
+租户限流中间件测试（直接调用ASGI接口，不访问数据库）
+"""
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from app.middleware.rate_limit import (
+    OVERFLOW_KEY, MemoryRateLimitStore, TenantRateLimitMiddleware,
+)
+from app.services.lookup_cache import get_tenant_cache
+
+
+@pytest.fixture(autouse=True)
+def empty_tenant_cache():
+    get_tenant_cache().invalidate()
+    yield
+    get_tenant_cache().invalidate()
+
+
+async def ok_app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b""})
+
+
+def make_middleware(max_keys=10000):
+    middleware = TenantRateLimitMiddleware(ok_app, exempt_paths=[])
+    middleware.enabled = True
+    middleware.memory_store = middleware.store = MemoryRateLimitStore(max_keys=max_keys)
+    return middleware
+
+
+def call(middleware, path, query_string=b""):
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {"type": "http", "path": path, "query_string": query_string}
+    asyncio.run(middleware(scope, receive, send))
+    return messages[0]["status"]
+
+
+def test_rotating_unresolved_tokens_share_endpoint_bucket():
+    middleware = make_middleware()
+    middleware.window_limit = 5
+
+    statuses = [call(middleware, "/involve/event", f"ts_token=rotated-{i}".encode()) for i in range(8)]
+
+    assert statuses == [200] * 5 + [429] * 3
+    assert set(middleware.memory_store._counters) == {"unresolved:/involve/event"}
+
+
+def test_resolved_tenant_never_shares_overflow():
+    middleware = make_middleware(max_keys=3)
+    middleware.window_limit = 2
+    for i in range(5):
+        call(middleware, f"/flood-{i}")
+    for i in range(2):
+        call(middleware, "/flood-overflow")
+    assert OVERFLOW_KEY in middleware.memory_store._counters
+
+    tenant = SimpleNamespace(tenant_code="acme", max_daily_requests=None)
+    get_tenant_cache().set(("acme-token", None, None), tenant)
+
+    assert call(middleware, "/involve/event", b"ts_token=acme-token") == 200
+    assert middleware.memory_store._counters["tenant:acme"][1] == 1
+
+
+def test_postback_agent_installs_rate_limit_middleware():
+    from agents.postback_agent.main import create_app
+
+    app = create_app()
+
+    assert TenantRateLimitMiddleware in [middleware.cls for middleware in app.user_middleware]
@@ -0,0 +1,43 @@
+"""
+跨进程令牌桶测试：等待文件锁时不阻塞事件循环
+"""
+
+import asyncio
+import fcntl
+import threading
+
+import pytest
+
+import config
+from modules.rate_limiter import TokenBucketRateLimiter
+
+
+@pytest.fixture(autouse=True)
+def isolated_state(monkeypatch, tmp_path):
+    monkeypatch.setattr(config, 'STATE_DIR', str(tmp_path))
+
+
+def test_acquire_async_does_not_block_event_loop_on_file_lock():
+    limiter = TokenBucketRateLimiter('secret', 'key', rate=100, burst=100)
+
+    async def run():
+        ticks = []
+
+        async def ticker():
+            while True:
+                ticks.append(1)
+                await asyncio.sleep(0.01)
+
+        with open(limiter.state.lock_path, 'a') as lock_file:
+            # 模拟另一个进程持有状态文件的排他锁
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            threading.Timer(0.3, fcntl.flock, (lock_file.fileno(), fcntl.LOCK_UN)).start()
+            ticking = asyncio.create_task(ticker())
+            wait = await limiter.acquire_async()
+            ticking.cancel()
+        return wait, len(ticks)
+
+    wait, ticks = asyncio.run(run())
+    assert wait == 0
+    assert ticks >= 10
+    assert limiter.stats['acquired'] == 1
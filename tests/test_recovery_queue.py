@@ -0,0 +1,59 @@
+"""
+--resume 合并测试：多API合并数据集的失败页面补拉后带上API来源标记
+"""
+
+import json
+
+import pytest
+
+import config
+from modules.recovery_queue import RecoveryQueue, attach_multi_api_runs, resume_recovery
+
+
+@pytest.fixture(autouse=True)
+def isolated_state(monkeypatch, tmp_path):
+    monkeypatch.setattr(config, 'STATE_DIR', str(tmp_path))
+
+
+class FakeRecoveryAPI:
+    api_secret = 'secret-b'
+    api_key = 'general'
+
+    def recover_pages(self, failed_requests, currency=None, api_label=""):
+        return [{'conversion_id': 'b-2'}], []
+
+    def save_to_json(self, data, filename=None):
+        raise AssertionError("恢复的记录应合并到多API数据集")
+
+
+def test_resume_merges_into_multi_api_dataset_with_api_source(tmp_path):
+    api_list = [{'name': 'ApiA', 'secret': 'secret-a', 'key': 'general'},
+                {'name': 'ApiB', 'secret': 'secret-b', 'key': 'general'}]
+    run_id = RecoveryQueue('secret-b', 'general').add_run(
+        'ApiB', '2025-06-01', '2025-06-01', 'USD',
+        [{'start_date': '2025-06-01', 'end_date': '2025-06-01', 'page': 2}])
+    merged_data = {
+        'data': {
+            'conversions': [{'conversion_id': 'a-1', 'api_source': 'ApiA'},
+                            {'conversion_id': 'b-1', 'api_source': 'ApiB'}],
+            'current_page_count': 2,
+            'total_count': 2,
+            'recovery_runs': {'ApiB': run_id},
+            'merge_info': {'total_records': 2, 'has_api_source_fields': True},
+        }
+    }
+    dataset_path = tmp_path / 'conversions.json'
+    dataset_path.write_text(json.dumps(merged_data), encoding='utf-8')
+
+    attach_multi_api_runs(api_list, merged_data, str(dataset_path))
+    summary = resume_recovery(FakeRecoveryAPI(), 'ApiB')
+
+    dataset = json.loads(dataset_path.read_text(encoding='utf-8'))['data']
+    assert summary['added_records'] == 1
+    assert summary['datasets'] == [str(dataset_path)]
+    assert dataset['conversions'][-1]['conversion_id'] == 'b-2'
+    assert dataset['conversions'][-1]['api_source'] == 'ApiB'
+    assert 'api_platform' in dataset['conversions'][-1]
+    assert dataset['total_count'] == dataset['merge_info']['total_records'] == 3
+    assert 'data' not in dataset
+    assert RecoveryQueue('secret-b', 'general').pending_runs() == {}
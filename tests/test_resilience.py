@@ -0,0 +1,72 @@
+"""
+出站调用重试测试：非幂等调用只在连接建立失败时重试
+"""
+
+import pytest
+import requests
+from urllib3.exceptions import MaxRetryError, NewConnectionError, ProtocolError
+
+import config
+from modules.feishu_uploader import FeishuUploader
+from modules.resilience import Destination, call_with_retry, is_connect_error
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(config, 'RETRY_BACKOFF_BASE', 0)
+
+
+def connect_refused():
+    reason = NewConnectionError(None, "Connection refused")
+    return requests.exceptions.ConnectionError(MaxRetryError(None, "/upload", reason=reason))
+
+
+def connection_aborted():
+    return requests.exceptions.ConnectionError(ProtocolError("Connection aborted."))
+
+
+def failing_call(error, calls):
+    def call():
+        calls.append(1)
+        raise error
+    return call
+
+
+def test_is_connect_error():
+    assert is_connect_error(connect_refused())
+    assert not is_connect_error(connection_aborted())
+    assert not is_connect_error(requests.exceptions.ReadTimeout("read timed out"))
+
+
+def test_non_idempotent_call_retries_connect_errors_only():
+    calls = []
+    with pytest.raises(requests.exceptions.ConnectionError):
+        call_with_retry(Destination("connect-test"), failing_call(connect_refused(), calls),
+                        max_retries=2, retry_error=is_connect_error)
+    assert len(calls) == 3
+
+    calls = []
+    with pytest.raises(requests.exceptions.ConnectionError):
+        call_with_retry(Destination("aborted-test"), failing_call(connection_aborted(), calls),
+                        max_retries=2, retry_error=is_connect_error)
+    assert len(calls) == 1
+
+
+def test_feishu_upload_is_not_resent_after_server_error(monkeypatch, tmp_path):
+    filepath = tmp_path / "report.xlsx"
+    filepath.write_bytes(b"data")
+    posts = []
+
+    def fake_post(url, **kwargs):
+        posts.append(url)
+        response = requests.Response()
+        response.status_code = 502
+        return response
+
+    monkeypatch.setattr(requests, "post", fake_post)
+    uploader = FeishuUploader(access_token="token")
+    uploader.resilience = Destination("feishu-test")
+
+    uploader._upload_single_file(str(filepath))
+
+    assert posts == [uploader.upload_url]
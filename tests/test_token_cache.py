@@ -0,0 +1,48 @@
+"""
+Token缓存测试：异步认证等待缓存文件锁时不阻塞事件循环
+"""
+
+import asyncio
+import fcntl
+import threading
+
+import pytest
+
+import config
+from modules import token_cache
+from modules.involve_asia_api_async import AsyncInvolveAsiaAPI
+
+
+@pytest.fixture(autouse=True)
+def isolated_state(monkeypatch, tmp_path):
+    monkeypatch.setattr(config, 'STATE_DIR', str(tmp_path))
+    monkeypatch.setattr(config, 'TOKEN_CACHE_ENABLED', True)
+    monkeypatch.setattr(token_cache, '_token_cache', None)
+
+
+def test_async_authenticate_does_not_block_event_loop_on_cache_lock():
+    cache = token_cache.get_token_cache()
+    cache.set('secret', 'key', 'cached-token', expires_in=3600)
+
+    async def run():
+        ticks = []
+
+        async def ticker():
+            while True:
+                ticks.append(1)
+                await asyncio.sleep(0.01)
+
+        api = AsyncInvolveAsiaAPI('secret', 'key')
+        with open(cache.store.lock_path, 'a') as lock_file:
+            # 模拟另一个进程正在写Token缓存
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            threading.Timer(0.3, fcntl.flock, (lock_file.fileno(), fcntl.LOCK_UN)).start()
+            ticking = asyncio.create_task(ticker())
+            authenticated = await api.authenticate()
+            ticking.cancel()
+        return authenticated, api.token, len(ticks)
+
+    authenticated, token, ticks = asyncio.run(run())
+    assert authenticated
+    assert token == 'cached-token'
+    assert ticks >= 10